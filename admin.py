@@ -0,0 +1,77 @@
+"""Admin HTTP endpoints for live tuning, mounted next to the Gradio UI."""
+import hmac
+from typing import Dict, Any, Optional
+
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+
+from config import settings
+from memstats import AllocationTracer, MemoryAccountant
+
+
+def _require_token(x_admin_token: str = Header(default="")):
+    # Disabled entirely unless ADMIN_TOKEN is set
+    if not settings.admin_token:
+        raise HTTPException(status_code=404)
+    if not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def build_admin_router(agent, accountant: Optional[MemoryAccountant] = None) -> APIRouter:
+    """Routes under /admin, authenticated with the ``X-Admin-Token`` header.
+
+    ``accountant`` lists the components reported by ``GET /admin/memory``.
+    """
+    router = APIRouter(prefix="/admin", dependencies=[Depends(_require_token)])
+    accountant = accountant or MemoryAccountant()
+    tracer = AllocationTracer()
+    
+    @router.get("/settings")
+    def get_settings() -> Dict[str, Any]:
+        return settings.public()
+    
+    @router.patch("/settings")
+    def patch_settings(changes: Dict[str, Any] = Body(...)) -> Dict[str, Any]:
+        try:
+            applied = settings.update(changes)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"applied": applied}
+    
+    @router.post("/settings/reload")
+    def reload_settings() -> Dict[str, Any]:
+        try:
+            return settings.reload()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    @router.get("/metrics")
+    def get_metrics() -> Dict[str, Any]:
+        return {
+            "agent": agent.metrics.snapshot(),
+            "routes": agent.router.report(),
+            "limits": {
+                "llm_requests": agent.llm_request_limiter.snapshot(),
+                "llm_tokens": agent.llm_token_limiter.snapshot(),
+                "mcp_session": agent.mcp_session_limiter.snapshot(),
+                "mcp_global": agent.mcp_client.rate_limiter.snapshot(),
+            },
+            "mcp": agent.mcp_client.status(),
+        }
+    
+    @router.get("/memory")
+    def get_memory() -> Dict[str, Any]:
+        return accountant.report()
+    
+    @router.post("/memory/snapshot")
+    def memory_snapshot(top: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        # The first call starts tracemalloc; later calls report growth since the previous one
+        try:
+            return tracer.snapshot(top=top, key_type=group_by, frames=settings.tracemalloc_frames)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    @router.delete("/memory/snapshot")
+    def stop_memory_tracing() -> Dict[str, Any]:
+        return {"stopped": tracer.stop()}
+    
+    return router
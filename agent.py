@@ -1,176 +1,126 @@
 """LLM agent with tool calling capabilities."""
 import json
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
-from mcp_client import MCPClient
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Mapping, Optional, Sequence
+from config import Settings, settings
+from mcp_client import MCPClient, MCPError, MCPUnavailable
 from auth import AuthHandler
+from catalog import Catalog, is_empty_listing
+from cache import TTLCache
+from classifier import AUTH, ORDER, Classification, classify
+from llm import make_llm_client
+from store import SharedStore, StoreCache
+from metrics import Metrics
+from orders import OrderPipeline, render_acknowledgment, render_outcome
+from ratelimit import RateLimited, RateLimiter
+from routing import ModelRouter
+from templates import TEMPLATES
+from tools import DEFAULT_POLICY, discover_registry
+from validation import ToolArgumentError
+
+
+BUSY_MESSAGE = "I'm handling a lot of requests right now. Please try again in a few seconds."
+# Completion tokens assumed before the response reports real usage
+COMPLETION_TOKEN_ESTIMATE = 300
 
 
 class SupportAgent:
     """Customer support agent with MCP tool integration."""
     
-    def __init__(self, mcp_client: MCPClient, auth_handler: AuthHandler):
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.model = OPENAI_MODEL
+    def __init__(self, mcp_client: MCPClient, auth_handler: AuthHandler, store: Optional[SharedStore] = None, llm_client=None):
+        # Any object with chat.completions.create works: OpenAI, llm.RecordingLLM/ReplayLLM, standins.ScriptedLLM
+        if llm_client is None:
+            llm_client = make_llm_client(
+                settings.llm_mode, settings.openai_api_key, settings.llm_cassette, settings.llm_replay_latency
+            )
+        self.client = llm_client
         self.mcp_client = mcp_client
         self.auth_handler = auth_handler
+        self.metrics = Metrics()
+        self.router = ModelRouter(
+            settings.openai_model, settings.openai_fast_model,
+            small_output_chars=settings.router_small_output_chars, metrics=self.metrics
+        )
         
         # Initialize MCP connection
         self.mcp_client.initialize()
         
-        # Define available tools
-        self.tools = self._define_tools()
+        # Tool registry from tools/list discovery, shared across agents in the process
+        self.registry = discover_registry(self.mcp_client)
+        self.tools = self.registry.openai_tools
+        self.response_templates = settings.response_templates
+        
+        # Admission per session and for the whole process; MCPClient adds its own global limit
+        self.llm_request_limiter = RateLimiter(
+            "llm_requests", settings.llm_global_rps, settings.llm_session_rps,
+            max_wait=settings.rate_limit_max_wait, metrics=self.metrics
+        )
+        self.llm_token_limiter = RateLimiter(
+            "llm_tokens", settings.llm_global_tpm / 60, settings.llm_session_tpm / 60, burst_seconds=60,
+            max_wait=settings.rate_limit_max_wait, metrics=self.metrics
+        )
+        self.mcp_session_limiter = RateLimiter(
+            "mcp_session", 0, settings.mcp_session_rps, max_wait=settings.rate_limit_max_wait, metrics=self.metrics
+        )
+        self._tools_token_estimate = len(self.registry.schemas_json) // 4
+        
+        # Customer context warmed right after authentication
+        self.prefetch_on_auth = settings.prefetch_on_auth
+        self.prefetch_cache = TTLCache(ttl=settings.prefetch_ttl, max_entries=4096)
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=settings.prefetch_workers, thread_name_prefix="prefetch"
+        )
+        
+        # Read-only tools started alongside the first LLM call when a turn predicts them
+        self.speculative_tools = settings.speculative_tools
+        
+        # Order reads keyed by the authenticated customer_id, never by LLM-supplied values
+        if store is not None:
+            # Shared so an order placed through one worker invalidates reads on all of them
+            self.order_cache = StoreCache(store, "order_cache", ttl=settings.order_cache_ttl)
+        else:
+            self.order_cache = TTLCache(ttl=settings.order_cache_ttl, max_entries=settings.order_cache_max_entries)
+        # customer_id -> [generation, reads in flight]; entries live only while a read is in flight
+        self._order_reads: Dict[str, List[int]] = {}
+        self._order_reads_lock = threading.Lock()
+        
+        # Opt-in: prices and stock for create_order come from the catalog, not the LLM
+        self.catalog_pricing = settings.catalog_pricing
+        self.catalog = Catalog(self.mcp_client, ttl=settings.catalog_ttl, metrics=self.metrics)
+        
+        # Opt-in: lone create_order calls are acknowledged at once and placed in the background
+        self.async_orders = settings.async_orders
+        self.order_pipeline = OrderPipeline(self._place_order, workers=settings.order_workers, metrics=self.metrics)
+        
+        settings.subscribe(self._apply_settings)
     
-    def _define_tools(self) -> List[Dict[str, Any]]:
-        """Define tool schemas for OpenAI function calling."""
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_products",
-                    "description": "List products with optional filters by category or active status",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "category": {
-                                "type": "string",
-                                "description": "Filter by category (e.g., 'Computers', 'Monitors', 'Printers')"
-                            },
-                            "is_active": {
-                                "type": "boolean",
-                                "description": "Filter by active status"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_product",
-                    "description": "Get detailed product information by SKU",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "sku": {
-                                "type": "string",
-                                "description": "Product SKU (e.g., 'COM-0001', 'MON-0054')"
-                            }
-                        },
-                        "required": ["sku"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_products",
-                    "description": "Search products by name or description keyword",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "Search term (case-insensitive, partial match)"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_customer",
-                    "description": "Get customer information by customer ID. Requires authentication.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "customer_id": {
-                                "type": "string",
-                                "description": "Customer UUID"
-                            }
-                        },
-                        "required": ["customer_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_orders",
-                    "description": "List orders with optional filters. Requires authentication.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "customer_id": {
-                                "type": "string",
-                                "description": "Filter by customer UUID"
-                            },
-                            "status": {
-                                "type": "string",
-                                "description": "Filter by status: draft, submitted, approved, fulfilled, cancelled"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_order",
-                    "description": "Get detailed order information including items. Requires authentication.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "order_id": {
-                                "type": "string",
-                                "description": "Order UUID"
-                            }
-                        },
-                        "required": ["order_id"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_order",
-                    "description": "Create a new order with items. Requires authentication.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "customer_id": {
-                                "type": "string",
-                                "description": "Customer UUID"
-                            },
-                            "items": {
-                                "type": "array",
-                                "description": "List of order items",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "sku": {"type": "string"},
-                                        "quantity": {"type": "integer"},
-                                        "unit_price": {"type": "string"},
-                                        "currency": {"type": "string", "default": "USD"}
-                                    },
-                                    "required": ["sku", "quantity", "unit_price"]
-                                }
-                            }
-                        },
-                        "required": ["customer_id", "items"]
-                    }
-                }
-            }
-        ]
+    def _apply_settings(self, current: Settings):
+        """Pick up hot-reloaded settings."""
+        self.router.main_model = current.openai_model
+        self.router.fast_model = current.openai_fast_model or current.openai_model
+        self.router.small_output_chars = current.router_small_output_chars
+        self.response_templates = current.response_templates
+        self.prefetch_on_auth = current.prefetch_on_auth
+        self.prefetch_cache.ttl = current.prefetch_ttl
+        self.speculative_tools = current.speculative_tools
+        self.order_cache.ttl = current.order_cache_ttl
+        if isinstance(self.order_cache, TTLCache):
+            self.order_cache.max_entries = current.order_cache_max_entries
+        self.catalog_pricing = current.catalog_pricing
+        self.catalog.ttl = current.catalog_ttl
+        self.async_orders = current.async_orders
+        self.llm_request_limiter.configure(current.llm_global_rps, current.llm_session_rps, current.rate_limit_max_wait)
+        self.llm_token_limiter.configure(
+            current.llm_global_tpm / 60, current.llm_session_tpm / 60, current.rate_limit_max_wait
+        )
+        self.mcp_session_limiter.configure(0, current.mcp_session_rps, current.rate_limit_max_wait)
     
     def _requires_auth(self, tool_name: str) -> bool:
         """Check if tool requires authentication."""
-        auth_required_tools = ["get_customer", "list_orders", "get_order", "create_order"]
-        return tool_name in auth_required_tools
+        spec = self.registry.get(tool_name)
+        # Unknown tools are treated as sensitive
+        return spec is None or spec.policy.requires_auth
     
     def _get_customer_id(self, session_id: str) -> Optional[str]:
         """Get customer_id from authenticated session."""
@@ -178,30 +128,256 @@ class SupportAgent:
             return None
         return self.auth_handler.get_customer_id(session_id)
     
-    def process_message(self, session_id: str, user_message: str, conversation_history: List[Dict[str, str]]) -> str:
+    @staticmethod
+    def _cache_key(scope: str, tool_name: str, tool_args: Dict[str, Any]) -> tuple:
+        """Build a cache key for a tool call scoped to a session or customer."""
+        return (scope, tool_name, json.dumps(tool_args, sort_keys=True))
+    
+    @staticmethod
+    def _extract_content(result: Dict[str, Any]) -> str:
+        """Extract text content from an MCP tool result."""
+        if "content" in result and len(result["content"]) > 0:
+            return result["content"][0].get("text", str(result))
+        elif "structuredContent" in result:
+            return result["structuredContent"].get("result", str(result))
+        return str(result)
+    
+    def prefetch_customer_context(self, session_id: str):
+        """Warm get_customer and list_orders for a freshly authenticated session."""
+        if not self.prefetch_on_auth:
+            return
+        customer_id = self._get_customer_id(session_id)
+        if not customer_id:
+            return
+        
+        for tool_name in ("get_customer", "list_orders"):
+            tool_args = {"customer_id": customer_id}
+            future = self._prefetch_executor.submit(self.mcp_client.call_tool, tool_name, tool_args)
+            # Cache the future itself so a request racing the prefetch waits for it
+            self.prefetch_cache.set(self._cache_key(session_id, tool_name, tool_args), future)
+    
+    def _start_speculation(self, session_id: str) -> Dict[tuple, Future]:
+        """Start predicted read-only tool calls for an authenticated order turn."""
+        speculative: Dict[tuple, Future] = {}
+        customer_id = self._get_customer_id(session_id)
+        if not customer_id:
+            return speculative
+        for tool_name in self.speculative_tools:
+            spec = self.registry.get(tool_name)
+            # Only calls whose arguments we can predict exactly and that change nothing
+            if spec is None or spec.policy.mutates_orders or not spec.policy.inject_customer_id:
+                continue
+            tool_args = spec.validate({"customer_id": customer_id})
+            key = self._cache_key(session_id, tool_name, tool_args)
+            speculative[key] = self._prefetch_executor.submit(self._call_tool, session_id, tool_name, tool_args)
+            self.metrics.incr("speculation_started")
+        return speculative
+    
+    def _finish_speculation(self, speculative: Dict[tuple, Future]):
+        """Drop speculative calls the model did not ask for."""
+        for future in speculative.values():
+            future.cancel()
+            self.metrics.incr("speculation_wasted")
+        speculative.clear()
+    
+    def invalidate_session(self, session_id: str):
+        """Drop everything cached for a session."""
+        self.prefetch_cache.invalidate_scope(session_id)
+    
+    def invalidate_customer_orders(self, customer_id: str):
+        """Drop cached order reads for one customer."""
+        # Bumping the generation stops reads already in flight from caching stale data
+        with self._order_reads_lock:
+            reads = self._order_reads.get(customer_id)
+            if reads is not None:
+                reads[0] += 1
+        self.order_cache.invalidate_scope(customer_id)
+    
+    def _begin_order_read(self, customer_id: str) -> int:
+        """Register a cacheable read in flight; returns the generation to pass to ``_end_order_read``."""
+        with self._order_reads_lock:
+            reads = self._order_reads.setdefault(customer_id, [0, 0])
+            reads[1] += 1
+            return reads[0]
+    
+    def _end_order_read(self, customer_id: str, generation: int) -> bool:
+        """Finish a read; True if no invalidation happened while it was in flight."""
+        with self._order_reads_lock:
+            reads = self._order_reads[customer_id]
+            reads[1] -= 1
+            current = reads[0] == generation
+            if reads[1] == 0:
+                del self._order_reads[customer_id]
+            return current
+    
+    def _call_tool(self, session_id: str, tool_name: str, tool_args: Dict[str, Any]) -> str:
+        """Call an MCP tool, serving prefetched or cached results when available."""
+        key = self._cache_key(session_id, tool_name, tool_args)
+        cached: Optional[Future] = self.prefetch_cache.get(key)
+        if cached is not None:
+            try:
+                return self._extract_content(cached.result(timeout=settings.mcp_timeout))
+            except Exception:
+                # Prefetch failed; fall back to a live call
+                self.prefetch_cache.pop(key)
+        
+        spec = self.registry.get(tool_name)
+        policy = spec.policy if spec else DEFAULT_POLICY
+        customer_id = self._get_customer_id(session_id)
+        order_key = None
+        if customer_id and policy.cacheable:
+            order_key = self._cache_key(customer_id, tool_name, tool_args)
+            content = self.order_cache.get(order_key)
+            if content is not None:
+                return content
+            generation = self._begin_order_read(customer_id)
+        
+        current = False
+        try:
+            self.mcp_session_limiter.acquire(session_id)
+            result = self.mcp_client.call_tool(
+                tool_name, tool_args, timeout=policy.timeout or settings.mcp_timeout, hedge=policy.idempotent
+            )
+        finally:
+            if order_key is not None:
+                current = self._end_order_read(customer_id, generation)
+            if policy.mutates_orders:
+                # Write-through: even a failed write may have landed, so drop stale reads
+                self.invalidate_session(session_id)
+                if customer_id:
+                    self.invalidate_customer_orders(customer_id)
+        
+        content = self._extract_content(result)
+        if current and not result.get("isError"):
+            self.order_cache.set(order_key, content)
+        return content
+    
+    def _resolve_product_args(self, tool_args: Dict[str, Any]) -> Dict[str, Any]:
+        """Map typed SKUs and names to catalog SKUs, locally; search terms are left to the server."""
+        resolver = self.catalog.resolver()
+        if resolver is None:
+            return tool_args
+        sku = tool_args.get("sku")
+        if isinstance(sku, str):
+            try:
+                resolved = resolver.resolve_sku(sku)
+            except ToolArgumentError:
+                self.metrics.incr("resolver.suggested")
+                raise
+            if resolved != sku:
+                self.metrics.incr("resolver.corrected")
+            tool_args = dict(tool_args, sku=resolved)
+        return tool_args
+    
+    def _search_corrected(self, session_id: str, tool_name: str, tool_args: Dict[str, Any], content: str) -> str:
+        """Retry a search that found nothing with misspelled words corrected, saying so in the result.
+
+        Only empty searches are retried: the server also matches descriptions
+        and categories, which the resolver's name vocabulary does not know.
+        """
+        query = tool_args["query"]
+        resolver = self.catalog.resolver()
+        corrected = resolver.correct_query(query) if resolver is not None else query
+        if corrected == query:
+            return content
+        retried = self._call_tool(session_id, tool_name, dict(tool_args, query=corrected))
+        if is_empty_listing(retried):
+            return content
+        self.metrics.incr("resolver.corrected")
+        return f"No products matched '{query}'. Showing results for '{corrected}' instead:\n{retried}"
+    
+    def _after_order(self, tool_args: Dict[str, Any], content: Optional[str]):
+        """Keep the catalog snapshot in step with an order attempt; ``content`` None means the call raised."""
+        if content is None or content.startswith("Error"):
+            # The server disagreed with the snapshot (e.g. stock); refresh before the next order
+            self.catalog.invalidate()
+        else:
+            self.catalog.record_order(tool_args["items"])
+    
+    def _place_order(self, session_id: str, tool_args: Dict[str, Any]) -> str:
+        """Place a prepared order; runs on an OrderPipeline worker."""
+        try:
+            content = self._call_tool(session_id, "create_order", tool_args)
+        except Exception:
+            self._after_order(tool_args, None)
+            raise
+        self._after_order(tool_args, content)
+        return content
+    
+    def _acknowledge_order(self, session_id: str, tool_args: Dict[str, Any], user_message: str) -> str:
+        """Queue a prepared order and reply with its pending reference."""
+        # A repeat of this turn (double submit, client retry) reuses the pending order
+        order = self.order_pipeline.submit(session_id, tool_args, turn=user_message)
+        products = self.catalog.snapshot() if self.catalog_pricing else {}
+        names = {item["sku"]: products[item["sku"]].name for item in tool_args["items"] if item["sku"] in products}
+        return render_acknowledgment(order, names)
+    
+    def order_updates(self, session_id: str) -> List[str]:
+        """Messages for background orders of ``session_id`` that finished since the last call."""
+        return [render_outcome(order) for order in self.order_pipeline.drain(session_id)]
+    
+    def _complete(self, session_id: str, route, **kwargs) -> Any:
+        """Admit an LLM call against request and token budgets, then run it on ``route``."""
+        estimate = COMPLETION_TOKEN_ESTIMATE + sum(
+            len((m.get("content") if isinstance(m, dict) else getattr(m, "content", None)) or "")
+            for m in kwargs["messages"]
+        ) // 4
+        if kwargs.get("tools"):
+            estimate += self._tools_token_estimate
+        self.llm_request_limiter.acquire(session_id)
+        self.llm_token_limiter.acquire(session_id, estimate)
+        response = self.router.complete(self.client, route, **kwargs)
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.llm_token_limiter.adjust(session_id, usage.total_tokens - estimate)
+        return response
+    
+    def _render_template(self, spec, content: str) -> Optional[str]:
+        """Render a lone tool result without the LLM, or None to fall back to it."""
+        if spec.name not in self.response_templates or not spec.policy.templated:
+            return None
+        template = TEMPLATES.get(spec.name)
+        if template is None or content.startswith("Error"):
+            return None
+        return template(content)
+    
+    def process_message(self, session_id: str, user_message: str, conversation_history: Sequence[Mapping[str, str]], classification: Optional[Classification] = None) -> str:
         """Process user message and return response."""
         # Get authentication status
         is_authenticated = self.auth_handler.is_authenticated(session_id)
         customer_email = self.auth_handler.get_email(session_id) if is_authenticated else None
         
+        # Callers that already classified the message pass the result along
+        if classification is None:
+            classification = classify(user_message)
+        self.metrics.incr(f"messages.{classification.kind}")
+        
         # Check if message is about authentication
-        if "email" in user_message.lower() and "pin" in user_message.lower():
-            # Try to extract email and PIN from message
-            # This is a simple approach - in production, use structured input
+        if classification.kind == AUTH:
+            # Credentials are handled by the UI before reaching the agent; this is a question about them
             return "To authenticate, please provide your email and PIN in the format: 'email: your@email.com, pin: 1234'"
         
         # Check if query might need authentication
-        order_keywords = ["order", "purchase", "buy", "my orders", "order history", "track order", "place order"]
-        needs_auth = any(keyword in user_message.lower() for keyword in order_keywords)
+        needs_auth = classification.kind == ORDER
         
         if needs_auth and not is_authenticated:
             return "To access your orders, I need to verify your identity. Please provide your email and PIN in this format: 'email: your@email.com, pin: 1234'"
         
+        # Hide the MCP latency of predicted order reads behind the first LLM call
+        speculative: Dict[tuple, Future] = {}
+        if needs_auth and self.speculative_tools:
+            speculative = self._start_speculation(session_id)
+        
         # Process with LLM (all API calls are automatically logged in OpenAI Platform under Logs → Completions)
-        response_text = self._process_with_llm(session_id, user_message, conversation_history, is_authenticated, customer_email)
+        try:
+            response_text = self._process_with_llm(
+                session_id, user_message, conversation_history, is_authenticated, customer_email, speculative
+            )
+        finally:
+            self._finish_speculation(speculative)
         return response_text
     
-    def _process_with_llm(self, session_id: str, user_message: str, conversation_history: List[Dict[str, str]], is_authenticated: bool, customer_email: Optional[str]) -> str:
+    def _process_with_llm(self, session_id: str, user_message: str, conversation_history: Sequence[Mapping[str, str]], is_authenticated: bool, customer_email: Optional[str], speculative: Optional[Dict[tuple, Future]] = None) -> str:
         """Internal method to process message with LLM."""
         # Build system message with authentication status
         auth_status = "authenticated" if is_authenticated else "not authenticated"
@@ -214,33 +390,39 @@ You can help customers with:
 Current session status: """ + auth_status
         if customer_email:
             system_content += f"\nAuthenticated customer: {customer_email}"
-        system_content += """
+        pending = self.order_pipeline.pending(session_id)
+        if pending:
+            # Not visible through list_orders until the server has them
+            system_content += "\nOrders still being placed (not yet in list_orders): " + "; ".join(
+                order.summary() for order in pending
+            )
+        if self.catalog_pricing:
+            order_instruction = "call create_order directly with SKUs and quantities; prices and stock are filled in for you"
+        else:
+            order_instruction = "pass each item's current price from get_product as unit_price to create_order"
+        system_content += f"""
 
 IMPORTANT INSTRUCTIONS:
 - When a customer asks to see/list/show their orders, use the list_orders tool directly
 - When a customer asks about a specific order, use the get_order tool
+- To place an order, {order_instruction}
 - The customer_id is already set for authenticated sessions - you don't need to provide it
 - Be friendly, professional, and helpful. Provide clear, concise answers."""
         
+        # Built in one pass; stored history messages are passed through as-is, not copied
         messages = [
-            {
-                "role": "system",
-                "content": system_content
-            }
+            {"role": "system", "content": system_content},
+            *conversation_history,
+            {"role": "user", "content": user_message}
         ]
         
-        # Add conversation history
-        messages.extend(conversation_history)
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
-        
         try:
             # Call OpenAI with tool calling
             # Note: For standard OpenAI Python SDK, API calls appear in Logs -> Completions
             # The Traces tab is for OpenAI Agents SDK (JavaScript/TypeScript)
-            response = self.client.chat.completions.create(
-                model=self.model,
+            route = self.router.for_selection(is_authenticated, len(conversation_history))
+            response = self._complete(
+                session_id, route,
                 messages=messages,
                 tools=self.tools,
                 tool_choice="auto"
@@ -251,12 +433,34 @@ IMPORTANT INSTRUCTIONS:
             # Handle tool calls
             if message.tool_calls:
                 tool_results = []
+                mutated = False
                 for tool_call in message.tool_calls:
                     tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
+                    spec = self.registry.get(tool_name)
+                    
+                    if spec is None or not spec.policy.exposed:
+                        tool_results.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call.id,
+                            "name": tool_name,
+                            "content": f"Error: Unknown tool '{tool_name}'."
+                        })
+                        continue
+                    
+                    try:
+                        tool_args = json.loads(tool_call.function.arguments or "{}")
+                    except ValueError:
+                        self.metrics.incr("tool_calls_rejected")
+                        tool_results.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call.id,
+                            "name": tool_name,
+                            "content": "Error: Invalid arguments: not valid JSON"
+                        })
+                        continue
                     
                     # Check authentication for order-related tools
-                    if self._requires_auth(tool_name) and not self.auth_handler.is_authenticated(session_id):
+                    if spec.policy.requires_auth and not self.auth_handler.is_authenticated(session_id):
                         tool_results.append({
                             "role": "tool",
                             "tool_call_id": tool_call.id,
@@ -266,12 +470,12 @@ IMPORTANT INSTRUCTIONS:
                         continue
                     
                     # Inject customer_id for order-related tools
-                    if self._requires_auth(tool_name):
+                    if spec.policy.requires_auth:
                         customer_id = self._get_customer_id(session_id)
                         if customer_id:
                             # ALWAYS replace customer_id with the authenticated UUID
                             # Don't trust what the LLM provides - it may provide email instead
-                            if tool_name in ["list_orders", "get_customer", "create_order"]:
+                            if spec.policy.inject_customer_id:
                                 tool_args["customer_id"] = customer_id
                         else:
                             # If customer_id is not available, don't call the tool
@@ -284,17 +488,66 @@ IMPORTANT INSTRUCTIONS:
                             })
                             continue
                     
+                    # Reject or repair malformed arguments locally instead of spending an MCP round-trip
+                    try:
+                        if spec.policy.resolves_products:
+                            # Typos and partial names get a catalog SKU or ranked suggestions, not a server error
+                            tool_args = self._resolve_product_args(tool_args)
+                        tool_args = spec.validate(tool_args)
+                        if spec.policy.catalog_priced and self.catalog_pricing:
+                            # One batched catalog lookup replaces per-item get_product calls
+                            tool_args = self.catalog.prepare_order(tool_args)
+                    except ToolArgumentError as e:
+                        self.metrics.incr("tool_calls_rejected")
+                        tool_results.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call.id,
+                            "name": tool_name,
+                            "content": f"Error: Invalid arguments: {str(e)}"
+                        })
+                        continue
+                    except (MCPError, MCPUnavailable) as e:
+                        # A catalog lookup failed; report it for this call and keep the step's other calls
+                        tool_results.append({
+                            "role": "tool",
+                            "tool_call_id": tool_call.id,
+                            "name": tool_name,
+                            "content": f"Error: {str(e)}"
+                        })
+                        continue
+                    
+                    if spec.policy.catalog_priced and self.async_orders and len(message.tool_calls) == 1:
+                        # The order write and the LLM's confirmation round happen off the turn
+                        self.metrics.incr("llm_calls_saved")
+                        return self._acknowledge_order(session_id, tool_args, user_message)
+                    
                     # Call MCP tool
+                    mutated = mutated or spec.policy.mutates_orders
                     try:
-                        result = self.mcp_client.call_tool(tool_name, tool_args)
+                        key = self._cache_key(session_id, tool_name, tool_args)
+                        future = speculative.pop(key, None) if speculative else None
+                        content = None
+                        if future is not None:
+                            self.metrics.incr("speculation_hits")
+                            try:
+                                content = future.result(timeout=spec.policy.timeout or settings.mcp_timeout)
+                            except Exception:
+                                # Speculative call failed; retry it for real
+                                content = None
+                        if content is None:
+                            content = self._call_tool(session_id, tool_name, tool_args)
+                        if (spec.policy.resolves_products and isinstance(tool_args.get("query"), str)
+                                and is_empty_listing(content)):
+                            # Misspellings are corrected only when the user's own query found nothing
+                            content = self._search_corrected(session_id, tool_name, tool_args, content)
+                        if spec.policy.catalog_priced:
+                            self._after_order(tool_args, content)
                         
-                        # Extract text content from result
-                        if "content" in result and len(result["content"]) > 0:
-                            content = result["content"][0].get("text", str(result))
-                        elif "structuredContent" in result:
-                            content = result["structuredContent"].get("result", str(result))
-                        else:
-                            content = str(result)
+                        if len(message.tool_calls) == 1:
+                            rendered = self._render_template(spec, content)
+                            if rendered is not None:
+                                self.metrics.incr("llm_calls_saved")
+                                return rendered
                         
                         tool_results.append({
                             "role": "tool",
@@ -302,7 +555,11 @@ IMPORTANT INSTRUCTIONS:
                             "name": tool_name,
                             "content": content
                         })
+                    except RateLimited:
+                        raise
                     except Exception as e:
+                        if spec.policy.catalog_priced:
+                            self._after_order(tool_args, None)
                         tool_results.append({
                             "role": "tool",
                             "tool_call_id": tool_call.id,
@@ -315,14 +572,18 @@ IMPORTANT INSTRUCTIONS:
                 messages.extend(tool_results)
                 
                 # Final response - automatically traced
-                final_response = self.client.chat.completions.create(
-                    model=self.model,
+                final_response = self._complete(
+                    session_id, self.router.for_answer(tool_results, mutated),
                     messages=messages
                 )
                 
                 return final_response.choices[0].message.content
             else:
                 return message.content
+        except RateLimited:
+            # Shed quickly instead of queueing into an upstream 429 or timeout
+            self.metrics.incr("busy_replies")
+            return BUSY_MESSAGE
         except Exception as e:
             return f"I apologize, but I encountered an error: {str(e)}. Please try again."
 
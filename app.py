@@ -1,70 +1,200 @@
 """Gradio UI for customer support chatbot."""
+import hashlib
+import threading
 import gradio as gr
-import re
-from typing import Optional
-from agent import SupportAgent
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from agent import BUSY_MESSAGE, SupportAgent
+from cache import TTLCache
 from mcp_client import MCPClient
 from auth import AuthHandler
 from memory import SessionMemory
+from classifier import classify, redact_pin
+from ratelimit import RateLimited
+from store import SharedStore
+from transcript import TranscriptWriter
+from profiling import profiler
+from memstats import MemoryAccountant
+from config import settings
 
 
 # Initialize components
+# Multi-worker deployments (see launcher.py) share sessions, auth and caches through SQLite
+store = SharedStore(settings.state_db) if settings.state_backend == "sqlite" else None
 mcp_client = MCPClient()
-auth_handler = AuthHandler(mcp_client)
-memory = SessionMemory()
-agent = SupportAgent(mcp_client, auth_handler)
+auth_handler = AuthHandler(mcp_client, store=store)
+memory = SessionMemory(store=store)
+agent = SupportAgent(mcp_client, auth_handler, store=store)
+# Written from a background thread; append() only enqueues
+transcript = TranscriptWriter(settings.transcript_dir) if settings.transcript_dir else None
+# Turns by turn_key(): running turns' Futures, never evicted, and recently finished ones,
+# so double-submits reuse them
+in_flight_turns: Dict[Tuple[str, str], Future] = {}
+recent_turns = TTLCache(ttl=settings.turn_dedupe_window, max_entries=4096)
+turns_lock = threading.Lock()
+
+
+def record_turn(session_id: str, message: str, response: str):
+    """Append a turn to the transcript log, if enabled."""
+    if transcript is None:
+        return
+    # Never persist PINs
+    transcript.append(session_id, "user", redact_pin(message))
+    transcript.append(session_id, "assistant", response)
+
+
+def build_memory_accountant() -> MemoryAccountant:
+    """Components reported by /admin/memory; with the SQLite backend, sessions and auth live in the store."""
+    accountant = MemoryAccountant()
+    accountant.ignore(mcp_client)
+    if store is not None:
+        accountant.ignore(store)
+    accountant.register("session_memory", lambda: memory)
+    accountant.register("auth_state", lambda: auth_handler)
+    accountant.register("recent_turns", lambda: (in_flight_turns, recent_turns))
+    accountant.register("prefetch_cache", lambda: agent.prefetch_cache)
+    accountant.register("order_cache", lambda: agent.order_cache)
+    accountant.register("metrics", lambda: agent.metrics)
+    accountant.register("catalog", lambda: agent.catalog)
+    accountant.register("order_pipeline", lambda: agent.order_pipeline)
+    accountant.register("tool_registry", lambda: agent.registry)
+    if transcript is not None:
+        accountant.register("transcript", lambda: transcript)
+    return accountant
 
 
 def parse_auth(message: str) -> tuple[Optional[str], Optional[str]]:
     """Parse email and PIN from message."""
-    email_pattern = r'email:\s*([^\s,]+)'
-    pin_pattern = r'pin:\s*(\d{4})'
-    
-    email_match = re.search(email_pattern, message, re.IGNORECASE)
-    pin_match = re.search(pin_pattern, message, re.IGNORECASE)
-    
-    email = email_match.group(1) if email_match else None
-    pin = pin_match.group(1) if pin_match else None
-    
-    return email, pin
+    classification = classify(message)
+    return classification.email, classification.pin
+
+
+def turn_key(session_id: str, message: str) -> Tuple[str, str]:
+    """Idempotency key of a turn: the session plus a digest of the message text."""
+    return session_id, hashlib.sha256(message.strip().encode()).hexdigest()
 
 
-def chat_response(message, history, session_id):
-    """Handle chat message and return response."""
+def chat_response(message: str, session_id: str) -> Optional[str]:
+    """Handle a chat message; the turn is stored in session memory and the reply returned.
+
+    With ``turn_dedupe_window`` set (it is opt-in), the same message sent
+    again in the same session within that many seconds of the first turn
+    finishing, or while it runs (Enter plus click, a client retry), is not
+    run again: it waits for the first turn, if still running, and gets its reply.
+    """
     if not message:
-        return history, ""
+        return None
+    window = settings.turn_dedupe_window
+    if window <= 0:
+        return _profiled_turn(message, session_id)
     
-    # Check if message contains authentication
-    email, pin = parse_auth(message)
-    if email and pin:
-        # Attempt authentication
+    key = turn_key(session_id, message)
+    with turns_lock:
+        first = in_flight_turns.get(key) or recent_turns.get(key)
+        if first is None:
+            future: Future = Future()
+            in_flight_turns[key] = future
+    if first is not None:
+        agent.metrics.incr("turns_deduplicated")
+        return first.result()
+    try:
+        response = _profiled_turn(message, session_id)
+    except BaseException as e:
+        with turns_lock:
+            del in_flight_turns[key]
+        future.set_exception(e)
+        raise
+    future.set_result(response)
+    # The window starts when the turn finishes
+    with turns_lock:
+        recent_turns.set(key, future, ttl=window)
+        del in_flight_turns[key]
+    return response
+
+
+def _profiled_turn(message: str, session_id: str) -> str:
+    # No-op unless profiling is enabled in settings
+    with profiler.turn(session_id):
+        return _chat_turn(message, session_id)
+
+
+def deliver_order_updates(session_id: str) -> int:
+    """Post outcomes of background orders (see orders.py) to the session; returns how many."""
+    updates = agent.order_updates(session_id)
+    for text in updates:
+        memory.add_message(session_id, "assistant", text)
+        if transcript is not None:
+            transcript.append(session_id, "assistant", text)
+    return len(updates)
+
+
+def _login(session_id: str, email: str, pin: str) -> str:
+    """Authenticate the session and return the reply."""
+    try:
         success, msg = auth_handler.authenticate(session_id, email, pin)
-        if success:
-            response = "✅ Authentication successful! How can I help you today?"
-        else:
-            response = f"❌ Authentication failed: {msg}. Please check your email and PIN and try again."
-        
-        # Gradio 6.x format: list of dicts with role and content
-        history.append({"role": "user", "content": message})
-        history.append({"role": "assistant", "content": response})
-        memory.add_message(session_id, "user", message)
-        memory.add_message(session_id, "assistant", response)
-        return history, ""
+    except RateLimited:
+        # The credentials were never checked, so this is not a failed login
+        agent.metrics.incr("busy_replies")
+        return BUSY_MESSAGE
+    if success:
+        agent.prefetch_customer_context(session_id)
+        return "✅ Authentication successful! How can I help you today?"
+    return f"❌ Authentication failed: {msg}. Please check your email and PIN and try again."
+
+
+def _chat_turn(message: str, session_id: str) -> str:
+    """Run one chat turn."""
+    # Orders that finished since the last turn are shown before it
+    deliver_order_updates(session_id)
     
-    # Get conversation history
-    conv_history = memory.get_conversation_context(session_id)
+    # Classified once here and passed to the agent
+    classification = classify(message)
     
-    # Process message with agent
-    # All OpenAI API calls are automatically logged in OpenAI Platform under "Logs → Completions"
-    response = agent.process_message(session_id, message, conv_history)
+    # Check if message contains authentication
+    if classification.has_credentials:
+        response = _login(session_id, classification.email, classification.pin)
+    else:
+        # Get conversation history
+        conv_history = memory.get_conversation_context(session_id)
+        
+        # Process message with agent
+        # All OpenAI API calls are automatically logged in OpenAI Platform under "Logs → Completions"
+        response = agent.process_message(session_id, message, conv_history, classification)
     
-    # Update history - Gradio 6.x format
-    history.append({"role": "user", "content": message})
-    history.append({"role": "assistant", "content": response})
+    # Session memory is the only copy of the transcript; the UI is updated from it
     memory.add_message(session_id, "user", message)
     memory.add_message(session_id, "assistant", response)
-    
-    return history, ""
+    record_turn(session_id, message, response)
+    return response
+
+
+def history_delta(session_id: str, shown: int) -> Tuple[bool, List[Dict[str, str]]]:
+    """Messages the browser has not displayed yet, given that it shows the first ``shown``.
+
+    Returns ``(reset, messages)``: when the session holds fewer messages than
+    the browser shows (it was cleared), ``reset`` is True and ``messages`` is
+    the whole history to display instead.
+    """
+    reset = memory.count(session_id) < shown
+    messages = memory.get_messages(session_id) if reset else memory.get_messages_since(session_id, shown)
+    return reset, [{"role": m["role"], "content": m["content"]} for m in messages]
+
+
+# Runs in the browser: apply a history delta to the Chatbot's current value. Deltas are
+# positional (messages from index ``start``), so applying one twice or an older one late,
+# as concurrent turn and poll events can, never duplicates or drops messages
+APPLY_HISTORY_DELTA = """
+(delta, history) => {
+    history = history || [];
+    if (!delta) return history;
+    if (delta.reset) return delta.messages;
+    const merged = [...history.slice(0, delta.start), ...delta.messages];
+    return merged.length >= history.length ? merged : history;
+}
+"""
+
+# Seconds between checks for finished background orders, when async_orders is on
+ORDER_POLL_SECONDS = 2.0
 
 
 def create_interface():
@@ -95,43 +225,72 @@ def create_interface():
         # Session state - generate unique ID for each user session
         import uuid
         session_id = gr.State(value=lambda: f"session_{uuid.uuid4().hex[:16]}")
+        # How many messages the browser is showing, and the new ones to append
+        shown = gr.State(value=0)
+        delta = gr.JSON(visible="hidden")
         
         # Event handlers
-        def submit_message(message, history, session):
-            history, _ = chat_response(message, history, session)
-            return history, ""
+        # The Chatbot is never an input and never a server output: only the
+        # new messages cross the wire, so a turn's payload does not grow with the chat
+        def send_delta(session, count):
+            reset, messages = history_delta(session, count)
+            start = 0 if reset else count
+            update = {"reset": reset, "start": start, "messages": chatbot.postprocess(messages).model_dump()}
+            return update, start + len(messages)
+        
+        def submit_message(message, session, count):
+            chat_response(message, session)
+            update, count = send_delta(session, count)
+            return update, count, ""
         
         def clear_chat(session):
             memory.clear(session)
+            recent_turns.invalidate_scope(session)
             auth_handler.clear_auth(session)
-            return []  # Return empty list for Gradio 6.x
+            agent.invalidate_session(session)
+            agent.order_pipeline.discard(session)
+            return {"reset": True, "start": 0, "messages": []}, 0
         
-        submit_btn.click(
-            submit_message,
-            inputs=[msg, chatbot, session_id],
-            outputs=[chatbot, msg]
-        )
+        def poll_orders(session, count):
+            if not agent.order_pipeline.has_updates(session):
+                return gr.skip(), gr.skip()
+            deliver_order_updates(session)
+            return send_delta(session, count)
         
-        msg.submit(
-            submit_message,
-            inputs=[msg, chatbot, session_id],
-            outputs=[chatbot, msg]
-        )
+        for trigger in (submit_btn.click, msg.submit):
+            trigger(
+                submit_message,
+                inputs=[msg, session_id, shown],
+                outputs=[delta, shown, msg]
+            ).then(None, inputs=[delta, chatbot], outputs=[chatbot], js=APPLY_HISTORY_DELTA)
         
         clear_btn.click(
             clear_chat,
             inputs=[session_id],
-            outputs=[chatbot]
-        )
+            outputs=[delta, shown]
+        ).then(None, inputs=[delta, chatbot], outputs=[chatbot], js=APPLY_HISTORY_DELTA)
+        
+        # Finished background orders appear without waiting for the user's next message
+        order_poll = gr.Timer(ORDER_POLL_SECONDS, active=settings.async_orders)
+        order_poll.tick(
+            poll_orders,
+            inputs=[session_id, shown],
+            outputs=[delta, shown],
+            show_progress="hidden"
+        ).then(None, inputs=[delta, chatbot], outputs=[chatbot], js=APPLY_HISTORY_DELTA)
     
     return demo
 
 
 if __name__ == "__main__":
-    demo = create_interface()
-    demo.launch(
-        server_name="0.0.0.0",
-        server_port=7860,
-        share=False
-    )
+    import uvicorn
+    from fastapi import FastAPI
+    from admin import build_admin_router
+    
+    # Admin routes are registered before the UI mount so they take precedence
+    server = FastAPI()
+    server.include_router(build_admin_router(agent, build_memory_accountant()))
+    server = gr.mount_gradio_app(server, create_interface(), path="/")
+    settings.watch(settings.settings_watch_interval)
+    uvicorn.run(server, host=settings.app_host, port=settings.app_port)
 
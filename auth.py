@@ -2,73 +2,94 @@
 import re
 from typing import Dict, Optional, Any
 from mcp_client import MCPClient
+from ratelimit import RateLimited
+from store import SharedStore
+
+
+# verify_customer text: "Customer ID: <uuid>"; otherwise the first UUID in the text
+_CUSTOMER_ID = re.compile(r'Customer ID:\s*([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})', re.IGNORECASE)
+_UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+
+def extract_customer_id(text: str) -> Optional[str]:
+    """Customer ID from a verify_customer result text, or None."""
+    match = _CUSTOMER_ID.search(text)
+    if match:
+        return match.group(1)
+    match = _UUID.search(text)
+    return match.group(0) if match else None
 
 
 class AuthHandler:
     """Manages customer authentication state per session."""
     
-    def __init__(self, mcp_client: MCPClient):
+    def __init__(self, mcp_client: MCPClient, store: Optional[SharedStore] = None):
         self.mcp_client = mcp_client
         self.auth_state: Dict[str, Dict[str, Any]] = {}
+        # When set, auth state is shared with the other app workers
+        self.store = store
+    
+    def _get_state(self, session_id: str) -> Dict[str, Any]:
+        """Get the stored auth state for a session."""
+        if self.store is not None:
+            return self.store.get("auth", session_id, "state") or {}
+        return self.auth_state.get(session_id, {})
     
     def authenticate(self, session_id: str, email: str, pin: str) -> tuple[bool, str]:
-        """Authenticate customer and store session state."""
+        """Authenticate customer and store session state.
+
+        RateLimited propagates: a shed verification call is not a failed login.
+        """
         try:
             result = self.mcp_client.verify_customer(email, pin)
             
-            # Extract customer_id from result
             # The result contains formatted text with customer details
-            # Format: "Customer ID: <uuid>"
-            customer_id = None
             customer_info_text = ""
-            
             if "content" in result and len(result["content"]) > 0:
                 customer_info_text = result["content"][0].get("text", "")
             elif "structuredContent" in result:
                 customer_info_text = result["structuredContent"].get("result", "")
             
-            # Extract customer_id from text - look for "Customer ID: <uuid>" pattern
-            # The UUID appears after "Customer ID: " in the response
-            uuid_pattern = r'Customer ID:\s*([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})'
-            match = re.search(uuid_pattern, customer_info_text, re.IGNORECASE)
-            if match:
-                customer_id = match.group(1)
-            else:
-                # Fallback: try to find any UUID in the text
-                uuid_pattern_fallback = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
-                matches = re.findall(uuid_pattern_fallback, customer_info_text, re.IGNORECASE)
-                if matches:
-                    customer_id = matches[0]
-            
-            self.auth_state[session_id] = {
+            # Only what later turns read is kept: the raw verify_customer payload
+            # stays out of the per-session state, which exists for every session
+            state = {
                 "email": email,
                 "authenticated": True,
-                "customer_id": customer_id,
-                "customer_info": result,
-                "customer_info_text": customer_info_text
+                "customer_id": extract_customer_id(customer_info_text),
             }
+            if self.store is not None:
+                self.store.set("auth", session_id, "state", state)
+            else:
+                self.auth_state[session_id] = state
             return True, "Authentication successful"
+        except RateLimited:
+            raise
         except Exception as e:
             return False, str(e)
     
     def is_authenticated(self, session_id: str) -> bool:
         """Check if session is authenticated."""
-        return self.auth_state.get(session_id, {}).get("authenticated", False)
+        return self._get_state(session_id).get("authenticated", False)
     
     def get_email(self, session_id: str) -> Optional[str]:
         """Get authenticated email for session."""
-        return self.auth_state.get(session_id, {}).get("email")
+        return self._get_state(session_id).get("email")
     
     def get_customer_info(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get customer info for authenticated session."""
-        return self.auth_state.get(session_id, {}).get("customer_info")
+        """Get customer info (email and customer ID) for authenticated session."""
+        state = self._get_state(session_id)
+        if not state.get("authenticated"):
+            return None
+        return {"email": state.get("email"), "customer_id": state.get("customer_id")}
     
     def get_customer_id(self, session_id: str) -> Optional[str]:
         """Get customer ID for authenticated session."""
-        return self.auth_state.get(session_id, {}).get("customer_id")
+        return self._get_state(session_id).get("customer_id")
     
     def clear_auth(self, session_id: str):
         """Clear authentication for session."""
+        if self.store is not None:
+            self.store.delete("auth", session_id)
         if session_id in self.auth_state:
             del self.auth_state[session_id]
 
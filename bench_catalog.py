@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark: catalog refresh cost against the fraction of products that changed.
+
+Compares the previous refresh (parse every listing line into a new dict and
+rebuild the ProductResolver) with catalog.py's delta sync (hash each line,
+parse and apply only changed ones, update the resolver's indexes in place).
+Changes alternate between price-only edits and renames, so both the
+no-reindex and the reindex paths are exercised. The listing text itself is
+still transferred in full; there is no server-side delta API.
+
+Usage: python bench_catalog.py [--products 5000] [--rounds 5]
+"""
+import argparse
+import random
+import time
+
+from catalog import Catalog, parse_product_lines
+from resolver import ProductResolver
+from standins import MCPStandIn
+
+ADJECTIVES = ["Ultra", "Pro", "Compact", "Wireless", "Ergonomic", "Silent", "Rapid", "Slim", "Max", "Eco"]
+NOUNS = ["Monitor", "Keyboard", "Mouse", "Headset", "Webcam", "Dock", "Speaker", "Router", "Laptop", "Tablet"]
+BRANDS = ["Dell", "Logitech", "Lenovo", "Asus", "Acer", "Razer", "Corsair", "Anker", "Sony", "Philips"]
+
+
+def make_products(count: int, rng: random.Random):
+    return [
+        {
+            "sku": f"{['MON', 'ACC', 'COM', 'NET'][i % 4]}-{i:04d}",
+            "name": f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            "category": "Bench",
+            "price": round(rng.uniform(5, 2000), 2),
+            "stock": rng.randint(0, 100),
+        }
+        for i in range(count)
+    ]
+
+
+def listing(products) -> str:
+    return f"Found {len(products)} products:\n" + "\n".join(MCPStandIn._product_line(p) for p in products)
+
+
+def mutate(products, fraction: float, rng: random.Random):
+    for n, product in enumerate(rng.sample(products, int(len(products) * fraction))):
+        if n % 2:
+            product["name"] = f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product['sku']}"
+        else:
+            product["price"] = round(product["price"] * 0.9, 2)
+
+
+class Listing:
+    """MCP client stand-in serving a fixed ``list_products`` text."""
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    def call_tool(self, name, arguments):
+        return {"content": [{"type": "text", "text": self.text}]}
+
+
+def full_rebuild(text: str):
+    return ProductResolver(parse_product_lines(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{args.products} products, mean of {args.rounds} refreshes")
+    print(f"{'changed':>8} | {'full rebuild ms':>15} | {'delta sync ms':>13} | {'entries applied':>15}")
+    for fraction in (0.0, 0.01, 0.1, 1.0):
+        rng = random.Random(42)
+        products = make_products(args.products, rng)
+        source = Listing(listing(products))
+        catalog = Catalog(source, ttl=300.0)
+        catalog.resolver()
+        rebuild_s = delta_s = 0.0
+        applied_before = catalog.metrics.get("catalog.entries_applied")
+        for _ in range(args.rounds):
+            mutate(products, fraction, rng)
+            text = listing(products)
+            
+            start = time.perf_counter()
+            full_rebuild(text)
+            rebuild_s += time.perf_counter() - start
+            
+            catalog.invalidate()
+            source.text = text
+            start = time.perf_counter()
+            catalog.snapshot()
+            delta_s += time.perf_counter() - start
+        applied = (catalog.metrics.get("catalog.entries_applied") - applied_before) / args.rounds
+        print(f"{fraction:>8.0%} | {rebuild_s / args.rounds * 1000:>15.1f} | "
+              f"{delta_s / args.rounds * 1000:>13.1f} | {applied:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
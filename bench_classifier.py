@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Microbenchmark: per-message cost of the pre-LLM classifier.
+
+Compares classifier.classify (one lowercase pass, substring scans, credential
+regex only on auth-looking messages) with the checks it replaced: parse_auth's two re.search calls in app.py plus the
+lowercase/keyword scans in SupportAgent.process_message.
+
+Usage: python bench_classifier.py [--repeat 20000]
+"""
+import argparse
+import re
+import timeit
+
+from classifier import classify
+
+
+MESSAGES = [
+    "Show my orders",
+    "What's the status of my order?",
+    "email: donaldgarcia@example.net, pin: 7912",
+    "How do I log in? Do I need my email and pin?",
+    "Do you have any 27 inch monitors in stock?",
+    "Tell me about COM-0001",
+    "Thanks, that's all!",
+    "I want to place an order for two printers and a keyboard, please ship them to my office " * 3,
+]
+
+ORDER_KEYWORDS = ["order", "purchase", "buy", "my orders", "order history", "track order", "place order"]
+
+
+def previous(message: str):
+    """The checks classify() replaced, as they ran on every message."""
+    email_match = re.search(r'email:\s*([^\s,]+)', message, re.IGNORECASE)
+    pin_match = re.search(r'pin:\s*(\d{4})', message, re.IGNORECASE)
+    if email_match and pin_match:
+        return "auth"
+    if "email" in message.lower() and "pin" in message.lower():
+        return "auth"
+    if any(keyword in message.lower() for keyword in ORDER_KEYWORDS):
+        return "order"
+    return "other"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    
+    for name, fn in (("previous checks", previous), ("classify", classify)):
+        seconds = min(timeit.repeat(lambda: [fn(m) for m in MESSAGES], number=args.repeat // len(MESSAGES) or 1, repeat=5))
+        per_message = seconds / ((args.repeat // len(MESSAGES) or 1) * len(MESSAGES))
+        print(f"{name:>16}: {per_message * 1e6:6.2f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
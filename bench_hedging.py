@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark: MCP read latency with one endpoint, balanced replicas, and hedged reads.
+
+Starts local MCPStandIn replicas whose per-call latency is mostly fast with
+an occasional stall (``--stall-rate`` of calls take ``--stall-ms``), which
+is the tail hedging targets. One replica is also uniformly slower, as a
+degraded instance would be. Concurrent workers then issue get_product
+calls with ``hedge=True`` under three setups:
+
+- single:   one endpoint (the previous MCPClient)
+- balanced: all replicas, least-outstanding balancing, no hedging
+- hedged:   all replicas, balancing plus hedging past the p95
+
+Usage: python bench_hedging.py [--replicas 3] [--calls 1500] [--workers 8]
+"""
+import argparse
+import random
+import threading
+import time
+
+from config import settings
+from mcp_client import MCPClient
+from ratelimit import RateLimiter
+from standins import MCPStandIn
+
+
+def latency_model(base_ms: float, stall_rate: float, stall_ms: float, seed: int):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    
+    def draw() -> float:
+        with lock:
+            stalled = rng.random() < stall_rate
+            jitter = rng.uniform(0.8, 1.2)
+        return (stall_ms if stalled else base_ms * jitter) / 1000
+    
+    return draw
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+
+def run(client: MCPClient, calls: int, workers: int):
+    latencies = []
+    lock = threading.Lock()
+    per_worker = calls // workers
+    
+    def work():
+        own = []
+        for i in range(per_worker):
+            start = time.perf_counter()
+            client.call_tool("get_product", {"sku": "COM-0001"}, hedge=True)
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+    
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=1500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=5.0)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-ms", type=float, default=250.0)
+    args = parser.parse_args()
+    
+    servers = []
+    for i in range(args.replicas):
+        # The last replica is degraded: three times slower on every call
+        base = args.base_ms * (3 if i == args.replicas - 1 and args.replicas > 1 else 1)
+        servers.append(MCPStandIn(latency=latency_model(base, args.stall_rate, args.stall_ms, seed=i)).start())
+    urls = [server.url for server in servers]
+    original = settings._current
+    unlimited = RateLimiter("mcp", 0, 0)
+    print(f"{args.replicas} replicas, {args.calls} calls from {args.workers} workers; "
+          f"{args.stall_rate:.0%} of calls stall {args.stall_ms:.0f} ms")
+    print(f"{'setup':>9} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | {'extra calls':>11}")
+    try:
+        for name, endpoints, budget in (("single", urls[:1], 0.0), ("balanced", urls, 0.0), ("hedged", urls, 0.1)):
+            settings.update({"mcp_hedge_budget": budget})
+            client = MCPClient(url=endpoints[0], transport="http", urls=endpoints[1:], rate_limiter=unlimited)
+            client.initialize()
+            # Warm-up calls give the hedge its p95 and the pool its latencies
+            run(client, args.workers * 25, args.workers)
+            before = sum(sum(server.calls.values()) for server in servers)
+            latencies = run(client, args.calls, args.workers)
+            sent = sum(sum(server.calls.values()) for server in servers) - before
+            extra = sent / len(latencies) - 1
+            print(f"{name:>9} | {percentile(latencies, 50) * 1000:>7.1f} | {percentile(latencies, 95) * 1000:>7.1f} | "
+                  f"{percentile(latencies, 99) * 1000:>7.1f} | {max(latencies) * 1000:>7.1f} | {extra:>11.1%}")
+            client.close()
+    finally:
+        settings._current = original
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Benchmark: per-turn chat history payload against conversation length.
+
+Compares the previous wiring, where the Chatbot value was an event input and
+output (the browser uploads the whole history and the server postprocesses
+and returns it on every turn), with the delta wiring in app.py, where the
+server reads only the new messages from session memory and sends those.
+
+Usage: python bench_history.py [--turns 10 50 200 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+
+import gradio as gr
+
+from memory import SessionMemory
+
+
+USER = "Can you check the status of my order ORD-{:05d} and tell me when it ships?"
+ASSISTANT = ("Your order ORD-{:05d} was placed on 2024-03-02 and is currently **processing**. "
+             "It contains 2 items totalling $349.98 and should ship within 2 business days.")
+
+
+def full_history(chatbot: gr.Chatbot, history):
+    """Previous wiring: upload the history, append the turn, postprocess and return all of it."""
+    uploaded = json.dumps(chatbot.postprocess(history).model_dump())
+    history = chatbot.preprocess(chatbot.data_model.model_validate(json.loads(uploaded)))
+    returned = json.dumps(chatbot.postprocess(history).model_dump())
+    return len(uploaded) + len(returned)
+
+
+def delta(chatbot: gr.Chatbot, memory: SessionMemory, shown: int):
+    """Delta wiring: send the messages after ``shown``."""
+    messages = memory.get_messages_since("bench", shown)
+    return len(json.dumps({"reset": False, "messages": chatbot.postprocess(messages).model_dump()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    
+    chatbot = gr.Chatbot()
+    print(f"{'turns':>6} | {'full bytes':>10} {'full ms':>8} | {'delta bytes':>11} {'delta ms':>8}")
+    for turns in args.turns:
+        memory = SessionMemory()
+        for i in range(turns):
+            memory.add_message("bench", "user", USER.format(i))
+            memory.add_message("bench", "assistant", ASSISTANT.format(i))
+        history = memory.get_messages("bench")
+        
+        results = []
+        for fn in (lambda: full_history(chatbot, history), lambda: delta(chatbot, memory, 2 * turns - 2)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                size = fn()
+                best = min(best, time.perf_counter() - start)
+            results.append((size, best * 1000))
+        (full_bytes, full_ms), (delta_bytes, delta_ms) = results
+        print(f"{turns:>6} | {full_bytes:>10,} {full_ms:>8.2f} | {delta_bytes:>11,} {delta_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
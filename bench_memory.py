@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark: session memory footprint and per-turn prompt assembly.
+
+Compares the previous storage (one dict per message, a sliced context list
+that _process_with_llm then copied into ``messages``) with memory.py's
+slotted Message records and zero-copy MessageWindow views. Message text is
+created up front and shared by both, so the byte counts are the storage
+overhead per session.
+
+Usage: python bench_memory.py [--sessions 1000] [--messages 40] [--window 10]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from memory import SessionMemory
+
+
+class PreviousMemory:
+    """SessionMemory's previous storage and context methods."""
+    
+    def __init__(self):
+        self.memories = {}
+    
+    def add_message(self, session_id, role, content):
+        if session_id not in self.memories:
+            self.memories[session_id] = []
+        self.memories[session_id].append({"role": role, "content": content})
+    
+    def get_messages(self, session_id):
+        return self.memories.get(session_id, [])
+    
+    def get_conversation_context(self, session_id, max_messages=10):
+        messages = self.get_messages(session_id)
+        return messages[-max_messages:] if len(messages) > max_messages else messages
+
+
+def previous_store(contents, sessions):
+    memory = PreviousMemory()
+    for s in range(sessions):
+        for role, content in contents:
+            memory.add_message(f"s{s}", role, content)
+    return memory
+
+
+def previous_turn(memory, session_id, window):
+    """The sliced context, then _process_with_llm's copy into the prompt list."""
+    context = memory.get_conversation_context(session_id, window)
+    messages = [{"role": "system", "content": "system prompt"}]
+    messages.extend(context)
+    messages.append({"role": "user", "content": "next question"})
+    return context, messages
+
+
+def current_store(contents, sessions):
+    memory = SessionMemory()
+    for s in range(sessions):
+        for role, content in contents:
+            memory.add_message(f"s{s}", role, content)
+    return memory
+
+
+def current_turn(memory, session_id, window):
+    context = memory.get_conversation_context(session_id, window)
+    messages = [{"role": "system", "content": "system prompt"}, *context, {"role": "user", "content": "next question"}]
+    return context, messages
+
+
+def measure(store, turn, contents, args):
+    session_ids = [f"s{s}" for s in range(args.sessions)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = store(contents, args.sessions)
+    per_session = (tracemalloc.get_traced_memory()[0] - before) / args.sessions
+    
+    tracemalloc.stop()
+    
+    # Objects still allocated while a turn's prompt is alive (the LLM call holds it)
+    turn(state, session_ids[0], args.window)
+    before = sys.getallocatedblocks()
+    held = turn(state, session_ids[0], args.window)
+    blocks = sys.getallocatedblocks() - before
+    del held
+    
+    start = time.perf_counter()
+    for session_id in session_ids * 20:
+        turn(state, session_id, args.window)
+    per_turn_us = (time.perf_counter() - start) / (len(session_ids) * 20) * 1e6
+    return per_session, blocks, per_turn_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--window", type=int, default=10)
+    args = parser.parse_args()
+    
+    contents = [("user" if i % 2 == 0 else "assistant", f"message {i} " * 8) for i in range(args.messages)]
+    print(f"{args.sessions} sessions x {args.messages} messages, window {args.window}")
+    print(f"{'':>10} | {'bytes/session':>13} | {'blocks/turn':>11} | {'µs/turn':>8}")
+    for name, store, turn in (("previous", previous_store, previous_turn), ("current", current_store, current_turn)):
+        per_session, blocks, per_turn_us = measure(store, turn, contents, args)
+        print(f"{name:>10} | {per_session:>13,.0f} | {blocks:>11} | {per_turn_us:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
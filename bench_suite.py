@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""Offline microbenchmark suite for the per-message hot paths, with regression budgets.
+
+Each benchmark times one operation (best of several repeats, in ns/op) and
+is compared with its entry in the baseline file; a result slower than the
+baseline by more than the benchmark's threshold is a regression, and the
+run exits with status 1. Results are JSON, so runs can be diffed or fed
+back in as a baseline. Everything runs in-process against the stand-ins:
+no OpenAI or MCP server is contacted (OPENAI_API_KEY may be any value).
+
+Baselines are machine-specific. After an intended performance change, or
+on a new machine, refresh them with ``--update-baseline``.
+
+Usage:
+    python bench_suite.py                       # run, compare with bench_baseline.json
+    python bench_suite.py --json results.json   # also write machine-readable results
+    python bench_suite.py --only memory         # benchmarks whose name contains "memory"
+    python bench_suite.py --update-baseline     # store this run as the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.4
+SESSIONS = 100_000
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Returns a callable that performs ``ops`` operations per call, or ``(callable, cleanup)``
+    # when it holds resources (servers, threads) to release after measuring
+    setup: Callable[[], Union[Callable[[], Any], Tuple[Callable[[], Any], Callable[[], Any]]]]
+    ops: int
+    # Allowed slowdown over the baseline, as a fraction
+    threshold: float = DEFAULT_THRESHOLD
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, ops: int, threshold: float = DEFAULT_THRESHOLD):
+    def register(setup: Callable[[], Any]):
+        BENCHMARKS.append(Benchmark(name, setup, ops, threshold))
+        return setup
+    return register
+
+
+MESSAGES = [
+    "Show my orders",
+    "What's the status of my order?",
+    "email: donaldgarcia@example.net, pin: 7912",
+    "How do I log in? Do I need my email and pin?",
+    "Do you have any 27 inch monitors in stock?",
+    "Tell me about COM-0001",
+    "Thanks, that's all!",
+    "I want to place an order for two printers and a keyboard, please ship them to my office " * 3,
+]
+
+
+@benchmark("classify.parse_auth", ops=len(MESSAGES))
+def bench_parse_auth():
+    """app.parse_auth: credentials out of every message via the classifier."""
+    from classifier import classify
+    
+    def run():
+        for message in MESSAGES:
+            classification = classify(message)
+            classification.email, classification.pin
+    return run
+
+
+@benchmark("agent.keyword_routing", ops=2, threshold=0.5)
+def bench_keyword_routing():
+    """process_message for turns answered before any LLM call (auth question, unauthenticated order)."""
+    from agent import SupportAgent
+    from auth import AuthHandler
+    from mcp_client import MCPClient
+    from standins import MCPStandIn, ScriptedLLM
+    
+    server = MCPStandIn().start()
+    try:
+        client = MCPClient(url=server.url, transport="http")
+        
+        def no_llm(messages, tools):
+            raise AssertionError("routing benchmark reached the LLM")
+        
+        agent = SupportAgent(client, AuthHandler(client), llm_client=ScriptedLLM(no_llm))
+    except BaseException:
+        server.stop()
+        raise
+    history: List[Dict[str, str]] = []
+    
+    def run():
+        agent.process_message("bench", "How do I log in? Do I need my email and pin?", history)
+        agent.process_message("bench", "Show me my recent orders", history)
+    
+    def cleanup():
+        client.close()
+        server.stop()
+    return run, cleanup
+
+
+def _filled_memory():
+    from memory import SessionMemory
+    memory = SessionMemory()
+    for s in range(SESSIONS):
+        for i in range(4):
+            memory.add_message(f"session-{s}", "user" if i % 2 == 0 else "assistant", "message text")
+    return memory
+
+
+@benchmark("memory.add_message", ops=1000, threshold=0.5)
+def bench_memory_add():
+    """add_message into one of 10^5 populated sessions."""
+    memory = _filled_memory()
+    rng = random.Random(0)
+    sessions = [f"session-{rng.randrange(SESSIONS)}" for _ in range(1000)]
+    
+    def run():
+        for session_id in sessions:
+            memory.add_message(session_id, "user", "another message")
+    return run
+
+
+@benchmark("memory.get_conversation_context", ops=1000, threshold=0.5)
+def bench_memory_context():
+    """get_conversation_context (10-message window) for one of 10^5 sessions, iterated as the prompt does."""
+    memory = _filled_memory()
+    for i in range(20):
+        memory.add_message("session-0", "user", f"message {i}")
+    rng = random.Random(1)
+    sessions = [f"session-{rng.randrange(SESSIONS)}" for _ in range(999)] + ["session-0"]
+    
+    def run():
+        for session_id in sessions:
+            list(memory.get_conversation_context(session_id, 10))
+    return run
+
+
+def _tool_text(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """A tools/call result as the stand-in server returns it."""
+    from standins import MCPStandIn
+    server = MCPStandIn()
+    try:
+        return server.handle_rpc({"id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}})["result"]
+    finally:
+        server._server.server_close()
+
+
+@benchmark("mcp.extract_content", ops=1)
+def bench_extract_content():
+    from agent import SupportAgent
+    result = _tool_text("get_product", {"sku": "MON-0054"})
+    return lambda: SupportAgent._extract_content(result)
+
+
+@benchmark("mcp.parse_product_listing", ops=1)
+def bench_parse_listing():
+    """catalog.parse_product_lines over a list_products result."""
+    from catalog import parse_product_lines
+    text = _tool_text("list_products", {})["content"][0]["text"]
+    return lambda: parse_product_lines(text)
+
+
+@benchmark("mcp.render_product", ops=1)
+def bench_render_product():
+    """templates.render_product over a get_product result (field parsing plus rendering)."""
+    from templates import render_product
+    text = _tool_text("get_product", {"sku": "MON-0054"})["content"][0]["text"]
+    return lambda: render_product(text)
+
+
+@benchmark("tools.build_registry", ops=1, threshold=0.5)
+def bench_build_registry():
+    """Tool-schema construction from a tools/list result (schema compilation, JSON encoding)."""
+    from standins import MCPStandIn
+    from tools import build_registry
+    server = MCPStandIn()
+    try:
+        discovered = server.handle_rpc({"id": 1, "method": "tools/list"})["result"]["tools"]
+    finally:
+        server._server.server_close()
+    return lambda: build_registry(discovered)
+
+
+@benchmark("auth.lookups", ops=1000)
+def bench_auth_lookups():
+    """is_authenticated plus get_customer_id, as each order turn does, over 10^5 sessions."""
+    from auth import AuthHandler
+    handler = AuthHandler(mcp_client=None)
+    for s in range(SESSIONS):
+        handler.auth_state[f"session-{s}"] = {
+            "email": f"user{s}@example.com", "authenticated": True, "customer_id": f"id-{s}",
+        }
+    rng = random.Random(2)
+    # Half the lookups are for sessions that never authenticated
+    sessions = [f"session-{rng.randrange(2 * SESSIONS)}" for _ in range(1000)]
+    
+    def run():
+        for session_id in sessions:
+            if handler.is_authenticated(session_id):
+                handler.get_customer_id(session_id)
+    return run
+
+
+def measure(bench: Benchmark, repeat: int, min_time: float) -> Dict[str, Any]:
+    """Best-of-``repeat`` ns/op, each repeat running long enough to be timed reliably."""
+    prepared = bench.setup()
+    fn, cleanup = prepared if isinstance(prepared, tuple) else (prepared, None)
+    try:
+        fn()
+        number = 1
+        while True:
+            elapsed = timeit.timeit(fn, number=number)
+            if elapsed >= min_time:
+                break
+            number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+        best = min(timeit.repeat(fn, number=number, repeat=repeat))
+    finally:
+        if cleanup is not None:
+            cleanup()
+    return {"ns_per_op": round(best / (number * bench.ops) * 1e9, 1), "ops": bench.ops * number, "threshold": bench.threshold}
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Names of benchmarks slower than their baseline by more than their threshold."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        result["baseline_ns_per_op"] = reference["ns_per_op"]
+        result["change"] = round(result["ns_per_op"] / reference["ns_per_op"] - 1, 3)
+        result["regressed"] = result["change"] > result["threshold"]
+        if result["regressed"]:
+            regressions.append(name)
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("results", {})
+
+
+def report(results: Dict[str, Any], environment: Dict[str, Any]) -> Dict[str, Any]:
+    return {"environment": environment, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default="", help="run benchmarks whose name contains this")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="write results to this file ('-' for stdout)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per timed repeat")
+    args = parser.parse_args(argv)
+    
+    baseline = load_baseline(args.baseline)
+    environment = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    results: Dict[str, Dict[str, Any]] = {}
+    log = sys.stderr if args.json == "-" else sys.stdout
+    print(f"{'benchmark':<34} {'ns/op':>12} {'baseline':>12} {'change':>8}", file=log)
+    for bench in BENCHMARKS:
+        if args.only not in bench.name:
+            continue
+        results[bench.name] = measure(bench, args.repeat, args.min_time)
+    regressions = compare(results, baseline)
+    for name, result in results.items():
+        change = f"{result['change']:+.0%}" if "change" in result else "new"
+        flag = "  REGRESSION" if result.get("regressed") else ""
+        reference = f"{result['baseline_ns_per_op']:,.1f}" if "baseline_ns_per_op" in result else "-"
+        print(f"{name:<34} {result['ns_per_op']:>12,.1f} {reference:>12} {change:>8}{flag}", file=log)
+    
+    output = report(results, environment)
+    if args.json == "-":
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.update_baseline:
+        stored = {name: {"ns_per_op": r["ns_per_op"], "threshold": r["threshold"]} for name, r in results.items()}
+        merged = dict(load_baseline(args.baseline), **stored)
+        with open(args.baseline, "w") as f:
+            json.dump(report(merged, environment), f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}", file=log)
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=log)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
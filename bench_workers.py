@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Benchmark chat-turn throughput against the number of app workers.
+
+Runs launcher.Dispatcher in front of N stand-in workers (standins.serve_chat_worker)
+and drives it with concurrent sticky clients.
+
+Usage: python bench_workers.py --workers 1 2 4 --clients 16 --turns 10
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Any, List
+
+import requests
+
+from launcher import Dispatcher, start_workers, stop_workers, wait_for_port
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(workers: int, clients: int, turns: int, turn_latency: float, cpu_ms: float, state_db: str) -> Dict[str, Any]:
+    """Measure throughput for one worker count."""
+    ports = [_free_port() for _ in range(workers)]
+    code = "import standins, sys; standins.serve_chat_worker(int(sys.argv[1]), float(sys.argv[2]), float(sys.argv[3]), sys.argv[4])"
+    commands = [[sys.executable, "-c", code, str(port), str(turn_latency), str(cpu_ms), state_db] for port in ports]
+    procs = start_workers(commands, [dict(os.environ)] * workers)
+    dispatcher = None
+    try:
+        for port in ports:
+            if not wait_for_port("127.0.0.1", port, timeout=30):
+                raise RuntimeError(f"worker on port {port} did not start")
+        dispatcher = Dispatcher([("127.0.0.1", port) for port in ports], port=0).start()
+        url = f"http://127.0.0.1:{dispatcher.port}/chat"
+        
+        pids_by_client: List[set] = [set() for _ in range(clients)]
+        latencies: List[float] = []
+        lock = threading.Lock()
+        
+        def client(i: int):
+            session = requests.Session()
+            for turn in range(turns):
+                start = time.perf_counter()
+                response = session.post(url, json={"session": f"s{i}", "message": f"turn {turn}"}, timeout=60)
+                elapsed = time.perf_counter() - start
+                pids_by_client[i].add(response.json()["pid"])
+                with lock:
+                    latencies.append(elapsed)
+        
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+        
+        latencies.sort()
+        return {
+            "workers": workers,
+            "turns": clients * turns,
+            "seconds": round(wall, 3),
+            "turns_per_second": round(clients * turns / wall, 2),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+            "sticky": all(len(pids) == 1 for pids in pids_by_client),
+        }
+    finally:
+        if dispatcher is not None:
+            dispatcher.stop()
+        stop_workers(procs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--turn-latency", type=float, default=0.05, help="Simulated LLM/MCP wait per turn (s)")
+    parser.add_argument("--cpu-ms", type=float, default=2.0, help="Python CPU time per turn (ms)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+    
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            state_db = os.path.join(tmp, f"state_{n}.db")
+            results.append(run(n, args.clients, args.turns, args.turn_latency, args.cpu_ms, state_db))
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    base = results[0]["turns_per_second"]
+    print(f"{'workers':>7} {'turns/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'sticky':>7}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['turns_per_second']:>9} {r['turns_per_second'] / base:>7.2f}x "
+              f"{r['p50_ms']:>8} {r['p99_ms']:>8} {str(r['sticky']):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""Local product catalog snapshot used to prepare orders before they reach the MCP server."""
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from decimal import Decimal, InvalidOperation
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Iterable, List, Mapping, Optional, Tuple
+from mcp_client import MCPError
+from metrics import Metrics
+from templates import parse_fields
+from validation import ToolArgumentError
+
+
+# list_products / search_products line: "SKU | Name | Category | $12.34 USD | Stock: 5 | Active"
+_PRODUCT_LINE = re.compile(
+    r"^\s*(?P<sku>[A-Z]{3}-\d{4})\s*\|\s*(?P<name>[^|]*?)\s*\|\s*(?P<category>[^|]*?)\s*\|"
+    r"\s*\$?(?P<price>[\d.,]+)\s*(?P<currency>[A-Z]{3})?\s*\|\s*Stock:\s*(?P<stock>-?\d+)\s*(?:\|\s*(?P<status>\w+))?"
+)
+_AMOUNT = re.compile(r"\$?\s*([\d.,]+)\s*([A-Z]{3})?")
+_SKU = re.compile(r"^[A-Z]{3}-\d{4}$")
+# A list_products / search_products result with nothing in it: "Found 0 products", "No products found"
+_NO_RESULTS = re.compile(r"^\s*(?:Found 0\b|No products?\b)", re.IGNORECASE)
+# How the server says a SKU does not exist (ProductNotFoundError, see MCP_SERVER_EXPLORATION.md)
+_NOT_FOUND = re.compile(r"ProductNotFound|not found", re.IGNORECASE)
+
+
+class OrderRejected(ToolArgumentError):
+    """Raised when order lines fail catalog checks; nothing is sent to the server."""
+
+
+class ProductUnreadable(Exception):
+    """Raised when the server answered for a product in a format the catalog cannot parse."""
+
+
+@dataclass(frozen=True)
+class Product:
+    sku: str
+    name: str
+    category: str
+    price: Decimal
+    currency: str
+    stock: int
+    active: bool = True
+
+
+@dataclass(frozen=True)
+class CatalogDelta:
+    """What one refresh changed, and the catalog version it produced."""
+    version: int
+    added: Tuple[str, ...] = ()
+    changed: Tuple[str, ...] = ()
+    removed: Tuple[str, ...] = ()
+    
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def _amount(text: str) -> Optional[tuple]:
+    match = _AMOUNT.search(text or "")
+    if not match:
+        return None
+    try:
+        return Decimal(match.group(1).replace(",", "")), match.group(2) or "USD"
+    except InvalidOperation:
+        return None
+
+
+def parse_product_line(line: str) -> Optional[Product]:
+    """Parse one ``list_products`` line, or None if it is not a product line."""
+    match = _PRODUCT_LINE.match(line)
+    if not match:
+        return None
+    try:
+        price = Decimal(match.group("price").replace(",", ""))
+    except InvalidOperation:
+        return None
+    status = (match.group("status") or "active").lower()
+    return Product(
+        sku=match.group("sku"),
+        name=match.group("name"),
+        category=match.group("category"),
+        price=price,
+        currency=match.group("currency") or "USD",
+        stock=int(match.group("stock")),
+        active=status != "inactive",
+    )
+
+
+def parse_product_lines(text: str) -> Dict[str, Product]:
+    """Parse ``list_products`` output into products keyed by SKU; unparseable lines are skipped."""
+    products: Dict[str, Product] = {}
+    for line in text.splitlines():
+        product = parse_product_line(line)
+        if product is not None:
+            products[product.sku] = product
+    return products
+
+
+def is_empty_listing(text: str) -> bool:
+    """True when a ``list_products`` / ``search_products`` result says nothing matched."""
+    return not text.strip() or bool(_NO_RESULTS.match(text))
+
+
+def parse_product_detail(text: str) -> Optional[Product]:
+    """Parse a ``get_product`` result, or None if it does not look like one."""
+    fields, _ = parse_fields(text)
+    amount = _amount(fields.get("price", ""))
+    if not fields.get("sku") or amount is None:
+        return None
+    try:
+        stock = int(fields.get("stock", "0").split()[0])
+    except (ValueError, IndexError):
+        stock = 0
+    return Product(
+        sku=fields["sku"],
+        name=fields.get("product", fields["sku"]),
+        category=fields.get("category", ""),
+        price=amount[0],
+        currency=amount[1],
+        stock=stock,
+        active=fields.get("status", "active").lower() != "inactive",
+    )
+
+
+class Catalog:
+    """Product snapshot from one ``list_products`` call, refreshed after ``ttl`` seconds.
+
+    SKUs missing from the snapshot (new products, or no snapshot because the
+    listing failed) are looked up individually with ``get_product``; those
+    results are kept for ``ttl`` seconds beside the snapshot, not in it.
+    Prices are authoritative; stock is a hint, since the server re-checks it,
+    so an order that looks short is re-checked with ``get_product`` before
+    it is refused.
+
+    Refreshes are delta-synced: each listing line is hashed, and only lines
+    whose hash changed are parsed and applied. ``version`` increases when a
+    refresh changes anything and ``entry_version(sku)`` when that product
+    does, so dependent caches can key on them; ``subscribe`` listeners
+    receive each non-empty CatalogDelta.
+
+    The products mapping is copy-on-write: every change builds a new dict
+    and swaps it in, so a mapping returned by ``snapshot`` never changes
+    under its reader. The listing is fetched outside the lock by one caller
+    at a time; the others keep using the current snapshot meanwhile.
+    """
+    
+    def __init__(self, mcp_client, ttl: float = 300.0, metrics: Optional[Metrics] = None):
+        self.mcp_client = mcp_client
+        self.ttl = ttl
+        self.metrics = metrics or Metrics()
+        # Never mutated once published; changes swap in a new dict
+        self._products: Mapping[str, Product] = MappingProxyType({})
+        # SKU -> (expires, product) for get_product fallbacks
+        self._fetched: Dict[str, Tuple[float, Product]] = {}
+        self._hashes: Dict[str, Optional[int]] = {}
+        self._entry_versions: Dict[str, int] = {}
+        self.version = 0
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._listeners: List[Callable[[CatalogDelta], None]] = []
+        self._resolver = None
+    
+    @staticmethod
+    def _text(result: Dict[str, Any]) -> str:
+        if result.get("content"):
+            return result["content"][0].get("text", "")
+        return (result.get("structuredContent") or {}).get("result", "")
+    
+    def subscribe(self, listener: Callable[[CatalogDelta], None]):
+        """Call ``listener(delta)`` after every refresh that changed something."""
+        self._listeners.append(listener)
+    
+    def entry_version(self, sku: str) -> int:
+        """Catalog version at which ``sku`` last changed (0 if never seen)."""
+        return self._entry_versions.get(sku, 0)
+    
+    def _stale(self) -> bool:
+        return self.ttl > 0 and (self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl)
+    
+    def snapshot(self) -> Mapping[str, Product]:
+        """Current products by SKU (read-only), refreshing first if the snapshot is older than ``ttl``."""
+        if self._stale():
+            # One caller refreshes; the others use the current snapshot, or wait if there is none yet
+            if self._refresh_lock.acquire(blocking=not self._products):
+                try:
+                    if self._stale():
+                        self._refresh()
+                finally:
+                    self._refresh_lock.release()
+        return self._products
+    
+    def _refresh(self):
+        try:
+            text = self._text(self.mcp_client.call_tool("list_products", {}))
+        except Exception:
+            # Keep the previous snapshot; missing SKUs fall back to get_product
+            self.metrics.incr("catalog.refresh_failed")
+            text = None
+        with self._lock:
+            if text is not None:
+                self._apply_listing(text)
+            self._loaded_at = time.monotonic()
+    
+    def _apply_listing(self, text: str) -> CatalogDelta:
+        """Diff a ``list_products`` listing against the snapshot and apply only what changed; call with the lock held."""
+        lines: Dict[str, str] = {}
+        for line in text.splitlines():
+            sku = line.split("|", 1)[0].strip()
+            if _SKU.match(sku):
+                lines[sku] = line
+        if not lines:
+            # An empty or unrecognized listing is treated as a failed refresh, not as "everything removed"
+            self.metrics.incr("catalog.refresh_failed")
+            return CatalogDelta(self.version)
+        
+        products = dict(self._products)
+        added: List[str] = []
+        changed: List[str] = []
+        for sku, line in lines.items():
+            digest = hash(line)
+            if self._hashes.get(sku) == digest:
+                continue
+            product = parse_product_line(line)
+            if product is None:
+                continue
+            (changed if sku in products else added).append(sku)
+            self._hashes[sku] = digest
+            products[sku] = product
+        removed = [sku for sku in self._hashes if sku not in lines]
+        for sku in removed:
+            del self._hashes[sku]
+            products.pop(sku, None)
+        if added or changed or removed:
+            self._products = MappingProxyType(products)
+        # Fallback results are superseded by the listing, or dropped once expired
+        now = time.monotonic()
+        self._fetched = {sku: entry for sku, entry in self._fetched.items() if sku not in lines and entry[0] > now}
+        
+        self.metrics.incr("catalog.refreshes")
+        return self._publish(added, changed, removed)
+    
+    def _publish(self, added: Iterable[str] = (), changed: Iterable[str] = (), removed: Iterable[str] = ()) -> CatalogDelta:
+        """Bump versions for changed entries and notify listeners; call with the lock held."""
+        added, changed, removed = tuple(added), tuple(changed), tuple(removed)
+        if not (added or changed or removed):
+            return CatalogDelta(self.version)
+        self.version += 1
+        for sku in (*added, *changed, *removed):
+            self._entry_versions[sku] = self.version
+        delta = CatalogDelta(self.version, added, changed, removed)
+        self.metrics.incr("catalog.entries_applied", len(added) + len(changed) + len(removed))
+        for listener in self._listeners:
+            listener(delta)
+        return delta
+    
+    def resolver(self):
+        """A resolver.ProductResolver over the current snapshot, or None if there is no snapshot."""
+        products = self.snapshot()
+        if not products:
+            return None
+        with self._lock:
+            if self._resolver is None:
+                from resolver import ProductResolver
+                # Built once from the mapping current under the lock, then kept current from each delta
+                resolver = self._resolver = ProductResolver(self._products)
+                # Listeners run with the lock held, after the new mapping is swapped in
+                self.subscribe(lambda delta: resolver.apply(delta, self._products))
+            return self._resolver
+    
+    def invalidate(self):
+        """Refresh on next use, e.g. after the server disagreed about stock."""
+        with self._lock:
+            self._loaded_at = None
+    
+    def fetch(self, sku: str) -> Optional[Product]:
+        """Look ``sku`` up with ``get_product``, or None if the server says it does not exist.
+
+        Any other server error, transport errors and RateLimited propagate,
+        since they say nothing about the product. ProductUnreadable is raised
+        when the answer does not parse.
+        """
+        self.metrics.incr("catalog.fetches")
+        try:
+            result = self.mcp_client.call_tool("get_product", {"sku": sku})
+            text = self._text(result)
+            if result.get("isError"):
+                raise MCPError(text)
+        except MCPError as e:
+            if not _NOT_FOUND.search(str(e)):
+                raise
+            text = None
+        product = parse_product_detail(text) if text is not None else None
+        with self._lock:
+            if product is not None and self.ttl > 0:
+                self._fetched[sku] = (time.monotonic() + self.ttl, product)
+            else:
+                self._fetched.pop(sku, None)
+        if product is None and text is not None:
+            self.metrics.incr("catalog.unreadable")
+            raise ProductUnreadable(f"Could not read the get_product result for {sku}")
+        return product
+    
+    def lookup(self, skus: Iterable[str]) -> Dict[str, Optional[Product]]:
+        """Resolve SKUs against the snapshot in one pass; None marks an unknown SKU.
+
+        SKUs whose ``get_product`` result could not be read are left out.
+        """
+        products = self.snapshot()
+        now = time.monotonic()
+        found: Dict[str, Optional[Product]] = {}
+        for sku in skus:
+            product = products.get(sku)
+            if product is None:
+                fetched = self._fetched.get(sku)
+                if fetched is not None and fetched[0] > now:
+                    product = fetched[1]
+                else:
+                    self.metrics.incr("catalog.misses")
+                    try:
+                        product = self.fetch(sku)
+                    except ProductUnreadable:
+                        continue
+            found[sku] = product
+        return found
+    
+    def prepare_order(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge duplicate lines, fill catalog prices and reject lines that cannot be ordered.
+
+        Lines whose product the catalog cannot read are passed through as
+        given, for the server to price and validate.
+        """
+        quantities: Dict[str, int] = {}
+        given: Dict[str, Dict[str, Any]] = {}
+        for item in arguments.get("items", []):
+            quantities[item["sku"]] = quantities.get(item["sku"], 0) + item["quantity"]
+            given.setdefault(item["sku"], item)
+        
+        products = self.lookup(quantities)
+        short = [sku for sku, product in products.items()
+                 if product is not None and product.active and quantities[sku] > product.stock]
+        for sku in short:
+            # The snapshot may predate a restock; only the server's current figure can refuse
+            try:
+                products[sku] = self.fetch(sku)
+            except ProductUnreadable:
+                del products[sku]
+        if short:
+            self.invalidate()
+        problems: List[str] = []
+        items = []
+        for sku, quantity in quantities.items():
+            if sku not in products:
+                self.metrics.incr("catalog.passed_through")
+                items.append(dict(given[sku], quantity=quantity))
+                continue
+            product = products[sku]
+            if product is None:
+                problems.append(f"{sku} is not in the catalog")
+            elif not product.active:
+                problems.append(f"{sku} ({product.name}) is no longer sold")
+            elif quantity > product.stock:
+                problems.append(f"{sku} ({product.name}) has only {product.stock} in stock, {quantity} requested")
+            else:
+                items.append({
+                    "sku": sku,
+                    "quantity": quantity,
+                    "unit_price": str(product.price.quantize(Decimal("0.01"))),
+                    "currency": product.currency,
+                })
+        if problems:
+            self.metrics.incr("orders_rejected_locally")
+            raise OrderRejected("Cannot place order: " + "; ".join(problems))
+        return dict(arguments, items=items)
+    
+    def record_order(self, items: Iterable[Dict[str, Any]]):
+        """Take ordered quantities off the snapshot's stock after the server accepted the order."""
+        with self._lock:
+            products = dict(self._products)
+            changed = []
+            for item in items:
+                product = products.get(item["sku"])
+                if product is not None:
+                    products[item["sku"]] = replace(product, stock=product.stock - item["quantity"])
+                    # Local estimate; the next listing's line for this SKU is applied whatever its hash
+                    if item["sku"] in self._hashes:
+                        self._hashes[item["sku"]] = None
+                    changed.append(item["sku"])
+            if changed:
+                self._products = MappingProxyType(products)
+            self._publish(changed=changed)
@@ -0,0 +1,75 @@
+"""Cheap message classifier run once per message, before any LLM call."""
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+
+AUTH = "auth"
+ORDER = "order"
+PRODUCT = "product"
+SMALLTALK = "smalltalk"
+
+ORDER_KEYWORDS = ("order", "purchase", "buy")
+PRODUCT_KEYWORDS = (
+    "product", "price", "stock", "sku", "catalog",
+    "laptop", "computer", "monitor", "printer", "keyboard", "mouse"
+)
+
+# Only run when both "email" and "pin" occur; finds credentials and a whole-word "pin"
+_CREDENTIALS = re.compile(
+    r"email:\s*(?P<email>[^\s,]+)|\bpin:\s*(?P<pin>\d{4})|(?P<pin_word>\bpin\b)",
+    re.IGNORECASE
+)
+_PIN_VALUE = re.compile(r"(pin:\s*)\d{4}", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Classification:
+    """What a message is about, plus any credentials found in it."""
+    kind: str
+    email: Optional[str] = None
+    pin: Optional[str] = None
+    
+    @property
+    def has_credentials(self) -> bool:
+        return self.email is not None and self.pin is not None
+
+
+_ORDER = Classification(ORDER)
+_PRODUCT = Classification(PRODUCT)
+_SMALLTALK = Classification(SMALLTALK)
+
+
+def classify(message: str) -> Classification:
+    """Classify a message into auth, order, product or smalltalk.
+
+    The message is lowercased once and checked with substring scans; the
+    credential regex only runs on the rare messages mentioning both an
+    email and a PIN.
+    """
+    text = message.lower()
+    if "email" in text and "pin" in text:
+        email = pin = None
+        pin_word = False
+        for match in _CREDENTIALS.finditer(message):
+            if match.lastgroup == "email" and email is None:
+                email = match.group("email")
+            elif match.lastgroup == "pin" and pin is None:
+                pin = match.group("pin")
+            elif match.lastgroup == "pin_word":
+                pin_word = True
+        # "shipping" contains "pin" but is not about authentication
+        if pin is not None or pin_word:
+            return Classification(AUTH, email, pin)
+    for keyword in ORDER_KEYWORDS:
+        if keyword in text:
+            return _ORDER
+    for keyword in PRODUCT_KEYWORDS:
+        if keyword in text:
+            return _PRODUCT
+    return _SMALLTALK
+
+
+def redact_pin(message: str) -> str:
+    """Mask PIN values before a message is persisted."""
+    return _PIN_VALUE.sub(r"\1****", message)
@@ -1,25 +1,300 @@
-"""Configuration management for the customer support chatbot."""
+"""Configuration management for the customer support chatbot.
+
+All knobs live on one typed, immutable ``Settings`` object. Values come from
+defaults, then the JSON file named by ``SETTINGS_FILE`` (keys are field
+names), then environment variables (field names upper-cased), in increasing
+precedence. ``settings`` is the process-wide manager: attribute access
+reads the current values, and fields marked hot-reloadable can change at
+runtime through ``settings.update`` / ``settings.reload`` (see the
+``/admin/settings`` endpoint in app.py).
+"""
+import dataclasses
+import json
 import os
+import threading
+import typing
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# OpenAI Configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-# MCP Server Configuration
-MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "https://vipfapwm3x.us-east-1.awsapprunner.com/mcp")
+def _hot(default):
+    """A field that may change while the app is running."""
+    return field(default=default, metadata={"hot": True})
+
+
+def _startup(default, secret: bool = False):
+    """A field read once when components are built; changing it needs a restart."""
+    return field(default=default, metadata={"hot": False, "secret": secret})
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Every runtime and performance knob, with its default."""
+    # OpenAI
+    openai_api_key: str = _startup("", secret=True)
+    openai_model: str = _hot("gpt-4.1-mini")
+    # Opt-in cheaper model (e.g. "gpt-4.1-nano") for simple steps; empty keeps every step on openai_model
+    openai_fast_model: str = _hot("")
+    # Tool output above this many characters is summarized by openai_model
+    router_small_output_chars: int = _hot(2000)
+    # Tools (among those with ToolPolicy.templated) whose lone results are answered from templates,
+    # skipping the second LLM call, e.g. "get_product,get_order". Off by default: the templates parse
+    # the MCP server's text format, so check them against the deployed server before enabling
+    response_templates: Tuple[str, ...] = _hot(())
+    # Set to enable tracing in the OpenAI dashboard
+    openai_tracing: bool = _startup(True)
+    # "live" calls OpenAI, "record" also writes llm_cassette, "replay" serves it offline
+    llm_mode: str = _startup("live")
+    llm_cassette: str = _startup("llm_cassette.jsonl.gz")
+    # Seconds of artificial latency per replayed call; None replays the recorded latency
+    llm_replay_latency: Optional[float] = _startup(None)
+    
+    # MCP server
+    mcp_server_url: str = _startup("https://vipfapwm3x.us-east-1.awsapprunner.com/mcp")
+    # Further replicas of the same server; calls are balanced across all of them (see mcp_client.EndpointPool)
+    mcp_server_urls: Tuple[str, ...] = _startup(())
+    # "http" sends one POST per call; "sse" keeps one streaming connection per process
+    mcp_transport: str = _startup("http")
+    # Keep-alive connections per MCP HTTP session
+    mcp_pool_size: int = _startup(10)
+    # Default seconds to wait for an MCP response (tools may override in tools.TOOL_POLICIES)
+    mcp_timeout: float = _hot(10.0)
+    # Share of idempotent reads that may also go to a second endpoint once past the tool's p95; 0 disables
+    mcp_hedge_budget: float = _hot(0.1)
+    # Never hedge sooner than this, however fast the tool's p95 is
+    mcp_hedge_min_ms: float = _hot(20.0)
+    
+    # Conversation context sent to the LLM
+    memory_max_messages: int = _hot(10)
+    # Seconds an identical message in the same session counts as a double-submit and gets the first reply
+    # (opt-in; keep it sub-second, e.g. 0.5, so deliberate repeats are answered); 0 disables
+    turn_dedupe_window: float = _hot(0.0)
+    
+    # Post-authentication prefetch of customer context (opt-in)
+    prefetch_on_auth: bool = _hot(False)
+    prefetch_ttl: float = _hot(60.0)
+    prefetch_workers: int = _startup(4)
+    # Read-only tools started in parallel with the first LLM call on order turns (opt-in)
+    speculative_tools: Tuple[str, ...] = _hot(())
+    
+    # Per-customer cache for list_orders/get_order results
+    order_cache_ttl: float = _hot(30.0)
+    order_cache_max_entries: int = _hot(2048)
+    # Price and stock-check create_order items against the catalog before dispatch (opt-in); products the
+    # catalog cannot read are passed through for the server to price and validate
+    catalog_pricing: bool = _hot(False)
+    # Seconds a list_products snapshot is reused for pricing and product resolution; 0 looks up each SKU
+    catalog_ttl: float = _hot(300.0)
+    # Acknowledge create_order at once and place it on a background worker (see orders.py)
+    async_orders: bool = _hot(False)
+    order_workers: int = _startup(4)
+    
+    # Token-bucket admission (0 disables a limit); calls wait up to rate_limit_max_wait, then get a "busy" reply
+    llm_global_rps: float = _hot(20.0)
+    llm_session_rps: float = _hot(2.0)
+    llm_global_tpm: float = _hot(400000.0)
+    llm_session_tpm: float = _hot(60000.0)
+    mcp_global_rps: float = _hot(50.0)
+    mcp_session_rps: float = _hot(10.0)
+    rate_limit_max_wait: float = _hot(2.0)
+    
+    # Deployment: address and port for this app process, and shared state for multi-worker mode
+    # (launcher.py binds its workers to 127.0.0.1 so only the dispatcher is reachable)
+    app_host: str = _startup("0.0.0.0")
+    app_port: int = _startup(7860)
+    # "memory" keeps state in-process; "sqlite" shares it across workers via state_db
+    state_backend: str = _startup("memory")
+    state_db: str = _startup("chatbot_state.db")
+    # Directory for the compressed transcript log (see transcript.py); empty disables it
+    transcript_dir: str = _startup("")
+    
+    # Turn profiling (see profiling.py): every Nth turn and/or turns slower than profile_slow_ms; 0 disables
+    profile_sample_every: int = _hot(0)
+    profile_slow_ms: float = _hot(0.0)
+    # "stack" writes sampled collapsed stacks; "cprofile" writes .prof files (every-Nth turns only)
+    profile_mode: str = _hot("stack")
+    profile_interval_ms: float = _hot(5.0)
+    profile_dir: str = _hot("profiles")
+    # Stack depth recorded per allocation once /admin/memory/snapshot starts tracemalloc
+    tracemalloc_frames: int = _hot(1)
+    
+    # Admin endpoint token; empty disables /admin
+    admin_token: str = _startup("", secret=True)
+    # Seconds between checks of SETTINGS_FILE for changes; 0 disables watching
+    settings_watch_interval: float = _startup(5.0)
+    
+    # HuggingFace Configuration (for deployment)
+    hf_token: str = _startup("", secret=True)
+
+
+_CHOICES = {
+    "llm_mode": ("live", "record", "replay"),
+    "mcp_transport": ("http", "sse"),
+    "state_backend": ("memory", "sqlite"),
+    "profile_mode": ("stack", "cprofile"),
+}
+
+_TYPES = typing.get_type_hints(Settings)
+FIELDS = {f.name: f for f in dataclasses.fields(Settings)}
+HOT_FIELDS = frozenset(name for name, f in FIELDS.items() if f.metadata["hot"])
+SECRET_FIELDS = frozenset(name for name, f in FIELDS.items() if f.metadata.get("secret"))
+
+
+def _coerce(name: str, value: Any) -> Any:
+    """Convert a raw env/file/admin value to the field's declared type."""
+    expected = _TYPES[name]
+    optional = typing.get_origin(expected) is typing.Union and type(None) in typing.get_args(expected)
+    if optional:
+        if value is None or value == "":
+            return None
+        expected = next(t for t in typing.get_args(expected) if t is not type(None))
+    if expected is bool:
+        if isinstance(value, str):
+            if value.strip().lower() not in ("true", "false", "1", "0", "yes", "no"):
+                raise ValueError(f"{name} must be true or false")
+            return value.strip().lower() in ("true", "1", "yes")
+        return bool(value)
+    if typing.get_origin(expected) is tuple:
+        if isinstance(value, str):
+            value = value.split(",")
+        return tuple(str(v).strip() for v in value if str(v).strip())
+    if expected in (int, float):
+        return expected(value)
+    value = str(value)
+    if name in _CHOICES:
+        value = value.lower()
+        if value not in _CHOICES[name]:
+            raise ValueError(f"{name} must be one of: {', '.join(_CHOICES[name])}")
+    return value
+
+
+def load_settings(path: Optional[str] = None, environ: Optional[Dict[str, str]] = None) -> Settings:
+    """Build Settings from defaults, then the JSON file at ``path``, then environment variables."""
+    environ = os.environ if environ is None else environ
+    values: Dict[str, Any] = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        unknown = set(data) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown settings in {path}: {', '.join(sorted(unknown))}")
+        values.update({name: _coerce(name, value) for name, value in data.items()})
+    for name in FIELDS:
+        raw = environ.get(name.upper())
+        if raw is not None:
+            values[name] = _coerce(name, raw)
+    settings = Settings(**values)
+    if not settings.openai_api_key and settings.llm_mode != "replay":
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    return settings
+
+
+class SettingsManager:
+    """Holds the current Settings and applies hot-reloadable changes.
 
-# HuggingFace Configuration (for deployment)
-HF_TOKEN = os.getenv("HF_TOKEN", "")
+    Attribute access is forwarded to the current Settings, so
+    ``settings.mcp_timeout`` always reads the live value. Components that
+    copy values into their own objects register a ``subscribe`` callback,
+    which receives the new Settings after every change.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._current = load_settings(path)
+        self._listeners: List[Callable[[], Optional[Callable[[Settings], None]]]] = []
+        self._lock = threading.Lock()
+        self._file_mtime = self._mtime()
+        self._watcher: Optional[threading.Thread] = None
+    
+    @property
+    def current(self) -> Settings:
+        return self._current
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._current, name)
+    
+    def subscribe(self, listener: Callable[[Settings], None]):
+        """Call ``listener(settings)`` after every applied change.
 
-# OpenAI Model
-OPENAI_MODEL = "gpt-4.1-mini"
+        Bound methods are held weakly so subscribing does not keep their object alive.
+        """
+        if hasattr(listener, "__self__"):
+            ref = weakref.WeakMethod(listener)
+        else:
+            ref = lambda: listener
+        with self._lock:
+            self._listeners.append(ref)
+    
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply hot-reloadable changes; raises ValueError for unknown or restart-only fields."""
+        unknown = set(changes) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        cold = set(changes) - HOT_FIELDS
+        if cold:
+            raise ValueError(f"Restart required to change: {', '.join(sorted(cold))}")
+        coerced = {name: _coerce(name, value) for name, value in changes.items()}
+        return self._apply(coerced)
+    
+    def _apply(self, coerced: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            changed = {name: value for name, value in coerced.items() if getattr(self._current, name) != value}
+            if not changed:
+                return {}
+            self._current = dataclasses.replace(self._current, **changed)
+            self._listeners = [ref for ref in self._listeners if ref() is not None]
+            current, listeners = self._current, [ref() for ref in self._listeners]
+        for listener in listeners:
+            if listener is not None:
+                listener(current)
+        return changed
+    
+    def reload(self) -> Dict[str, Any]:
+        """Re-read the file and environment; apply hot fields and report restart-only differences."""
+        fresh = load_settings(self.path)
+        hot = {name: getattr(fresh, name) for name in HOT_FIELDS}
+        restart = sorted(
+            name for name in set(FIELDS) - HOT_FIELDS if getattr(fresh, name) != getattr(self._current, name)
+        )
+        return {"applied": self._apply(hot), "restart_required": restart}
+    
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path) if self.path else None
+        except OSError:
+            return None
+    
+    def watch(self, interval: float):
+        """Reload whenever SETTINGS_FILE changes, checking every ``interval`` seconds."""
+        if not self.path or interval <= 0 or self._watcher is not None:
+            return
+        
+        def run():
+            event = threading.Event()
+            while not event.wait(interval):
+                mtime = self._mtime()
+                if mtime != self._file_mtime:
+                    self._file_mtime = mtime
+                    try:
+                        self.reload()
+                    except (ValueError, OSError) as e:
+                        # Keep serving with the last good settings
+                        print(f"Settings reload failed: {e}")
+        
+        self._watcher = threading.Thread(target=run, name="settings-watch", daemon=True)
+        self._watcher.start()
+    
+    def public(self) -> Dict[str, Any]:
+        """Current values with secrets masked, plus which fields are hot-reloadable."""
+        values = {
+            name: ("***" if name in SECRET_FIELDS and getattr(self._current, name) else getattr(self._current, name))
+            for name in FIELDS
+        }
+        return {"values": values, "hot": sorted(HOT_FIELDS)}
 
-# OpenAI Tracing Configuration
-# Set OPENAI_TRACING=true to enable tracing (default: enabled)
-# Tracing allows you to see detailed logs in OpenAI dashboard
-OPENAI_TRACING = os.getenv("OPENAI_TRACING", "true").lower() == "true"
 
+settings = SettingsManager(os.getenv("SETTINGS_FILE"))
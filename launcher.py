@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Run several app workers behind a sticky local dispatcher.
+
+Each worker is a separate ``app.py`` process (its own GIL) on its own port,
+sharing sessions, auth and caches through the SQLite store. The dispatcher
+pins every browser to one worker with a cookie, so a chat's requests always
+land on the process holding its in-flight state. Workers listen on the
+loopback interface only, so every request, /admin included, goes through
+the dispatcher.
+
+Usage: python launcher.py --workers 4 --port 7860
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+STICKY_COOKIE = "lc_worker"
+
+# Headers that apply to a single connection and must not be forwarded
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "content-length"
+}
+
+
+class Dispatcher:
+    """Reverse proxy with cookie-based session affinity and least-active placement."""
+    
+    def __init__(self, backends: List[Tuple[str, int]], host: str = "127.0.0.1", port: int = 7860):
+        self.backends = backends
+        self.active = [0] * len(backends)
+        # A worker that refused a connection is skipped until this monotonic time
+        self.down_until = [0.0] * len(backends)
+        self.retry_after = 5.0
+        # Rotates ties so idle workers share new sessions evenly
+        self._placements = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+    
+    def start(self) -> "Dispatcher":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def serve_forever(self):
+        self._server.serve_forever()
+    
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def pick(self, cookie_header: Optional[str], path: str) -> Tuple[int, bool]:
+        """Return (backend index, whether a new sticky cookie must be set)."""
+        sticky = _read_cookie(cookie_header, STICKY_COOKIE)
+        now = time.monotonic()
+        with self._lock:
+            healthy = [i for i, until in enumerate(self.down_until) if until <= now]
+            if sticky is not None and sticky.isdigit():
+                index = int(sticky)
+                if index in healthy:
+                    return index, False
+            # API clients without cookies still stick by Gradio's session_hash
+            session_hash = parse_qs(urlsplit(path).query).get("session_hash", [None])[0]
+            candidates = healthy or list(range(len(self.backends)))
+            if session_hash:
+                index = candidates[zlib.crc32(session_hash.encode()) % len(candidates)]
+            else:
+                start = self._placements % len(candidates)
+                rotated = candidates[start:] + candidates[:start]
+                index = min(rotated, key=lambda i: self.active[i])
+                self._placements += 1
+            return index, True
+    
+    def _make_handler(self):
+        dispatcher = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def _proxy(self):
+                encoding = self.headers.get("Transfer-Encoding")
+                if encoding and encoding.split(",")[-1].strip().lower() != "chunked":
+                    self.send_error(411, "Length Required")
+                    return
+                try:
+                    if encoding:
+                        # Decoded here; the worker gets the body with a Content-Length
+                        body = read_chunked(self.rfile)
+                    else:
+                        length = int(self.headers.get("Content-Length") or 0)
+                        body = self.rfile.read(length) if length else None
+                except ValueError:
+                    self.send_error(400, "Malformed request body")
+                    return
+                index, set_cookie = dispatcher.pick(self.headers.get("Cookie"), self.path)
+                
+                host, port = dispatcher.backends[index]
+                headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP}
+                headers["X-Forwarded-For"] = self.client_address[0]
+                with dispatcher._lock:
+                    dispatcher.active[index] += 1
+                try:
+                    conn = http.client.HTTPConnection(host, port, timeout=300)
+                    try:
+                        conn.request(self.command, self.path, body=body, headers=headers)
+                        upstream = conn.getresponse()
+                    except (ConnectionError, socket.timeout):
+                        with dispatcher._lock:
+                            dispatcher.down_until[index] = time.monotonic() + dispatcher.retry_after
+                        self.send_error(502, "Worker unavailable")
+                        return
+                    
+                    self.send_response(upstream.status, upstream.reason)
+                    for key, value in upstream.getheaders():
+                        if key.lower() not in HOP_BY_HOP:
+                            self.send_header(key, value)
+                    if set_cookie:
+                        self.send_header("Set-Cookie", f"{STICKY_COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax")
+                    if self.command == "HEAD" or upstream.status in (204, 304):
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        conn.close()
+                        return
+                    # Re-chunk so streamed (SSE) responses flow through as they are produced
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    while True:
+                        chunk = upstream.read1(65536)
+                        if not chunk:
+                            break
+                        self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                    conn.close()
+                finally:
+                    with dispatcher._lock:
+                        dispatcher.active[index] -= 1
+            
+            do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = do_HEAD = _proxy
+        
+        return Handler
+
+
+def read_chunked(rfile) -> bytes:
+    """Read a ``Transfer-Encoding: chunked`` body from ``rfile``; ValueError if it is malformed."""
+    parts = []
+    while True:
+        size = int(rfile.readline(65537).split(b";", 1)[0].strip(), 16)
+        if size < 0:
+            raise ValueError("negative chunk size")
+        if size == 0:
+            break
+        data = rfile.read(size)
+        if len(data) != size or rfile.read(2) != b"\r\n":
+            raise ValueError("truncated chunk")
+        parts.append(data)
+    # Trailer fields, if any, end with an empty line
+    while rfile.readline(65537) not in (b"\r\n", b"\n", b""):
+        pass
+    return b"".join(parts)
+
+
+def _read_cookie(header: Optional[str], name: str) -> Optional[str]:
+    if not header:
+        return None
+    for part in header.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key == name:
+            return value
+    return None
+
+
+def wait_for_port(host: str, port: int, timeout: float = 60) -> bool:
+    """Wait until something accepts TCP connections on host:port."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_workers(commands: List[List[str]], envs: List[Dict[str, str]]) -> List[subprocess.Popen]:
+    """Start one process per command with its environment."""
+    return [subprocess.Popen(cmd, env=env) for cmd, env in zip(commands, envs)]
+
+
+def stop_workers(workers: List[subprocess.Popen]):
+    """Terminate workers, killing any that do not exit promptly."""
+    for proc in workers:
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in workers:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--base-port", type=int, default=7861, help="First worker port")
+    parser.add_argument("--state-db", default=os.getenv("STATE_DB", "chatbot_state.db"))
+    args = parser.parse_args()
+    
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    ports = [args.base_port + i for i in range(args.workers)]
+    envs = [
+        # Loopback only: clients must come through the dispatcher
+        dict(os.environ, APP_HOST="127.0.0.1", APP_PORT=str(port), STATE_BACKEND="sqlite", STATE_DB=args.state_db)
+        for port in ports
+    ]
+    workers = start_workers([[sys.executable, app_path] for _ in ports], envs)
+    
+    def shutdown(signum, frame):
+        stop_workers(workers)
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    
+    for port in ports:
+        if not wait_for_port("127.0.0.1", port):
+            print(f"Worker on port {port} did not start")
+            shutdown(None, None)
+    
+    dispatcher = Dispatcher([("127.0.0.1", port) for port in ports], host=args.host, port=args.port)
+    print(f"Dispatching http://{args.host}:{args.port} -> {args.workers} workers on ports {ports}")
+    dispatcher.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""LLM client construction plus a record/replay cassette for offline runs.
+
+Every client here exposes ``client.chat.completions.create(**kwargs)``, the
+only part of the OpenAI SDK the agent uses, so they are interchangeable:
+
+- ``OpenAI``: the live API
+- ``RecordingLLM``: wraps another client and appends each request/response pair to a cassette
+- ``ReplayLLM``: serves responses from a cassette, with optional artificial latency
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Mapping
+from types import SimpleNamespace
+from typing import Dict, Any, List, Optional
+
+
+class CassetteMiss(KeyError):
+    """Raised by ReplayLLM for a request that was never recorded."""
+
+
+def to_plain(value: Any) -> Any:
+    """Convert SDK objects (pydantic models or namespaces) to JSON-compatible data."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {k: to_plain(v) for k, v in vars(value).items()}
+    if isinstance(value, Mapping):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    return value
+
+
+def to_namespace(value: Any) -> Any:
+    """Recursively convert dicts to attribute-access objects like the OpenAI SDK returns."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(v) for v in value]
+    return value
+
+
+def _strip_nones(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_nones(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_strip_nones(v) for v in value]
+    return value
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    """Stable hash of a chat request: model, messages, tools and tool_choice."""
+    # None-valued fields are dropped so SDK objects and their replayed namespaces hash alike
+    canonical = _strip_nones(to_plain({
+        "model": kwargs.get("model"),
+        "messages": kwargs.get("messages"),
+        "tools": kwargs.get("tools"),
+        "tool_choice": kwargs.get("tool_choice"),
+    }))
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class RecordingLLM:
+    """Pass requests through to ``inner`` and append them to a gzip JSONL cassette."""
+    
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    def _create(self, **kwargs) -> Any:
+        start = time.perf_counter()
+        response = self.inner.chat.completions.create(**kwargs)
+        record = {
+            "key": request_key(kwargs),
+            "model": kwargs.get("model"),
+            "latency": round(time.perf_counter() - start, 4),
+            "response": to_plain(response),
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            # Flush per record so a crashed run still leaves a readable cassette
+            self._file.flush()
+        return response
+    
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ReplayLLM:
+    """Serve recorded responses by request hash.
+
+    ``latency`` of None replays each call's recorded latency; a number
+    sleeps that many seconds instead (0 for as-fast-as-possible).
+    Repeated identical requests get their recorded responses in order,
+    then the last one again.
+    """
+    
+    def __init__(self, path: str, latency: Optional[float] = None):
+        self.path = path
+        self.latency = latency
+        self._records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[record["key"]].append(record)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+    
+    def _create(self, **kwargs) -> Any:
+        key = request_key(kwargs)
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                raise CassetteMiss(f"No recorded response for request {key[:12]} (model {kwargs.get('model')})")
+            record = records[min(self._served[key], len(records) - 1)]
+            self._served[key] += 1
+        delay = record.get("latency", 0) if self.latency is None else self.latency
+        if delay:
+            time.sleep(delay)
+        return to_namespace(record["response"])
+
+
+def make_llm_client(mode: str, api_key: Optional[str], cassette: str, replay_latency: Optional[float] = None):
+    """Build the LLM client for ``mode``: "live", "record" or "replay"."""
+    if mode == "replay":
+        return ReplayLLM(cassette, latency=replay_latency)
+    from openai import OpenAI
+    client = OpenAI(api_key=api_key)
+    if mode == "record":
+        return RecordingLLM(client, cassette)
+    return client
@@ -1,55 +1,495 @@
 """MCP server client for JSON-RPC communication."""
-import requests
+import itertools
 import json
-from typing import Dict, Any, Optional
-from config import MCP_SERVER_URL
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Dict, Any, Optional, Iterator, List, Tuple
+
+import requests
+
+from config import Settings, settings
+from metrics import Metrics
+from ratelimit import RateLimiter
+
+
+class MCPError(Exception):
+    """Raised for a JSON-RPC error answered by the server (e.g. an unknown product)."""
+
+
+class MCPSessionExpired(Exception):
+    """Raised when the server no longer recognises the transport's session."""
+
+
+class MCPUnavailable(Exception):
+    """Raised when an MCP endpoint could not be reached or did not answer in time."""
+
+
+class MCPRequestCancelled(Exception):
+    """Raised in a request whose answer is no longer wanted (the losing copy of a hedged call)."""
+
+
+def _new_session() -> requests.Session:
+    """A requests session whose keep-alive pool holds ``mcp_pool_size`` connections."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=settings.mcp_pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HTTPTransport:
+    """One JSON-RPC request per POST, reusing a keep-alive connection."""
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.session = _new_session()
+        self.initialized = False
+    
+    def request(self, payload: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
+        """Send a JSON-RPC message and return the JSON-RPC response."""
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        }
+        
+        response = self.session.post(self.url, json=payload, headers=headers, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def cancel(self, request_id: Any):
+        """No-op: requests cannot abort a POST in flight, so a cancelled call finishes and is dropped."""
+    
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+
+def _iter_stream_lines(response: requests.Response) -> Iterator[str]:
+    """Yield lines as soon as they arrive instead of waiting for a full read buffer."""
+    # Chunked bodies can be consumed chunk by chunk; otherwise read byte-wise
+    chunk_size = None if getattr(response.raw, "chunked", False) else 1
+    buffer = b""
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            yield line.rstrip(b"\r").decode("utf-8")
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8")
+
+
+def _iter_sse_events(response: requests.Response) -> Iterator[Tuple[Optional[str], str, str]]:
+    """Yield (event_id, event_type, data) tuples from an SSE response body."""
+    event_id = None
+    event_type = "message"
+    data_lines = []
+    for line in _iter_stream_lines(response):
+        if not line:
+            if data_lines:
+                yield event_id, event_type, "\n".join(data_lines)
+            event_id, event_type, data_lines = None, "message", []
+            continue
+        if line.startswith(":"):
+            # Comment / keep-alive
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "data":
+            data_lines.append(value)
+        elif field == "id":
+            event_id = value
+        elif field == "event":
+            event_type = value
+
+
+class SSETransport:
+    """Streamable-HTTP transport with one long-lived SSE stream per process.
+
+    Requests are POSTed over a keep-alive connection; the server either answers
+    inline or acknowledges with 202 and delivers the response on the shared
+    ``GET`` stream, where it is routed back to the caller by JSON-RPC id.
+    The stream reconnects automatically and resumes from ``Last-Event-ID``.
+    """
+    
+    def __init__(self, url: str, reconnect_delay: float = 0.1, max_reconnect_delay: float = 5.0):
+        self.url = url
+        self.session = _new_session()
+        self.session_id: Optional[str] = None
+        self.initialized = False
+        self.last_event_id: Optional[str] = None
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.reconnects = 0
+        
+        self._pending: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._connected = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+    
+    def _headers(self, accept: str) -> Dict[str, str]:
+        headers = {"Accept": accept}
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+        return headers
+    
+    def _ensure_stream(self):
+        """Start the background reader once a session has been established."""
+        if self._reader is not None or not self.initialized:
+            return
+        with self._lock:
+            if self._reader is not None:
+                return
+            self._reader = threading.Thread(target=self._read_loop, name="mcp-sse-reader", daemon=True)
+            self._reader.start()
+        # Give the stream a moment to attach so the next response is pushed to it
+        self._connected.wait(timeout=1.0)
+    
+    def _read_loop(self):
+        delay = self.reconnect_delay
+        while not self._closed.is_set():
+            headers = self._headers("text/event-stream")
+            headers["Cache-Control"] = "no-cache"
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    if response.status_code == 404:
+                        # The server forgot our session; nothing queued on it will arrive
+                        self._reset_session()
+                        break
+                    response.raise_for_status()
+                    self._connected.set()
+                    delay = self.reconnect_delay
+                    for event_id, event_type, data in _iter_sse_events(response):
+                        if self._closed.is_set():
+                            break
+                        if event_id:
+                            self.last_event_id = event_id
+                        if event_type == "message":
+                            self._dispatch(data)
+            except Exception:
+                pass
+            finally:
+                self._connected.clear()
+            
+            if self._closed.is_set():
+                break
+            self.reconnects += 1
+            self._closed.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+        
+        with self._lock:
+            self._reader = None
+    
+    def _reset_session(self):
+        self.session_id = None
+        self.last_event_id = None
+        self.initialized = False
+        self._fail_pending(MCPSessionExpired("MCP session expired"))
+    
+    def _dispatch(self, data: str):
+        """Route a JSON-RPC response from the stream to its waiting caller."""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        with self._lock:
+            future = self._pending.pop(message.get("id"), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+    
+    def _fail_pending(self, error: Exception):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+    
+    def cancel(self, request_id: Any):
+        """Stop waiting for ``request_id``; its caller gets MCPRequestCancelled right away."""
+        with self._lock:
+            future = self._pending.pop(request_id, None)
+        if future is not None and not future.done():
+            future.set_exception(MCPRequestCancelled(f"Request {request_id} cancelled"))
+    
+    def request(self, payload: Dict[str, Any], timeout: float = 10) -> Dict[str, Any]:
+        """Send a JSON-RPC message and wait for its response by id."""
+        self._ensure_stream()
+        
+        future: Future = Future()
+        request_id = payload.get("id")
+        with self._lock:
+            self._pending[request_id] = future
+        
+        try:
+            headers = self._headers("application/json, text/event-stream")
+            headers["Content-Type"] = "application/json"
+            response = self.session.post(self.url, json=payload, headers=headers, stream=True, timeout=timeout)
+            if response.status_code == 404 and self.session_id:
+                response.close()
+                self._reset_session()
+                raise MCPSessionExpired("MCP session expired")
+            response.raise_for_status()
+            if response.headers.get("Mcp-Session-Id"):
+                self.session_id = response.headers["Mcp-Session-Id"]
+            
+            content_type = response.headers.get("Content-Type", "")
+            if response.status_code != 202:
+                if content_type.startswith("text/event-stream"):
+                    for _, event_type, data in _iter_sse_events(response):
+                        if event_type == "message":
+                            self._dispatch(data)
+                        if future.done():
+                            break
+                    response.close()
+                else:
+                    self._dispatch(response.text)
+            else:
+                response.close()
+            
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise requests.exceptions.Timeout(f"No response for request {request_id} within {timeout}s")
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._ensure_stream()
+    
+    def close(self):
+        """Stop the reader; it exits when the stream next yields or ends."""
+        self._closed.set()
+        self._fail_pending(Exception("MCP transport closed"))
+        self.session.close()
+
+
+# Process-wide so ids stay unique when several clients share one stream
+_request_ids = itertools.count(1)
+
+_shared_transports: Dict[Tuple[int, str], SSETransport] = {}
+_shared_lock = threading.Lock()
+
+
+_shared_users: Dict[Tuple[int, str], int] = {}
+
+
+def get_shared_sse_transport(url: str) -> SSETransport:
+    """Return the process-wide SSE transport for ``url``; pair with ``release_shared_sse_transport``."""
+    # Keyed by pid so forked workers open their own stream
+    key = (os.getpid(), url)
+    with _shared_lock:
+        transport = _shared_transports.get(key)
+        if transport is None or transport._closed.is_set():
+            transport = SSETransport(url)
+            _shared_transports[key] = transport
+            _shared_users[key] = 0
+        _shared_users[key] += 1
+        return transport
+
+
+def release_shared_sse_transport(transport: SSETransport):
+    """Drop one user of a shared transport; the last one closes it."""
+    key = (os.getpid(), transport.url)
+    with _shared_lock:
+        if _shared_transports.get(key) is not transport:
+            # Not shared (or already replaced after a close): it is the caller's own
+            transport.close()
+            return
+        _shared_users[key] -= 1
+        if _shared_users[key] > 0:
+            return
+        del _shared_transports[key], _shared_users[key]
+    transport.close()
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_mcp_limiter() -> RateLimiter:
+    """Process-wide admission for tool calls, shared by every MCPClient."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter("mcp", settings.mcp_global_rps, 0, max_wait=settings.rate_limit_max_wait)
+            settings.subscribe(_configure_shared_limiter)
+        return _shared_limiter
+
+
+def _configure_shared_limiter(current: Settings):
+    _shared_limiter.configure(current.mcp_global_rps, 0, current.rate_limit_max_wait)
+
+
+class Endpoint:
+    """One MCP server replica: its transport plus the load and health the pool balances on."""
+    
+    def __init__(self, url: str, transport):
+        self.url = url
+        self.transport = transport
+        self.outstanding = 0
+        # Exponentially weighted response time in seconds; 0 until the first response
+        self.latency = 0.0
+        self.failures = 0
+        self.down_until = 0.0
+    
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r}, outstanding={self.outstanding}, latency={self.latency * 1000:.1f}ms)"
+
+
+class EndpointPool:
+    """Chooses an endpoint per call: fewest outstanding requests, weighted by recent latency.
+
+    An endpoint's cost is ``(outstanding + 1) * latency``, so equal replicas
+    get equal shares and a slow one gets proportionally fewer calls.
+    Unreachable endpoints are skipped for an exponentially growing backoff
+    (0.5 s doubling to 30 s) unless every endpoint is down.
+    """
+    
+    LATENCY_WEIGHT = 0.2
+    BACKOFF = 0.5
+    MAX_BACKOFF = 30.0
+    
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = endpoints
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.endpoints)
+    
+    def acquire(self, exclude: Tuple[Endpoint, ...] = ()) -> Optional[Endpoint]:
+        """Pick an endpoint and count the call as outstanding on it; None if all are excluded."""
+        with self._lock:
+            candidates = [e for e in self.endpoints if e not in exclude]
+            if not candidates:
+                return None
+            now = time.monotonic()
+            candidates = [e for e in candidates if e.down_until <= now] or candidates
+            # Endpoints without a measurement yet are costed like the fastest known one
+            known = [e.latency for e in self.endpoints if e.latency]
+            default = min(known) if known else 1.0
+            endpoint = min(candidates, key=lambda e: (e.outstanding + 1) * (e.latency or default))
+            endpoint.outstanding += 1
+            return endpoint
+    
+    def release(self, endpoint: Endpoint, elapsed: float, ok: Optional[bool]):
+        """Finish a call; ``ok`` None (cancelled) leaves the endpoint's statistics alone."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                endpoint.down_until = 0.0
+                if endpoint.latency:
+                    endpoint.latency += self.LATENCY_WEIGHT * (elapsed - endpoint.latency)
+                else:
+                    endpoint.latency = elapsed
+            elif ok is not None:
+                endpoint.failures += 1
+                backoff = min(self.BACKOFF * 2 ** (endpoint.failures - 1), self.MAX_BACKOFF)
+                endpoint.down_until = time.monotonic() + backoff
+    
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            return [
+                {
+                    "url": e.url,
+                    "outstanding": e.outstanding,
+                    "latency_ms": round(e.latency * 1000, 1),
+                    "failures": e.failures,
+                    "healthy": e.down_until <= now,
+                }
+                for e in self.endpoints
+            ]
 
 
 class MCPClient:
-    """Client for communicating with MCP server via JSON-RPC 2.0."""
+    """Client for communicating with MCP server via JSON-RPC 2.0.
+
+    With several endpoints (``mcp_server_urls``) every call goes to the
+    EndpointPool's choice. Calls made with ``hedge=True`` (idempotent reads)
+    are sent to a second endpoint when the first has not answered within
+    the tool's recent p95, or has failed; the first success wins and the
+    other copy is cancelled. ``mcp_hedge_budget`` caps the share of
+    hedgeable calls that may send a second copy.
+    """
+    
+    # Latency samples a tool needs before its p95 is trusted as a hedge delay
+    HEDGE_MIN_SAMPLES = 20
+    
+    def __init__(self, url: Optional[str] = None, transport: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None, urls: Optional[List[str]] = None,
+                 metrics: Optional[Metrics] = None):
+        self.url = url or settings.mcp_server_url
+        self.rate_limiter = rate_limiter or get_shared_mcp_limiter()
+        self.metrics = metrics or Metrics(max_samples=512)
+        
+        transport = transport or settings.mcp_transport
+        if transport not in ("http", "sse"):
+            raise ValueError(f"Unknown MCP transport: {transport}")
+        self._transport_kind = transport
+        if urls is None:
+            urls = [] if url else list(settings.mcp_server_urls)
+        all_urls = list(dict.fromkeys([self.url, *urls]))
+        self.pool = EndpointPool([Endpoint(u, self._make_transport(u)) for u in all_urls])
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
-    def __init__(self):
-        self.url = MCP_SERVER_URL
-        self.request_id = 0
-        self._initialized = False
+    def _make_transport(self, url: str):
+        if self._transport_kind == "sse":
+            # Shared so every client in the process multiplexes over one stream
+            return get_shared_sse_transport(url)
+        return HTTPTransport(url)
+    
+    @property
+    def transport(self):
+        """Transport of the primary endpoint (``mcp_server_url``)."""
+        return self.pool.endpoints[0].transport
+    
+    @transport.setter
+    def transport(self, transport):
+        previous = self.pool.endpoints[0].transport
+        self.pool.endpoints[0].transport = transport
+        if self._transport_kind == "sse" and previous is not transport:
+            release_shared_sse_transport(previous)
     
     def _get_next_id(self) -> int:
         """Get next request ID."""
-        self.request_id += 1
-        return self.request_id
+        return next(_request_ids)
     
-    def _call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+              endpoint: Optional[Endpoint] = None, request_id: Optional[int] = None) -> Dict[str, Any]:
         """Make JSON-RPC call to MCP server."""
+        if timeout is None:
+            timeout = settings.mcp_timeout
+        endpoint = endpoint or self.pool.endpoints[0]
         payload = {
             "jsonrpc": "2.0",
-            "id": self._get_next_id(),
+            "id": request_id if request_id is not None else self._get_next_id(),
             "method": method
         }
         if params:
             payload["params"] = params
         
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        
         try:
-            response = requests.post(self.url, json=payload, headers=headers, timeout=10)
-            response.raise_for_status()
-            result = response.json()
+            try:
+                result = endpoint.transport.request(payload, timeout=timeout)
+            except MCPSessionExpired:
+                if method == "initialize":
+                    raise
+                # Resume on a fresh session and replay the request once
+                self._initialize(endpoint)
+                result = endpoint.transport.request(payload, timeout=timeout)
             
             if "error" in result:
-                raise Exception(f"MCP Error: {result['error'].get('message', 'Unknown error')}")
+                raise MCPError(f"MCP Error: {result['error'].get('message', 'Unknown error')}")
             
             return result.get("result", {})
         except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to communicate with MCP server: {str(e)}")
+            raise MCPUnavailable(f"Failed to communicate with MCP server: {str(e)}")
     
-    def initialize(self):
-        """Initialize MCP connection."""
-        if self._initialized:
-            return
-        
+    def _initialize(self, endpoint: Endpoint):
         result = self._call("initialize", {
             "protocolVersion": "2024-11-05",
             "capabilities": {},
@@ -57,20 +497,130 @@ class MCPClient:
                 "name": "customer-support-chatbot",
                 "version": "1.0.0"
             }
-        })
-        self._initialized = True
+        }, endpoint=endpoint)
+        endpoint.transport.initialized = True
         return result
     
-    def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Call an MCP tool."""
-        if not self._initialized:
-            self.initialize()
-        
-        result = self._call("tools/call", {
+    def initialize(self):
+        """Initialize MCP connection on every endpoint; fails only if none can be reached."""
+        result, error = None, None
+        for endpoint in self.pool.endpoints:
+            if endpoint.transport.initialized:
+                continue
+            try:
+                initialized = self._initialize(endpoint)
+                result = result or initialized
+            except MCPUnavailable as e:
+                # Retried lazily on the endpoint's first call
+                error = error or e
+        if error is not None and not any(e.transport.initialized for e in self.pool.endpoints):
+            raise error
+        return result
+    
+    def _attempt(self, endpoint: Endpoint, method: str, params: Dict[str, Any], timeout: Optional[float],
+                 request_id: Optional[int] = None) -> Dict[str, Any]:
+        """One call on an endpoint the pool already counted, reporting its outcome back to the pool."""
+        start = time.perf_counter()
+        ok: Optional[bool] = False
+        try:
+            if not endpoint.transport.initialized:
+                self._initialize(endpoint)
+            result = self._call(method, params, timeout=timeout, endpoint=endpoint, request_id=request_id)
+            ok = True
+            return result
+        except MCPRequestCancelled:
+            ok = None
+            raise
+        except MCPUnavailable:
+            raise
+        except Exception:
+            # The server answered (with an error), so the endpoint itself is healthy
+            ok = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.pool.release(endpoint, elapsed, ok)
+            if ok and method == "tools/call":
+                self.metrics.observe(f"mcp.{params['name']}", elapsed)
+    
+    def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: Optional[float] = None,
+                  hedge: bool = False) -> Dict[str, Any]:
+        """Call an MCP tool; ``hedge`` marks it safe to send twice (see the class docstring)."""
+        # Raises RateLimited rather than piling more load on a saturated server
+        self.rate_limiter.acquire()
+        params = {
             "name": tool_name,
             "arguments": arguments
-        })
-        return result
+        }
+        if hedge and len(self.pool) > 1 and settings.mcp_hedge_budget > 0:
+            return self._hedged_call(params, timeout)
+        return self._attempt(self.pool.acquire(), "tools/call", params, timeout)
+    
+    def _hedge_delay(self, tool_name: str) -> Optional[float]:
+        """Seconds to wait before hedging: the tool's recent p95, or None until there are enough samples."""
+        name = f"mcp.{tool_name}"
+        if self.metrics.get(name + ".count") < self.HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.metrics.percentile(name, 95), settings.mcp_hedge_min_ms / 1000)
+    
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=settings.mcp_pool_size * len(self.pool), thread_name_prefix="mcp-hedge"
+                )
+            return self._hedge_executor
+    
+    def _hedged_call(self, params: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        executor = self._executor()
+        self.metrics.incr("mcp.hedgeable")
+        attempts: Dict[Future, Tuple[Endpoint, int]] = {}
+        
+        def launch(endpoint: Endpoint) -> Future:
+            request_id = self._get_next_id()
+            future = executor.submit(self._attempt, endpoint, "tools/call", params, timeout, request_id)
+            attempts[future] = (endpoint, request_id)
+            return future
+        
+        primary = launch(self.pool.acquire())
+        delay = self._hedge_delay(params["name"])
+        done, _ = wait([primary], timeout=delay)
+        hedged = False
+        if not done or primary.exception() is not None:
+            slow = not done
+            # Failover after an error is always allowed; hedging a slow call is budgeted
+            within_budget = self.metrics.get("mcp.hedged") < settings.mcp_hedge_budget * self.metrics.get("mcp.hedgeable")
+            if isinstance(primary.exception() if done else None, MCPUnavailable) or (slow and within_budget):
+                backup = self.pool.acquire(exclude=(attempts[primary][0],))
+                if backup is not None:
+                    launch(backup)
+                    hedged = True
+                    self.metrics.incr("mcp.hedged" if slow else "mcp.failovers")
+        
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if hedged and future is not primary:
+                            self.metrics.incr("mcp.hedge_wins")
+                        return future.result()
+                    if error is None or isinstance(error, MCPUnavailable):
+                        error = future.exception()
+            raise error
+        finally:
+            for future in pending:
+                endpoint, request_id = attempts[future]
+                if future.cancel():
+                    self.pool.release(endpoint, 0.0, None)
+                else:
+                    endpoint.transport.cancel(request_id)
+    
+    def list_tools(self) -> List[Dict[str, Any]]:
+        """Discover the tools offered by the server."""
+        return self._attempt(self.pool.acquire(), "tools/list", {}, None).get("tools", [])
     
     def verify_customer(self, email: str, pin: str) -> Dict[str, Any]:
         """Verify customer with email and PIN."""
@@ -78,4 +628,23 @@ class MCPClient:
             "email": email,
             "pin": pin
         })
-
+    
+    def status(self) -> Dict[str, Any]:
+        """Endpoint health and hedging counters, e.g. for the admin API."""
+        return {
+            "endpoints": self.pool.status(),
+            "hedging": {
+                name: self.metrics.get(f"mcp.{name}")
+                for name in ("hedgeable", "hedged", "hedge_wins", "failovers")
+            },
+        }
+    
+    def close(self):
+        """Release the underlying transports; a shared SSE stream stays open for its other clients."""
+        for endpoint in self.pool.endpoints:
+            if self._transport_kind == "sse":
+                release_shared_sse_transport(endpoint.transport)
+            else:
+                endpoint.transport.close()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
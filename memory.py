@@ -1,34 +1,130 @@
 """Session-based conversation memory manager."""
-from typing import List, Dict, Any
+import sys
+from itertools import islice
+from collections.abc import Mapping, Sequence
+from typing import List, Dict, Iterator, Optional, Union
+from store import SharedStore
+from config import settings
+
+
+class Message(Mapping):
+    """One stored message: two slots instead of a dict, with the role string interned.
+
+    It is a read-only mapping with ``role`` and ``content`` keys, so it can be
+    placed directly in an OpenAI ``messages`` list.
+    """
+    __slots__ = ("role", "content")
+    
+    def __init__(self, role: str, content: str):
+        self.role = sys.intern(role)
+        self.content = content
+    
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(("role", "content"))
+    
+    def __len__(self) -> int:
+        return 2
+    
+    def __repr__(self) -> str:
+        return f"Message({self.role!r}, {self.content!r})"
+    
+    def as_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+class MessageWindow(Sequence):
+    """Read-only view of ``messages[start:]`` that does not copy the list."""
+    __slots__ = ("_messages", "_start", "_stop")
+    
+    def __init__(self, messages: List[Message], start: int = 0):
+        self._messages = messages
+        self._start = max(0, start)
+        # Fixed at creation so later appends do not leak into the view
+        self._stop = len(messages)
+    
+    def __len__(self) -> int:
+        return self._stop - self._start
+    
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message window index out of range")
+        return self._messages[self._start + index]
+    
+    def __iter__(self) -> Iterator[Message]:
+        return islice(self._messages, self._start, self._stop)
+    
+    def __eq__(self, other) -> bool:
+        # Compares like the list it stands in for
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+    
+    __hash__ = None
+
+
+_EMPTY: List[Message] = []
 
 
 class SessionMemory:
     """Manages conversation memory per session."""
     
-    def __init__(self):
-        self.memories: Dict[str, List[Dict[str, str]]] = {}
+    def __init__(self, store: Optional[SharedStore] = None):
+        self.memories: Dict[str, List[Message]] = {}
+        # When set, the shared store is the source of truth so any worker can serve the session
+        self.store = store
     
-    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+    def get_messages(self, session_id: str) -> Sequence:
         """Get conversation history for a session."""
-        return self.memories.get(session_id, [])
+        if self.store is not None:
+            return self.store.get_messages(session_id)
+        return MessageWindow(self.memories.get(session_id, _EMPTY))
+    
+    def get_messages_since(self, session_id: str, start: int) -> Sequence:
+        """Messages after the first ``start``; the UI uses this to send only what the browser lacks."""
+        if self.store is not None:
+            return self.store.get_messages(session_id, start)
+        return MessageWindow(self.memories.get(session_id, _EMPTY), start)
+    
+    def count(self, session_id: str) -> int:
+        """Number of messages stored for a session."""
+        if self.store is not None:
+            return self.store.count_messages(session_id)
+        return len(self.memories.get(session_id, _EMPTY))
     
     def add_message(self, session_id: str, role: str, content: str):
         """Add a message to session memory."""
+        if self.store is not None:
+            self.store.append_message(session_id, role, content)
+            return
+        
         if session_id not in self.memories:
             self.memories[session_id] = []
         
-        self.memories[session_id].append({
-            "role": role,
-            "content": content
-        })
+        self.memories[session_id].append(Message(role, content))
     
     def clear(self, session_id: str):
         """Clear memory for a session."""
+        if self.store is not None:
+            self.store.clear_messages(session_id)
         if session_id in self.memories:
             del self.memories[session_id]
     
-    def get_conversation_context(self, session_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
-        """Get recent conversation context."""
-        messages = self.get_messages(session_id)
-        return messages[-max_messages:] if len(messages) > max_messages else messages
-
+    def get_conversation_context(self, session_id: str, max_messages: Optional[int] = None) -> Sequence:
+        """Get recent conversation context, as a view of the last ``max_messages`` messages."""
+        if max_messages is None:
+            max_messages = settings.memory_max_messages
+        if self.store is not None:
+            return self.store.get_recent_messages(session_id, max_messages)
+        messages = self.memories.get(session_id, _EMPTY)
+        return MessageWindow(messages, len(messages) - max_messages)
@@ -0,0 +1,172 @@
+"""Per-component memory accounting and on-demand tracemalloc snapshots for the admin API.
+
+``MemoryAccountant`` walks the object graph of each registered component
+(session memory, auth state, caches, ...) and reports the bytes reachable
+from it. Components are walked in registration order with one shared
+"seen" set, so an object reachable from two components is counted once,
+for the first. Infrastructure passed to ``ignore`` (the MCP client, the
+shared store) is neither counted nor walked into.
+
+``AllocationTracer`` starts tracemalloc on its first snapshot; each later
+snapshot reports the top allocation sites and the difference from the
+previous one. Tracing slows every allocation down, so stop it when done.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from typing import Any, Callable, Dict, List, Optional
+
+# Never walked into: code and type objects are shared by everything
+_OPAQUE = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    types.CodeType, types.FrameType, str, bytes, bytearray, int, float, complex, bool, type(None),
+)
+
+
+def deep_sizeof(root: Any, seen: Optional[set] = None) -> tuple:
+    """``(bytes, objects)`` reachable from ``root`` through containers, ``__dict__`` and ``__slots__``.
+
+    Ids in ``seen`` are skipped, and every object visited is added to it.
+    """
+    if seen is None:
+        seen = set()
+    total = count = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        count += 1
+        if isinstance(obj, _OPAQUE):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        attributes = getattr(obj, "__dict__", None)
+        if isinstance(attributes, dict):
+            stack.append(attributes)
+        for cls in type(obj).__mro__:
+            slots = cls.__dict__.get("__slots__", ())
+            for slot in (slots,) if isinstance(slots, str) else slots:
+                if slot in ("__dict__", "__weakref__"):
+                    continue
+                value = getattr(obj, slot, None)
+                if value is not None:
+                    stack.append(value)
+    return total, count
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryAccountant:
+    """Bytes held by each registered component, measured on request."""
+    
+    def __init__(self):
+        self._components: Dict[str, Callable[[], Any]] = {}
+        self._ignored: List[Any] = []
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, root: Callable[[], Any]):
+        """Account what ``root()`` reaches under ``name``; the callable is evaluated per report."""
+        self._components[name] = root
+    
+    def ignore(self, obj: Any):
+        """Exclude a shared object (and what only it reaches) from every component."""
+        self._ignored.append(obj)
+    
+    def report(self) -> Dict[str, Any]:
+        """Per-component ``bytes``/``objects``, their total, and the process RSS for comparison."""
+        # One walk at a time: a report over 10^5 sessions walks ~10^6 objects and takes seconds
+        with self._lock:
+            start = time.perf_counter()
+            seen = {id(obj) for obj in self._ignored}
+            components = {}
+            for name, root in self._components.items():
+                size, objects = deep_sizeof(root(), seen)
+                components[name] = {"bytes": size, "objects": objects}
+            return {
+                "components": components,
+                "accounted_bytes": sum(c["bytes"] for c in components.values()),
+                "rss_bytes": rss_bytes(),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+
+
+class AllocationTracer:
+    """tracemalloc snapshots with top allocation sites and the diff from the previous snapshot."""
+    
+    KEY_TYPES = ("lineno", "filename", "traceback")
+    
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _stat(stat) -> Dict[str, Any]:
+        entry = {
+            "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "bytes": stat.size,
+            "count": stat.count,
+        }
+        if hasattr(stat, "size_diff"):
+            entry["bytes_diff"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        return entry
+    
+    def snapshot(self, top: int = 20, key_type: str = "lineno", frames: int = 1) -> Dict[str, Any]:
+        """Take a snapshot, starting tracing with ``frames`` deep stacks if needed.
+
+        Only allocations made after tracing started are seen, so the first
+        snapshot is a baseline and later ones show what grew since.
+        """
+        if key_type not in self.KEY_TYPES:
+            raise ValueError(f"key_type must be one of {', '.join(self.KEY_TYPES)}")
+        with self._lock:
+            started = False
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+                self._previous = None
+                self._started_at = time.time()
+                started = True
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            result = {
+                "started": started,
+                "tracing_since": self._started_at,
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "top": [self._stat(s) for s in snapshot.statistics(key_type)[:top]],
+                "diff": [],
+            }
+            if self._previous is not None:
+                result["diff"] = [self._stat(s) for s in snapshot.compare_to(self._previous, key_type)[:top]]
+            self._previous = snapshot
+            return result
+    
+    def stop(self) -> bool:
+        """Stop tracing and drop the stored snapshot; False if tracing was not on."""
+        with self._lock:
+            self._previous = None
+            self._started_at = None
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            return True
@@ -0,0 +1,58 @@
+"""Lightweight in-process counters and timings."""
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any
+
+
+class Metrics:
+    """Thread-safe counters plus bounded latency samples for percentiles."""
+    
+    def __init__(self, max_samples: int = 1024):
+        self.max_samples = max_samples
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+    
+    def incr(self, name: str, value: float = 1):
+        """Add ``value`` to counter ``name``."""
+        with self._lock:
+            self._counters[name] += value
+    
+    def observe(self, name: str, value: float):
+        """Record one sample (e.g. a latency in seconds) for ``name``."""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(value)
+            self._counters[name + ".count"] += 1
+            self._counters[name + ".sum"] += value
+    
+    def get(self, name: str) -> float:
+        """Current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+    
+    def percentile(self, name: str, q: float) -> float:
+        """Approximate ``q`` percentile (0-100) over recent samples of ``name``."""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+        return samples[index]
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return counters and percentile summaries as plain data."""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._samples)
+        timings = {
+            name: {
+                "p50": self.percentile(name, 50),
+                "p95": self.percentile(name, 95),
+                "p99": self.percentile(name, 99),
+            }
+            for name in names
+        }
+        return {"counters": counters, "timings": timings}
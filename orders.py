@@ -0,0 +1,215 @@
+"""Background order submission: acknowledge ``create_order`` at once, place it on a worker.
+
+With ``async_orders`` on, a turn whose only tool call is a valid, priced
+``create_order`` returns an acknowledgment carrying a pending-order
+reference instead of waiting for the order write and a second LLM round.
+A worker pool places the order; its outcome is queued per session and
+shown on the next turn or UI poll (see ``OrderPipeline.drain``).
+
+Each order gets an idempotency key derived from the session, the turn's
+message, the customer and the items. The same turn submitted again (a
+double submit or client retry) while its order is pending returns the
+existing handle instead of a second write; once the order completed, or
+from a different message, the same items make a new order. The MCP
+server takes no idempotency key, so this deduplication is client-side,
+and a write that fails ambiguously (e.g. a timeout) is reported rather
+than retried.
+
+Undelivered outcomes are bounded: each session keeps its latest
+``OUTBOX_PER_SESSION``, at most ``OUTBOX_SESSIONS`` sessions are kept,
+and outcomes nobody collected within ``OUTBOX_TTL`` seconds are dropped.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from decimal import Decimal
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional
+from metrics import Metrics
+from templates import parse_fields
+
+
+PENDING = "pending"
+PLACED = "placed"
+FAILED = "failed"
+
+
+@dataclass
+class PendingOrder:
+    """Handle for one order being placed in the background."""
+    reference: str
+    key: str
+    session_id: str
+    arguments: Dict[str, Any]
+    status: str = PENDING
+    result: str = ""
+    submitted_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    # Set when the session was cleared; the outcome is then not delivered
+    discarded: bool = False
+    future: Optional[Future] = field(default=None, repr=False)
+    
+    def summary(self) -> str:
+        items = ", ".join(f"{item['quantity']} x {item['sku']}" for item in self.arguments.get("items", []))
+        return f"{self.reference} ({items})"
+
+
+def idempotency_key(session_id: str, arguments: Dict[str, Any], turn: str = "") -> str:
+    """Stable key for "this turn of this session placing this order", independent of item order.
+
+    ``turn`` identifies the request that produced the order (the user's
+    message); repeats of it are duplicates, other requests are new orders.
+    """
+    items = sorted((item["sku"], item["quantity"]) for item in arguments.get("items", []))
+    payload = json.dumps([session_id, turn.strip(), arguments.get("customer_id"), items])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class OrderPipeline:
+    """Worker pool placing orders with ``place(session_id, arguments) -> text``.
+
+    ``place`` returns the server's text for a placed order; an exception or
+    a result starting with "Error" marks the order failed. Outcomes are
+    kept in a per-session outbox until ``drain`` collects them.
+    """
+    
+    # Bounds on outcomes waiting for delivery (see the module docstring)
+    OUTBOX_PER_SESSION = 20
+    OUTBOX_SESSIONS = 4096
+    OUTBOX_TTL = 3600.0
+    
+    def __init__(self, place: Callable[[str, Dict[str, Any]], str], workers: int = 4,
+                 metrics: Optional[Metrics] = None):
+        self.place = place
+        self.workers = workers
+        self.metrics = metrics or Metrics()
+        # Orders still being placed, by idempotency key
+        self._by_key: Dict[str, PendingOrder] = {}
+        # Oldest-updated session first
+        self._outbox: Dict[str, List[PendingOrder]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def submit(self, session_id: str, arguments: Dict[str, Any], turn: str = "") -> PendingOrder:
+        """Queue an order and return its handle; a repeat of a pending one returns the original handle."""
+        key = idempotency_key(session_id, arguments, turn)
+        with self._lock:
+            existing = self._by_key.get(key)
+            if existing is not None:
+                self.metrics.incr("orders.deduplicated")
+                return existing
+            order = PendingOrder(reference=f"P-{uuid.uuid4().hex[:8].upper()}", key=key, session_id=session_id, arguments=arguments)
+            self._by_key[key] = order
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="orders")
+            order.future = self._executor.submit(self._run, order)
+        self.metrics.incr("orders.submitted")
+        return order
+    
+    def _run(self, order: PendingOrder):
+        start = time.perf_counter()
+        try:
+            result = self.place(order.session_id, order.arguments)
+            status = FAILED if result.startswith("Error") else PLACED
+        except Exception as e:
+            result, status = f"Error: {e}", FAILED
+        self.metrics.observe("orders.latency", time.perf_counter() - start)
+        self.metrics.incr(f"orders.{status}")
+        with self._lock:
+            order.result = result
+            order.status = status
+            order.finished_at = time.monotonic()
+            # Only a pending order absorbs repeats; the same items again later are a new order
+            self._by_key.pop(order.key, None)
+            self._expire()
+            if not order.discarded:
+                self._deliver(order)
+    
+    def _deliver(self, order: PendingOrder):
+        """Queue a finished order's outcome; call with the lock held."""
+        outbox = self._outbox.pop(order.session_id, [])
+        outbox.append(order)
+        dropped = len(outbox) - self.OUTBOX_PER_SESSION
+        if dropped > 0:
+            del outbox[:dropped]
+            self.metrics.incr("orders.outcomes_dropped", dropped)
+        self._outbox[order.session_id] = outbox
+        while len(self._outbox) > self.OUTBOX_SESSIONS:
+            oldest = next(iter(self._outbox))
+            self.metrics.incr("orders.outcomes_dropped", len(self._outbox.pop(oldest)))
+    
+    def _expire(self):
+        """Drop outcomes nobody collected within ``OUTBOX_TTL``; call with the lock held."""
+        cutoff = time.monotonic() - self.OUTBOX_TTL
+        for session_id in list(self._outbox):
+            outbox = self._outbox[session_id]
+            kept = [order for order in outbox if order.finished_at > cutoff]
+            if len(kept) < len(outbox):
+                self.metrics.incr("orders.outcomes_dropped", len(outbox) - len(kept))
+                if kept:
+                    self._outbox[session_id] = kept
+                else:
+                    del self._outbox[session_id]
+    
+    def pending(self, session_id: str) -> List[PendingOrder]:
+        """Orders of ``session_id`` still being placed."""
+        with self._lock:
+            return [o for o in self._by_key.values() if o.session_id == session_id and o.status == PENDING]
+    
+    def has_updates(self, session_id: str) -> bool:
+        with self._lock:
+            return bool(self._outbox.get(session_id))
+    
+    def drain(self, session_id: str) -> List[PendingOrder]:
+        """Completed orders of ``session_id`` not yet shown to the user, oldest first."""
+        with self._lock:
+            self._expire()
+            return self._outbox.pop(session_id, [])
+    
+    def discard(self, session_id: str):
+        """Forget ``session_id``'s undelivered outcomes, including those of orders still being placed."""
+        with self._lock:
+            self._outbox.pop(session_id, None)
+            for order in self._by_key.values():
+                if order.session_id == session_id:
+                    order.discarded = True
+    
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def render_acknowledgment(order: PendingOrder, names: Dict[str, str]) -> str:
+    """The turn's reply for a queued order (or for a repeat of one already queued).
+
+    The outcome is always delivered through the outbox, so this never reports
+    it, even if the order already finished.
+    """
+    items = order.arguments["items"]
+    lines = [f"🕒 Placing your order (reference {order.reference}):", ""]
+    for item in items:
+        name = names.get(item["sku"], item["sku"])
+        price = f" at {item['unit_price']} {item.get('currency', 'USD')}" if item.get("unit_price") else ""
+        lines.append(f"- {item['quantity']} × {name} ({item['sku']}){price}")
+    # Unpriced lines (catalog pricing off, or a product it could not read) are priced by the server
+    if items and all(item.get("unit_price") for item in items):
+        total = sum(Decimal(item["unit_price"]) * item["quantity"] for item in items)
+        lines.extend(["", f"Total: {total:.2f} {items[0].get('currency', 'USD')}"])
+    lines.extend(["", "I'll post the confirmation here as soon as it goes through; feel free to keep chatting."])
+    return "\n".join(lines)
+
+
+def render_outcome(order: PendingOrder) -> str:
+    """The message posted to the session once the order was placed or failed."""
+    if order.status == PLACED:
+        fields, _ = parse_fields(order.result)
+        details = [f"- {label}: {fields[key]}" for label, key in
+                   (("Order ID", "order id"), ("Status", "status"), ("Total", "total")) if fields.get(key)]
+        body = "\n".join(details) if details else order.result
+        return f"✅ Your order {order.reference} has been placed.\n\n{body}"
+    reason = order.result[len("Error:"):].strip() if order.result.startswith("Error:") else order.result
+    return (f"❌ Your order {order.reference} could not be placed: {reason}\n\n"
+            "Please check your orders before trying again.")
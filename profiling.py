@@ -0,0 +1,151 @@
+"""Opt-in profiling of selected chat turns.
+
+Selected turns are either every Nth turn (``profile_sample_every``) or any
+turn slower than ``profile_slow_ms``. Two modes:
+
+- ``stack``: a background thread samples the turn's Python stack every
+  ``profile_interval_ms`` and writes collapsed stacks (``a;b;c 12``), the
+  input format of flamegraph.pl and speedscope.
+- ``cprofile``: deterministic cProfile of the turn, written as ``.prof``
+  for pstats/snakeviz. Higher overhead, so it is only used for every-Nth
+  selection, never to catch slow turns.
+
+When both selectors are 0, ``turn()`` returns a shared no-op context.
+"""
+import cProfile
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Optional
+from config import settings
+
+
+_DISABLED = nullcontext()
+
+
+def _collapse(frame) -> str:
+    """Render a frame and its callers as ``outer;...;inner``."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """One daemon thread sampling the stacks of all threads currently in a profiled turn."""
+    
+    def __init__(self):
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self, thread_id: int) -> Counter:
+        with self._lock:
+            stacks = self._active[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="turn-sampler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+            return stacks
+    
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+    
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                targets = dict(self._active)
+            frames = sys._current_frames()
+            for thread_id, stacks in targets.items():
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != own:
+                    stacks[_collapse(frame)] += 1
+            del frames
+            time.sleep(max(settings.profile_interval_ms, 0.5) / 1000)
+
+
+class _ProfiledTurn:
+    def __init__(self, profiler: "TurnProfiler", label: str, keep_always: bool, mode: str):
+        self.profiler = profiler
+        self.label = label
+        self.keep_always = keep_always
+        self.mode = mode
+        self._profile: Optional[cProfile.Profile] = None
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._thread_id = threading.get_ident()
+            self.profiler.sampler.start(self._thread_id)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        if self._profile is not None:
+            self._profile.disable()
+            if self.keep_always:
+                self.profiler._write_cprofile(self.label, elapsed_ms, self._profile)
+            return False
+        stacks = self.profiler.sampler.stop(self._thread_id)
+        slow_ms = settings.profile_slow_ms
+        if self.keep_always or (slow_ms and elapsed_ms >= slow_ms):
+            self.profiler._write_stacks(self.label, elapsed_ms, stacks)
+        return False
+
+
+class TurnProfiler:
+    """Decides which turns to profile and writes their profiles to ``profile_dir``."""
+    
+    def __init__(self):
+        self.sampler = _Sampler()
+        self._turns = itertools.count(1)
+        self._files = itertools.count(1)
+        self.written = 0
+    
+    def turn(self, label: str = "turn"):
+        """Context manager around one chat turn."""
+        every = settings.profile_sample_every
+        slow_ms = settings.profile_slow_ms
+        if not every and not slow_ms:
+            return _DISABLED
+        keep_always = bool(every) and next(self._turns) % every == 0
+        if not keep_always and not slow_ms:
+            return _DISABLED
+        # cProfile is too costly to run on every turn just to catch slow ones
+        mode = settings.profile_mode if keep_always else "stack"
+        return _ProfiledTurn(self, label, keep_always, mode)
+    
+    def _path(self, label: str, elapsed_ms: float, suffix: str) -> str:
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:40]
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{safe}-{elapsed_ms:.0f}ms-{os.getpid()}-{next(self._files)}{suffix}"
+        return os.path.join(settings.profile_dir, name)
+    
+    def _write_stacks(self, label: str, elapsed_ms: float, stacks: Counter):
+        if not stacks:
+            return
+        with open(self._path(label, elapsed_ms, ".collapsed"), "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.written += 1
+    
+    def _write_cprofile(self, label: str, elapsed_ms: float, profile: cProfile.Profile):
+        profile.dump_stats(self._path(label, elapsed_ms, ".prof"))
+        self.written += 1
+
+
+profiler = TurnProfiler()
@@ -0,0 +1,150 @@
+"""Token-bucket admission control for upstream calls."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from metrics import Metrics
+
+
+class RateLimited(Exception):
+    """Raised when a call is shed instead of waiting for capacity."""
+
+
+class TokenBucket:
+    """Classic token bucket. Waiting callers reserve tokens, so they are served in arrival order."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def set_rate(self, rate: float, capacity: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.capacity = capacity
+            self._tokens = min(self._tokens, capacity)
+    
+    def reserve(self, cost: float, max_wait: float) -> Optional[float]:
+        """Take ``cost`` tokens, returning the seconds to wait for them, or None if that exceeds ``max_wait``."""
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (cost - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= cost
+            return wait
+    
+    def refund(self, cost: float):
+        """Return tokens from a reservation that was not used."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + cost)
+    
+    def consume(self, cost: float):
+        """Adjust for a cost learned after the fact; may go negative and delay later callers."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= cost
+    
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimiter:
+    """A global bucket plus one bucket per key (e.g. session), both of which must admit a call.
+
+    A rate of 0 disables that level. Per-key buckets are kept in a bounded
+    LRU; an evicted idle key would have refilled to capacity anyway.
+    """
+    
+    def __init__(self, name: str, global_rate: float, per_key_rate: float, burst_seconds: float = 2.0,
+                 max_wait: float = 2.0, max_keys: int = 10000, metrics: Optional[Metrics] = None):
+        self.name = name
+        self.per_key_rate = per_key_rate
+        self.burst_seconds = burst_seconds
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self.metrics = metrics or Metrics()
+        self.global_bucket = TokenBucket(global_rate, global_rate * burst_seconds) if global_rate > 0 else None
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def configure(self, global_rate: float, per_key_rate: float, max_wait: Optional[float] = None):
+        """Change rates in place; buckets keep their current fill, clamped to the new capacity."""
+        with self._lock:
+            if max_wait is not None:
+                self.max_wait = max_wait
+            if global_rate <= 0:
+                self.global_bucket = None
+            elif self.global_bucket is None:
+                self.global_bucket = TokenBucket(global_rate, global_rate * self.burst_seconds)
+            else:
+                self.global_bucket.set_rate(global_rate, global_rate * self.burst_seconds)
+            self.per_key_rate = per_key_rate
+            if per_key_rate <= 0:
+                self._buckets.clear()
+            for bucket in self._buckets.values():
+                bucket.set_rate(per_key_rate, per_key_rate * self.burst_seconds)
+    
+    def _bucket(self, key: Optional[str]) -> Optional[TokenBucket]:
+        if key is None or self.per_key_rate <= 0:
+            return None
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.per_key_rate, self.per_key_rate * self.burst_seconds)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+    
+    def acquire(self, key: Optional[str] = None, cost: float = 1, max_wait: Optional[float] = None):
+        """Wait up to ``max_wait`` seconds for capacity, or raise RateLimited."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        reserved = []
+        wait = 0.0
+        for level, bucket in (("session", self._bucket(key)), ("global", self.global_bucket)):
+            if bucket is None:
+                continue
+            # Cap at capacity so an oversized request waits for a full bucket instead of never fitting
+            bucket_wait = bucket.reserve(min(cost, bucket.capacity), max_wait)
+            if bucket_wait is None:
+                for taken in reserved:
+                    taken.refund(min(cost, taken.capacity))
+                self.metrics.incr(f"ratelimit.{self.name}.shed.{level}")
+                raise RateLimited(f"{self.name} {level} limit reached")
+            reserved.append(bucket)
+            wait = max(wait, bucket_wait)
+        if wait > 0:
+            self.metrics.observe(f"ratelimit.{self.name}.wait", wait)
+            time.sleep(wait)
+        self.metrics.incr(f"ratelimit.{self.name}.admitted")
+    
+    def adjust(self, key: Optional[str], cost: float):
+        """Charge (or credit, if negative) the difference between estimated and actual cost."""
+        for bucket in (self._bucket(key), self.global_bucket):
+            if bucket is not None:
+                bucket.consume(cost)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current headroom and counters, for dashboards."""
+        return {
+            "global_available": self.global_bucket.available if self.global_bucket else None,
+            "tracked_keys": len(self._buckets),
+            "admitted": self.metrics.get(f"ratelimit.{self.name}.admitted"),
+            "shed": {
+                level: self.metrics.get(f"ratelimit.{self.name}.shed.{level}") for level in ("session", "global")
+            },
+            "wait_p95": self.metrics.percentile(f"ratelimit.{self.name}.wait", 95),
+        }
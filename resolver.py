@@ -0,0 +1,305 @@
+"""Typo-tolerant SKU and product-name resolution over the local catalog.
+
+Usage: python resolver.py QUERY [QUERY ...]   (against the stand-in catalog)
+"""
+import heapq
+import re
+import sys
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+from catalog import CatalogDelta, Product
+from validation import ToolArgumentError, canonical_sku
+
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# A fuzzy match is used without asking only if it is good and clearly ahead of the next one
+CONFIDENT_SCORE = 0.6
+CONFIDENT_MARGIN = 0.15
+MIN_SCORE = 0.3
+
+
+def normalize(text: str) -> List[str]:
+    """Lowercase words with punctuation removed; SKUs collapse to one word (``COM-0001`` -> ``com0001``)."""
+    text = text.lower()
+    text = re.sub(r"\b([a-z]{3})[\s_\-]+(\d{1,4})\b", r"\1\2", text)
+    return [word for word in _NON_ALNUM.split(text) if word]
+
+
+def trigrams(words: Iterable[str]) -> Set[str]:
+    """Padded character trigrams of each word, so prefixes weigh more than inner letters."""
+    grams: Set[str] = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted index from trigram to keys, ranked by overlap with the query.
+
+    Entries can be replaced or removed, so the index follows catalog deltas
+    without a rebuild.
+    """
+    
+    def __init__(self):
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+    
+    def __len__(self) -> int:
+        return len(self._grams)
+    
+    def add(self, key: str, words: Iterable[str]):
+        """Index ``key`` under the trigrams of ``words``, replacing any previous entry."""
+        grams = frozenset(trigrams(words))
+        previous = self._grams.get(key)
+        if previous == grams:
+            return
+        if previous is not None:
+            self._unpost(key, previous - grams)
+        self._grams[key] = grams
+        for gram in grams - (previous or frozenset()):
+            self._postings[gram].add(key)
+    
+    def remove(self, key: str):
+        grams = self._grams.pop(key, None)
+        if grams is not None:
+            self._unpost(key, grams)
+    
+    def _unpost(self, key: str, grams: Iterable[str]):
+        for gram in grams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+    
+    def search(self, words: Iterable[str], limit: int = 5) -> List[Tuple[str, float]]:
+        """Top ``limit`` keys by a blend of query coverage and Dice similarity."""
+        grams = trigrams(words)
+        if not grams:
+            return []
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for key in self._postings.get(gram, ()):
+                shared[key] += 1
+        # Coverage favours names containing the whole query; Dice breaks ties toward shorter names
+        scored = (
+            (0.6 * count / len(grams) + 0.4 * 2 * count / (len(grams) + len(self._grams[key])), key)
+            for key, count in shared.items()
+        )
+        return [(key, score) for score, key in heapq.nlargest(limit, scored)]
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance counting an adjacent transposition as one edit."""
+    if a == b:
+        return 0
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = previous[j - 1] + (ca != cb)
+            insert = current[j - 1] + 1
+            delete = previous[j] + 1
+            best = cost if cost < insert else insert
+            best = best if best < delete else delete
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb and before[j - 2] + 1 < best:
+                best = before[j - 2] + 1
+            current.append(best)
+        before, previous = previous, current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """1.0 for equal words, falling with edit distance relative to length."""
+    return 1.0 - edit_distance(a, b) / max(len(a), len(b), 1)
+
+
+@dataclass(frozen=True)
+class Match:
+    product: Product
+    score: float
+
+
+class ProductResolver:
+    """Resolves what users type (``COM-001``, ``dell moniter``) to catalog products.
+
+    Trigram overlap finds candidate products and candidate words; edit
+    distance between the query's words and those candidates then ranks them,
+    which handles transpositions trigrams score poorly (``keybaord``).
+    """
+    
+    def __init__(self, products: Mapping[str, Product]):
+        self.products = products
+        self._index = TrigramIndex()
+        self._words = TrigramIndex()
+        self._product_words: Dict[str, FrozenSet[str]] = {}
+        # How many products use each word; a word leaves the word index when its count reaches 0
+        self._word_counts: Counter = Counter()
+        # Typos recur, so unknown words' neighbours are memoized (bounded)
+        self._near: Dict[str, Dict[str, float]] = {}
+        # apply() runs on the refreshing thread while other turns resolve
+        self._lock = threading.RLock()
+        for product in products.values():
+            self._index_product(product)
+        self.vocabulary = frozenset(self._word_counts)
+    
+    def _index_product(self, product: Product) -> bool:
+        """(Re)index one product; True if the vocabulary changed."""
+        words = frozenset(normalize(f"{product.sku} {product.name}"))
+        previous = self._product_words.get(product.sku)
+        if previous == words:
+            return False
+        self._index.add(product.sku, words)
+        self._product_words[product.sku] = words
+        return self._count_words(words, previous or frozenset())
+    
+    def _unindex(self, sku: str) -> bool:
+        previous = self._product_words.pop(sku, None)
+        if previous is None:
+            return False
+        self._index.remove(sku)
+        return self._count_words(frozenset(), previous)
+    
+    def _count_words(self, words: FrozenSet[str], previous: FrozenSet[str]) -> bool:
+        vocabulary_changed = False
+        for word in words - previous:
+            self._word_counts[word] += 1
+            if self._word_counts[word] == 1:
+                self._words.add(word, [word])
+                vocabulary_changed = True
+        for word in previous - words:
+            self._word_counts[word] -= 1
+            if not self._word_counts[word]:
+                del self._word_counts[word]
+                self._words.remove(word)
+                vocabulary_changed = True
+        return vocabulary_changed
+    
+    def apply(self, delta: CatalogDelta, products: Optional[Mapping[str, Product]] = None):
+        """Follow a catalog refresh: reindex only products whose SKU or name words changed.
+
+        Prices and stock are read from ``products`` (the catalog's mapping,
+        passed again when the catalog swapped in a new one), so changes to
+        them need no work here.
+        """
+        with self._lock:
+            if products is not None:
+                self.products = products
+            vocabulary_changed = False
+            for sku in (*delta.added, *delta.changed):
+                product = self.products.get(sku)
+                if product is not None:
+                    vocabulary_changed |= self._index_product(product)
+            for sku in delta.removed:
+                vocabulary_changed |= self._unindex(sku)
+            if vocabulary_changed:
+                self.vocabulary = frozenset(self._word_counts)
+                self._near = {}
+    
+    def _closest_words(self, word: str, limit: int = 5) -> Dict[str, float]:
+        """Catalog words near ``word`` with their edit similarity."""
+        if word in self.vocabulary:
+            return {word: 1.0}
+        near = self._near.get(word)
+        if near is None:
+            # Words whose lengths differ by more than two cannot score well; skip the edit distance
+            near = {
+                candidate: similarity(word, candidate)
+                for candidate, _ in self._words.search([word], limit)
+                if abs(len(candidate) - len(word)) <= 2
+            }
+            if len(self._near) < 4096:
+                self._near[word] = near
+        return near
+    
+    def resolve(self, query: str, limit: int = 5) -> List[Match]:
+        """Ranked candidates for a SKU or product name; an exact SKU is the only result."""
+        try:
+            sku = canonical_sku(query)
+        except ToolArgumentError:
+            sku = None
+        if sku in self.products:
+            return [Match(self.products[sku], 1.0)]
+        words = normalize(query)
+        if not words:
+            return []
+        with self._lock:
+            return self._rank(words, limit)
+    
+    def _rank(self, words: List[str], limit: int) -> List[Match]:
+        closest = [self._closest_words(word) for word in words]
+        matches = []
+        for sku, trigram_score in self._index.search(words, limit=max(20, limit)):
+            if sku not in self.products:
+                continue
+            product_words = self._product_words[sku]
+            edit_score = sum(
+                max((score for word, score in near.items() if word in product_words), default=0.0)
+                for near in closest
+            ) / len(closest)
+            score = (trigram_score + edit_score) / 2
+            if score >= MIN_SCORE:
+                matches.append(Match(self.products[sku], score))
+        matches.sort(key=lambda match: match.score, reverse=True)
+        return matches[:limit]
+    
+    def resolve_sku(self, query: str) -> str:
+        """The SKU ``query`` refers to, or ToolArgumentError listing the closest products.
+
+        SKU-shaped input is returned canonicalized even when it is not in the
+        snapshot: the product may be newer than it, and get_product decides.
+        Only names and other non-SKU input are resolved fuzzily.
+        """
+        try:
+            return canonical_sku(query)
+        except ToolArgumentError:
+            pass
+        matches = self.resolve(query)
+        if matches and matches[0].score >= CONFIDENT_SCORE and (
+                len(matches) == 1 or matches[0].score - matches[1].score >= CONFIDENT_MARGIN):
+            return matches[0].product.sku
+        if not matches:
+            raise ToolArgumentError(f"No product matches '{query}'. Try search_products.")
+        suggestions = ", ".join(f"{m.product.sku} ({m.product.name})" for m in matches[:3])
+        raise ToolArgumentError(f"No exact product for '{query}'. Closest matches: {suggestions}")
+    
+    def correct_query(self, query: str) -> str:
+        """Replace misspelled words with the closest catalog word, leaving known words alone.
+
+        The vocabulary holds product names only, so a description or category
+        term can be "corrected" too; callers use this after a search found
+        nothing, never in place of the user's query.
+        """
+        corrected = []
+        changed = False
+        for word in query.split():
+            key = word.lower().strip(".,!?")
+            if len(key) >= 4 and key.isalpha() and key not in self.vocabulary:
+                with self._lock:
+                    near = [(score, candidate) for candidate, score in self._closest_words(key).items() if candidate.isalpha()]
+                if near and max(near)[0] >= 0.7:
+                    corrected.append(max(near)[1])
+                    changed = True
+                    continue
+            corrected.append(word)
+        return " ".join(corrected) if changed else query
+
+
+def main():
+    from catalog import parse_product_lines
+    from standins import PRODUCTS, MCPStandIn
+    lines = "\n".join(MCPStandIn._product_line(p) for p in PRODUCTS)
+    resolver = ProductResolver(parse_product_lines(lines))
+    for query in sys.argv[1:]:
+        print(f"{query!r} -> search {resolver.correct_query(query)!r}")
+        for match in resolver.resolve(query):
+            print(f"    {match.score:.2f}  {match.product.sku}  {match.product.name}")
+
+
+if __name__ == "__main__":
+    main()
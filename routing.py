@@ -0,0 +1,89 @@
+"""Per-step model routing for the support agent's LLM calls."""
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+from metrics import Metrics
+
+
+@dataclass(frozen=True)
+class Route:
+    """A named routing decision; stats are reported per route name."""
+    name: str
+    model: str
+
+
+class ModelRouter:
+    """Chooses a model for each LLM call from cheap per-turn signals.
+
+    Tool selection for anonymous product questions and answers over small,
+    read-only tool output go to the fast model. Authenticated turns (order
+    lookups and placement), long conversations, large or failed tool output
+    and anything that mutated state go to the main model.
+    """
+    
+    def __init__(self, main_model: str, fast_model: Optional[str] = None,
+                 small_output_chars: int = 2000, long_history_messages: int = 12,
+                 metrics: Optional[Metrics] = None):
+        self.main_model = main_model
+        # Without a fast model every route resolves to the main model
+        self.fast_model = fast_model or main_model
+        self.small_output_chars = small_output_chars
+        self.long_history_messages = long_history_messages
+        self.metrics = metrics or Metrics()
+        # Route name -> model, in first-use order
+        self._routes: Dict[str, str] = {}
+    
+    def _route(self, name: str, model: str) -> Route:
+        self._routes[name] = model
+        return Route(name, model)
+    
+    def for_selection(self, is_authenticated: bool, history_length: int) -> Route:
+        """Route the first call, which may request tools."""
+        if is_authenticated:
+            return self._route("select.authenticated", self.main_model)
+        if history_length > self.long_history_messages:
+            return self._route("select.long_history", self.main_model)
+        return self._route("select.simple", self.fast_model)
+    
+    def for_answer(self, tool_results: List[Dict[str, Any]], mutated: bool) -> Route:
+        """Route the final call that turns tool results into a reply."""
+        if mutated:
+            return self._route("answer.mutation", self.main_model)
+        if any(str(result.get("content", "")).startswith("Error") for result in tool_results):
+            return self._route("answer.error", self.main_model)
+        output_chars = sum(len(str(result.get("content", ""))) for result in tool_results)
+        if output_chars > self.small_output_chars:
+            return self._route("answer.large_output", self.main_model)
+        return self._route("answer.small_output", self.fast_model)
+    
+    def complete(self, client, route: Route, **kwargs) -> Any:
+        """Call ``client.chat.completions.create`` on the route's model and record stats."""
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=route.model, **kwargs)
+        except Exception:
+            self.metrics.incr(f"route.{route.name}.errors")
+            raise
+        self.metrics.observe(f"route.{route.name}.latency", time.perf_counter() - start)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.metrics.incr(f"route.{route.name}.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+            self.metrics.incr(f"route.{route.name}.completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+        return response
+    
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Calls, latency percentiles and token totals for every route used so far."""
+        report = {}
+        for name, model in list(self._routes.items()):
+            prefix = f"route.{name}"
+            calls = self.metrics.get(prefix + ".latency.count")
+            report[name] = {
+                "model": model,
+                "calls": int(calls),
+                "errors": int(self.metrics.get(prefix + ".errors")),
+                "p50_ms": round(self.metrics.percentile(prefix + ".latency", 50) * 1000, 1),
+                "p95_ms": round(self.metrics.percentile(prefix + ".latency", 95) * 1000, 1),
+                "prompt_tokens": int(self.metrics.get(prefix + ".prompt_tokens")),
+                "completion_tokens": int(self.metrics.get(prefix + ".completion_tokens")),
+            }
+        return report
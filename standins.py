@@ -0,0 +1,440 @@
+"""Local stand-ins for external services, used by offline tests and benchmarks."""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Any, Callable, List, Optional, Union
+from llm import to_namespace
+
+
+PRODUCTS = [
+    {"sku": "COM-0001", "name": "Dell XPS Desktop", "category": "Computers", "price": "1299.00", "stock": 15},
+    {"sku": "COM-0002", "name": "MacBook Pro 14", "category": "Computers", "price": "1999.00", "stock": 8},
+    {"sku": "COM-0003", "name": "Gaming PC RTX", "category": "Computers", "price": "2499.00", "stock": 3},
+    {"sku": "MON-0054", "name": "Dell 27 inch 4K Monitor", "category": "Monitors", "price": "349.99", "stock": 22},
+    {"sku": "MON-0055", "name": "LG 34 inch Ultrawide Monitor", "category": "Monitors", "price": "499.99", "stock": 10},
+    {"sku": "MON-0056", "name": "Samsung 24 inch Monitor", "category": "Monitors", "price": "179.99", "stock": 0},
+    {"sku": "PRI-0010", "name": "HP LaserJet Pro", "category": "Printers", "price": "229.00", "stock": 12},
+    {"sku": "PRI-0011", "name": "Epson EcoTank Inkjet", "category": "Printers", "price": "279.00", "stock": 6},
+    {"sku": "ACC-0100", "name": "Logitech MX Keys Keyboard", "category": "Accessories", "price": "99.99", "stock": 40},
+    {"sku": "ACC-0101", "name": "Logitech MX Master Mouse", "category": "Accessories", "price": "89.99", "stock": 35},
+    {"sku": "NET-0200", "name": "Netgear Nighthawk Router", "category": "Networking", "price": "199.99", "stock": 9},
+    {"sku": "NET-0201", "name": "TP-Link 8-Port Switch", "category": "Networking", "price": "39.99", "stock": 50},
+]
+
+CUSTOMERS = [
+    {"customer_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7", "name": "Donald Garcia",
+     "email": "donaldgarcia@example.net", "pin": "7912"},
+    {"customer_id": "9b2f8f5e-3c1a-4c8e-8f1e-2a4b6c8d0e12", "name": "Michelle James",
+     "email": "michellejames@example.com", "pin": "1520"},
+]
+
+
+class MCPError(Exception):
+    """Domain error surfaced as a JSON-RPC error by the stand-in."""
+
+
+class MCPStandIn:
+    """In-process MCP server speaking JSON-RPC over POST and streamable-HTTP SSE.
+
+    POSTs are answered inline unless the session has an attached ``GET`` stream,
+    in which case the server replies 202 and pushes the response onto the
+    stream. Streamed events carry ids and are replayed on ``Last-Event-ID``.
+    """
+    
+    def __init__(self, latency: Union[float, Callable[[], float]] = 0.0, stream_responses: bool = True):
+        self.latency = latency
+        self.stream_responses = stream_responses
+        self.products = {p["sku"]: dict(p) for p in PRODUCTS}
+        self.customers = {c["customer_id"]: dict(c) for c in CUSTOMERS}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        # Additional tools advertised by tools/list, e.g. to exercise discovery
+        self.extra_tools: Dict[str, Callable[..., str]] = {}
+        
+        self.calls: Dict[str, int] = {}
+        self.posts = 0
+        self.streams_opened = 0
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._drop_generation = 0
+        self._reject_streams_until = 0.0
+        
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/mcp"
+    
+    def start(self) -> "MCPStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        with self._cond:
+            self._drop_generation += 1
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def __enter__(self) -> "MCPStandIn":
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def drop_streams(self, reject_for: float = 0.0):
+        """Close every open SSE stream and refuse new ones for ``reject_for`` seconds."""
+        with self._cond:
+            self._drop_generation += 1
+            self._reject_streams_until = time.monotonic() + reject_for
+            self._cond.notify_all()
+    
+    def expire_sessions(self):
+        """Forget all sessions, as a restarted server would."""
+        with self._cond:
+            self.sessions.clear()
+            self._drop_generation += 1
+            self._cond.notify_all()
+    
+    # -- JSON-RPC -----------------------------------------------------------
+    
+    def handle_rpc(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the JSON-RPC response for ``message``."""
+        method = message.get("method")
+        params = message.get("params") or {}
+        response = {"jsonrpc": "2.0", "id": message.get("id")}
+        try:
+            if method == "initialize":
+                response["result"] = {
+                    "protocolVersion": "2024-11-05",
+                    "capabilities": {"tools": {}},
+                    "serverInfo": {"name": "order-mcp-standin", "version": "1.0.0"}
+                }
+            elif method == "tools/list":
+                response["result"] = {"tools": [
+                    {
+                        "name": name,
+                        "description": (handler.__doc__ or "").strip(),
+                        "inputSchema": {"type": "object", "properties": {}}
+                    }
+                    for name, handler in self._tools().items()
+                ]}
+            elif method == "tools/call":
+                name = params.get("name")
+                with self._lock:
+                    self.calls[name] = self.calls.get(name, 0) + 1
+                # A callable draws each call's latency, e.g. to model a slow tail
+                delay = self.latency() if callable(self.latency) else self.latency
+                if delay:
+                    time.sleep(delay)
+                handler = self._tools().get(name)
+                if handler is None:
+                    raise MCPError(f"Unknown tool: {name}")
+                text = handler(**(params.get("arguments") or {}))
+                response["result"] = {
+                    "content": [{"type": "text", "text": text}],
+                    "structuredContent": {"result": text}
+                }
+            else:
+                raise MCPError(f"Method not found: {method}")
+        except (MCPError, TypeError) as e:
+            response["error"] = {"code": -32000, "message": str(e)}
+        return response
+    
+    def _tools(self):
+        return {
+            "list_products": self._list_products,
+            "get_product": self._get_product,
+            "search_products": self._search_products,
+            "get_customer": self._get_customer,
+            "verify_customer_pin": self._verify_customer_pin,
+            "list_orders": self._list_orders,
+            "get_order": self._get_order,
+            "create_order": self._create_order,
+            **self.extra_tools
+        }
+    
+    @staticmethod
+    def _product_line(p: Dict[str, Any]) -> str:
+        return f"{p['sku']} | {p['name']} | {p['category']} | ${p['price']} USD | Stock: {p['stock']} | Active"
+    
+    def _list_products(self, category: Optional[str] = None, is_active: Optional[bool] = None) -> str:
+        products = [p for p in self.products.values() if not category or p["category"].lower() == category.lower()]
+        return f"Found {len(products)} products:\n" + "\n".join(self._product_line(p) for p in products)
+    
+    def _get_product(self, sku: str) -> str:
+        p = self.products.get(sku)
+        if p is None:
+            raise MCPError(f"ProductNotFoundError: Product with SKU '{sku}' not found")
+        return (f"Product: {p['name']}\nSKU: {p['sku']}\nCategory: {p['category']}\n"
+                f"Price: ${p['price']} USD\nStock: {p['stock']}\nStatus: Active")
+    
+    def _search_products(self, query: str) -> str:
+        products = [p for p in self.products.values() if query.lower() in p["name"].lower()]
+        return f"Found {len(products)} products:\n" + "\n".join(self._product_line(p) for p in products)
+    
+    def _customer_text(self, c: Dict[str, Any]) -> str:
+        return f"Customer ID: {c['customer_id']}\nName: {c['name']}\nEmail: {c['email']}\nRole: buyer"
+    
+    def _get_customer(self, customer_id: str) -> str:
+        c = self.customers.get(customer_id)
+        if c is None:
+            raise MCPError(f"CustomerNotFoundError: Customer '{customer_id}' not found")
+        return self._customer_text(c)
+    
+    def _verify_customer_pin(self, email: str, pin: str) -> str:
+        for c in self.customers.values():
+            if c["email"] == email and c["pin"] == pin:
+                return self._customer_text(c)
+        raise MCPError("CustomerNotFoundError: Invalid email or PIN")
+    
+    def _list_orders(self, customer_id: Optional[str] = None, status: Optional[str] = None) -> str:
+        orders = [o for o in self.orders.values()
+                  if (not customer_id or o["customer_id"] == customer_id) and (not status or o["status"] == status)]
+        lines = [f"Order ID: {o['order_id']} | Status: {o['status']} | Total: ${o['total']} USD" for o in orders]
+        return f"Found {len(orders)} orders:\n" + "\n".join(lines)
+    
+    def _get_order(self, order_id: str) -> str:
+        o = self.orders.get(order_id)
+        if o is None:
+            raise MCPError(f"OrderNotFoundError: Order '{order_id}' not found")
+        items = "\n".join(f"- {i['sku']} x {i['quantity']} @ ${i['unit_price']}" for i in o["items"])
+        return (f"Order ID: {o['order_id']}\nCustomer ID: {o['customer_id']}\nStatus: {o['status']}\n"
+                f"Total: ${o['total']} USD\nItems:\n{items}")
+    
+    def _create_order(self, customer_id: str, items: List[Dict[str, Any]]) -> str:
+        if customer_id not in self.customers:
+            raise MCPError(f"CustomerNotFoundError: Customer '{customer_id}' not found")
+        with self._lock:
+            for item in items:
+                p = self.products.get(item["sku"])
+                if p is None:
+                    raise MCPError(f"ProductNotFoundError: Product with SKU '{item['sku']}' not found")
+                if int(item["quantity"]) > p["stock"]:
+                    raise MCPError(f"InsufficientInventoryError: Not enough stock for {item['sku']}")
+            for item in items:
+                self.products[item["sku"]]["stock"] -= int(item["quantity"])
+            total = sum(float(i["unit_price"]) * int(i["quantity"]) for i in items)
+            order = {
+                "order_id": str(uuid.uuid4()),
+                "customer_id": customer_id,
+                "status": "submitted",
+                "total": f"{total:.2f}",
+                "items": [dict(i) for i in items]
+            }
+            self.orders[order["order_id"]] = order
+        return f"Order created successfully!\nOrder ID: {order['order_id']}\nStatus: submitted\nTotal: ${order['total']} USD"
+    
+    # -- HTTP ---------------------------------------------------------------
+    
+    def _push(self, session_id: str, message: Dict[str, Any]):
+        with self._cond:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return
+            session["next_event_id"] += 1
+            session["events"].append((session["next_event_id"], json.dumps(message)))
+            self._cond.notify_all()
+    
+    def _make_handler(self):
+        standin = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; with Nagle on, each keep-alive response waits ~40 ms for an ACK
+            disable_nagle_algorithm = True
+            
+            def log_message(self, format, *args):
+                pass
+            
+            def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def _send_empty(self, status: int):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                message = json.loads(self.rfile.read(length) or b"{}")
+                with standin._lock:
+                    standin.posts += 1
+                session_id = self.headers.get("Mcp-Session-Id")
+                
+                if message.get("method") == "initialize":
+                    session_id = uuid.uuid4().hex
+                    with standin._lock:
+                        standin.sessions[session_id] = {"events": [], "next_event_id": 0, "streams": 0}
+                    self._send_json(200, standin.handle_rpc(message), {"Mcp-Session-Id": session_id})
+                    return
+                
+                with standin._lock:
+                    session = standin.sessions.get(session_id) if session_id else None
+                    if session_id and session is None:
+                        unknown = True
+                    else:
+                        unknown = False
+                    streaming = bool(session and session["streams"] > 0 and standin.stream_responses)
+                if unknown:
+                    self._send_empty(404)
+                    return
+                if not streaming:
+                    self._send_json(200, standin.handle_rpc(message))
+                    return
+                
+                # Acknowledge now, deliver the response on the session's stream
+                self._send_empty(202)
+                standin._push(session_id, standin.handle_rpc(message))
+            
+            def do_GET(self):
+                session_id = self.headers.get("Mcp-Session-Id")
+                with standin._cond:
+                    session = standin.sessions.get(session_id)
+                    rejected = time.monotonic() < standin._reject_streams_until
+                    if session is not None and not rejected:
+                        session["streams"] += 1
+                        standin.streams_opened += 1
+                        generation = standin._drop_generation
+                if session is None:
+                    self._send_empty(404)
+                    return
+                if rejected:
+                    self._send_empty(503)
+                    return
+                
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                
+                last_id = int(self.headers.get("Last-Event-ID") or 0)
+                try:
+                    self._write_chunk(b": connected\n\n")
+                    while True:
+                        with standin._cond:
+                            events = [e for e in session["events"] if e[0] > last_id]
+                            if not events:
+                                standin._cond.wait(timeout=0.5)
+                            dropped = standin._drop_generation != generation
+                        if dropped:
+                            break
+                        for event_id, data in events:
+                            self._write_chunk(f"id: {event_id}\nevent: message\ndata: {data}\n\n".encode())
+                            last_id = event_id
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with standin._lock:
+                        session["streams"] -= 1
+        
+        return Handler
+
+
+def _approximate_usage(messages: List[Any], reply: Any) -> Dict[str, int]:
+    """Rough token counts (four characters per token) so per-route stats are non-zero."""
+    prompt_chars = sum(
+        len(m.get("content") or "") if isinstance(m, dict) else len(getattr(m, "content", None) or "")
+        for m in messages
+    )
+    completion_chars = len(reply) if isinstance(reply, str) else len(json.dumps(reply))
+    prompt_tokens, completion_tokens = prompt_chars // 4 + 1, completion_chars // 4 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+class ScriptedLLM:
+    """Offline stand-in for ``OpenAI().chat.completions``.
+
+    ``responder(messages, tools)`` returns either a string (final answer) or a
+    list of ``(tool_name, arguments)`` tuples to request tool calls.
+    """
+    
+    def __init__(self, responder: Callable[[List[Any], Optional[List[Dict[str, Any]]]], Any]):
+        self.responder = responder
+        self.requests: List[Dict[str, Any]] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+    
+    def _create(self, **kwargs) -> Any:
+        self.requests.append(kwargs)
+        reply = self.responder(kwargs["messages"], kwargs.get("tools"))
+        message = {"role": "assistant", "content": None, "tool_calls": None}
+        if isinstance(reply, str):
+            message["content"] = reply
+        else:
+            message["tool_calls"] = [
+                {"id": f"call_{i}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(args)}}
+                for i, (name, args) in enumerate(reply)
+            ]
+        return to_namespace({
+            "choices": [{"message": message, "finish_reason": "stop"}],
+            "usage": _approximate_usage(kwargs["messages"], reply)
+        })
+
+
+def serve_chat_worker(port: int, turn_latency: float = 0.05, cpu_ms: float = 2.0, state_db: Optional[str] = None):
+    """Serve ``POST /chat`` like one app worker, for multi-process benchmarks.
+
+    Turns are serialized per process, as with Gradio's default concurrency
+    limit of one per event; each burns ``cpu_ms`` of CPU and waits
+    ``turn_latency`` seconds for the simulated LLM/MCP round-trips.
+    """
+    import hashlib
+    import os
+    from store import SharedStore
+    
+    store = SharedStore(state_db) if state_db else None
+    turn_lock = threading.Lock()
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with turn_lock:
+                deadline = time.perf_counter() + cpu_ms / 1000
+                digest = b""
+                while time.perf_counter() < deadline:
+                    digest = hashlib.sha256(digest + request.get("message", "").encode()).digest()
+                time.sleep(turn_latency)
+                if store is not None:
+                    store.append_message(request.get("session", ""), "user", request.get("message", ""))
+            data = json.dumps({"pid": os.getpid(), "reply": digest.hex()[:8]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.serve_forever()
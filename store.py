@@ -0,0 +1,156 @@
+"""SQLite-backed state shared by app worker processes on one host."""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    namespace TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, scope, key)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, seq);
+"""
+
+
+class SharedStore:
+    """Key/value and message-log storage in a WAL-mode SQLite file.
+
+    Each thread gets its own connection; WAL lets readers in every worker
+    proceed while one writer commits.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+    
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    # -- key/value ----------------------------------------------------------
+    
+    def get(self, namespace: str, scope: str, key: str) -> Optional[Any]:
+        """Return the decoded value, or None if missing or expired."""
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace=? AND scope=? AND key=?",
+            (namespace, scope, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+    
+    def set(self, namespace: str, scope: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serializable value, optionally expiring after ``ttl`` seconds."""
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (namespace, scope, key, value, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, scope, key, json.dumps(value), expires_at)
+        )
+    
+    def delete(self, namespace: str, scope: str, key: Optional[str] = None) -> int:
+        """Delete one key, or every key in ``scope`` when ``key`` is None."""
+        if key is None:
+            cursor = self._conn().execute("DELETE FROM kv WHERE namespace=? AND scope=?", (namespace, scope))
+        else:
+            cursor = self._conn().execute(
+                "DELETE FROM kv WHERE namespace=? AND scope=? AND key=?", (namespace, scope, key)
+            )
+        return cursor.rowcount
+    
+    def purge_expired(self) -> int:
+        """Remove expired key/value rows."""
+        cursor = self._conn().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+    
+    # -- message log --------------------------------------------------------
+    
+    def append_message(self, session_id: str, role: str, content: str):
+        """Append one conversation message."""
+        self._conn().execute(
+            "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, role, content)
+        )
+    
+    def get_messages(self, session_id: str, start: int = 0) -> List[Dict[str, str]]:
+        """Return a session's messages in order, skipping the first ``start``."""
+        rows = self._conn().execute(
+            "SELECT role, content FROM messages WHERE session_id=? ORDER BY seq LIMIT -1 OFFSET ?",
+            (session_id, start)
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+    
+    def get_recent_messages(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        """Return a session's last ``limit`` messages in order, without reading the rest."""
+        rows = self._conn().execute(
+            "SELECT role, content FROM messages WHERE session_id=? ORDER BY seq DESC LIMIT ?", (session_id, limit)
+        ).fetchall()
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+    
+    def count_messages(self, session_id: str) -> int:
+        """Number of messages stored for a session."""
+        return self._conn().execute("SELECT COUNT(*) FROM messages WHERE session_id=?", (session_id,)).fetchone()[0]
+    
+    def clear_messages(self, session_id: str):
+        """Delete a session's messages."""
+        self._conn().execute("DELETE FROM messages WHERE session_id=?", (session_id,))
+
+
+class StoreCache:
+    """TTLCache-compatible view over a SharedStore namespace.
+
+    Keys are ``(scope, *rest)`` tuples; the scope is stored separately so
+    ``invalidate_scope`` is a single indexed delete visible to every worker.
+    """
+    
+    def __init__(self, store: SharedStore, namespace: str, ttl: float, purge_every: int = 256):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+    
+    @staticmethod
+    def _split(key: Hashable) -> tuple:
+        return str(key[0]), json.dumps(list(key[1:]))
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        scope, rest = self._split(key)
+        value = self.store.get(self.namespace, scope, rest)
+        return default if value is None else value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        scope, rest = self._split(key)
+        self.store.set(self.namespace, scope, rest, value, self.ttl if ttl is None else ttl)
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            # Expired rows are otherwise only skipped on read; keep the table bounded
+            self.store.purge_expired()
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self.get(key, default)
+        scope, rest = self._split(key)
+        self.store.delete(self.namespace, scope, rest)
+        return value
+    
+    def invalidate_scope(self, scope: str) -> int:
+        return self.store.delete(self.namespace, str(scope))
@@ -0,0 +1,71 @@
+"""Deterministic reply templates for single-tool turns.
+
+A template turns one tool's text result into the final answer. It returns
+None when the result does not look the way it expects, and the agent then
+falls back to asking the LLM to phrase it.
+"""
+import re
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+
+Template = Callable[[str], Optional[str]]
+
+_FIELD = re.compile(r"^\s*([A-Za-z][A-Za-z ]*?)\s*:\s*(.*?)\s*$")
+
+
+def parse_fields(text: str) -> Tuple[Dict[str, str], List[str]]:
+    """Split ``Key: value`` lines into a lowercase-keyed dict; ``- item`` lines are returned separately."""
+    fields: Dict[str, str] = {}
+    bullets: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("- "):
+            bullets.append(stripped[2:])
+            continue
+        match = _FIELD.match(line)
+        if match and match.group(1).lower() not in fields:
+            fields[match.group(1).lower()] = match.group(2)
+    return fields, bullets
+
+
+def _has(fields: Dict[str, str], *names: str) -> bool:
+    return all(fields.get(name) for name in names)
+
+
+def render_product(text: str) -> Optional[str]:
+    """Render a ``get_product`` result."""
+    fields, _ = parse_fields(text)
+    if not _has(fields, "product", "sku", "price"):
+        return None
+    lines = [f"**{fields['product']}** ({fields['sku']})", ""]
+    for label, key in (("Category", "category"), ("Price", "price"), ("In stock", "stock"), ("Status", "status")):
+        if fields.get(key):
+            lines.append(f"- {label}: {fields[key]}")
+    if fields.get("description"):
+        lines.extend(["", fields["description"]])
+    return "\n".join(lines)
+
+
+def render_order(text: str) -> Optional[str]:
+    """Render a ``get_order`` result."""
+    fields, items = parse_fields(text)
+    if not _has(fields, "order id", "status", "total"):
+        return None
+    lines = [
+        f"Here are the details for order {fields['order id']}:",
+        "",
+        f"- Status: {fields['status']}",
+        f"- Total: {fields['total']}",
+    ]
+    if items:
+        lines.append("- Items:")
+        lines.extend(f"  - {item}" for item in items)
+    return "\n".join(lines)
+
+
+# Tools whose ToolPolicy has ``templated=True`` are rendered with these
+TEMPLATES: Mapping[str, Template] = MappingProxyType({
+    "get_product": render_product,
+    "get_order": render_order,
+})
@@ -0,0 +1,787 @@
+#!/usr/bin/env python3
+"""Offline tests for the support agent using local stand-ins."""
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from mcp_client import MCPClient, MCPUnavailable
+from auth import AuthHandler
+from agent import SupportAgent
+from llm import CassetteMiss, RecordingLLM, ReplayLLM
+from ratelimit import RateLimited, RateLimiter
+from agent import BUSY_MESSAGE
+from classifier import AUTH, ORDER, PRODUCT, SMALLTALK, classify
+from catalog import Catalog
+from orders import OrderPipeline
+import standins
+from standins import MCPStandIn, ScriptedLLM, CUSTOMERS, PRODUCTS
+
+
+def make_agent(server: MCPStandIn, responder) -> SupportAgent:
+    """Build an agent wired to the MCP stand-in and a scripted LLM."""
+    client = MCPClient(url=server.url, transport="http")
+    auth_handler = AuthHandler(client)
+    return SupportAgent(client, auth_handler, llm_client=ScriptedLLM(responder))
+
+
+def orders_responder(messages, tools):
+    """Ask for list_orders on the first round, then echo the tool output."""
+    last = messages[-1]
+    if isinstance(last, dict) and last["role"] == "tool":
+        return last["content"]
+    return [("list_orders", {})]
+
+
+def test_prefetch_after_auth():
+    """Orders warmed at login are served without another MCP call."""
+    print("=" * 60)
+    print("Testing post-auth prefetch")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, orders_responder)
+        agent.prefetch_on_auth = True
+        session_id = "prefetch_session"
+        customer = CUSTOMERS[0]
+        
+        success, _ = agent.auth_handler.authenticate(session_id, customer["email"], customer["pin"])
+        assert success
+        agent.prefetch_customer_context(session_id)
+        
+        response = agent.process_message(session_id, "Show my orders", [])
+        assert "orders" in response
+        assert server.calls.get("list_orders") == 1
+        assert server.calls.get("get_customer") == 1
+        print("✅ list_orders served from the prefetch cache")
+        
+        # create_order invalidates the warmed context
+        agent._call_tool(session_id, "create_order", {
+            "customer_id": agent.auth_handler.get_customer_id(session_id),
+            "items": [{"sku": "ACC-0100", "quantity": 1, "unit_price": "99.99"}]
+        })
+        response = agent.process_message(session_id, "Show my orders", [])
+        assert server.calls.get("list_orders") == 2
+        assert "Found 1 orders" in response
+        print("✅ create_order invalidated the prefetched orders")
+
+
+def test_prefetch_opt_in():
+    """Without opt-in nothing is fetched at login."""
+    print("\n" + "=" * 60)
+    print("Testing prefetch opt-in")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, orders_responder)
+        agent.prefetch_on_auth = False
+        customer = CUSTOMERS[1]
+        agent.auth_handler.authenticate("s", customer["email"], customer["pin"])
+        agent.prefetch_customer_context("s")
+        time.sleep(0.05)
+        assert server.calls.get("list_orders") is None
+        print("✅ No prefetch when disabled")
+
+
+def test_order_cache():
+    """Order reads are cached per customer and invalidated by create_order."""
+    print("\n" + "=" * 60)
+    print("Testing per-customer order cache")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, orders_responder)
+        alice, bob = CUSTOMERS
+        agent.auth_handler.authenticate("alice", alice["email"], alice["pin"])
+        agent.auth_handler.authenticate("bob", bob["email"], bob["pin"])
+        
+        agent._call_tool("alice", "list_orders", {"customer_id": alice["customer_id"]})
+        agent._call_tool("alice", "list_orders", {"customer_id": alice["customer_id"]})
+        assert server.calls["list_orders"] == 1
+        print("✅ Repeated list_orders served from cache")
+        
+        agent._call_tool("bob", "list_orders", {"customer_id": alice["customer_id"]})
+        assert server.calls["list_orders"] == 2
+        print("✅ Customers never share cache entries")
+        
+        created = agent._call_tool("alice", "create_order", {
+            "customer_id": alice["customer_id"],
+            "items": [{"sku": "NET-0201", "quantity": 2, "unit_price": "39.99"}]
+        })
+        assert "Order created" in created
+        listing = agent._call_tool("alice", "list_orders", {"customer_id": alice["customer_id"]})
+        assert server.calls["list_orders"] == 3
+        assert "Found 1 orders" in listing
+        print("✅ create_order invalidated the customer's cached orders")
+        
+        # An order placed while a read is in flight keeps that read out of the cache
+        agent.order_cache.clear()
+        server.extra_tools["list_orders"] = lambda customer_id: (
+            agent.invalidate_customer_orders(customer_id) or "Found 0 orders"
+        )
+        agent._call_tool("alice", "list_orders", {"customer_id": alice["customer_id"]})
+        assert len(agent.order_cache) == 0
+        # Generations are only tracked while reads are in flight, so nothing accumulates
+        assert agent._order_reads == {}
+        print("✅ Read overlapping an invalidation was not cached")
+
+
+def test_tool_registry_discovery():
+    """Tools come from tools/list with curated schemas and policies applied."""
+    print("\n" + "=" * 60)
+    print("Testing tool registry discovery")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        def get_shipping_status(order_id):
+            """Get shipping status for an order."""
+            return f"Order {order_id}: in transit"
+        server.extra_tools["get_shipping_status"] = get_shipping_status
+        
+        agent = make_agent(server, orders_responder)
+        names = [tool["function"]["name"] for tool in agent.tools]
+        assert "get_shipping_status" in names
+        assert "verify_customer_pin" not in names
+        assert agent._requires_auth("get_shipping_status")
+        assert agent.registry.get("list_orders").policy.inject_customer_id
+        print(f"✅ Discovered {len(names)} LLM-facing tools; unknown tools require auth")
+        
+        agent.client = ScriptedLLM(lambda messages, tools: (
+            messages[-1]["content"] if isinstance(messages[-1], dict) and messages[-1]["role"] == "tool"
+            else [("verify_customer_pin", {"email": "a@b.c", "pin": "0000"})]
+        ))
+        response = agent.process_message("s", "hello", [])
+        assert "Unknown tool" in response
+        assert "verify_customer_pin" not in server.calls
+        print("✅ Hidden tools are rejected without an MCP call")
+
+
+def test_argument_validation():
+    """Malformed tool arguments are repaired or rejected before MCP dispatch."""
+    print("\n" + "=" * 60)
+    print("Testing tool argument validation")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, orders_responder)
+        create_order = agent.registry.get("create_order").validate
+        args = create_order({
+            "customer_id": CUSTOMERS[0]["customer_id"].upper(),
+            "items": {"sku": " mon 54", "quantity": "2", "unit_price": 1, "note": "x"}
+        })
+        assert args["customer_id"] == CUSTOMERS[0]["customer_id"]
+        assert args["items"] == [{"sku": "MON-0054", "quantity": 2, "unit_price": "1", "currency": "USD"}]
+        # With catalog pricing, order preparation replaces the LLM's price with the catalog's
+        assert agent.catalog.prepare_order(args)["items"] == [
+            {"sku": "MON-0054", "quantity": 2, "unit_price": "349.99", "currency": "USD"}
+        ]
+        print("✅ SKU and quantity canonicalized, price filled from the catalog")
+        
+        # Custom formats drive validation but are not sent to the LLM; standard ones are
+        schema_json = agent.registry.schemas_json
+        assert '"format":"sku"' not in schema_json and '"format":"uuid"' in schema_json
+        assert agent.registry.get("get_product").validate({"sku": "mon 54"}) == {"sku": "MON-0054"}
+        print("✅ Non-standard schema keywords stripped from the LLM's tool schemas")
+        
+        list_orders = agent.registry.get("list_orders").validate
+        assert list_orders({"status": "Submitted"}) == {"status": "submitted"}
+        for bad in ({"status": "shipped"}, {"customer_id": "someone@example.com"}):
+            try:
+                list_orders(bad)
+                assert False, f"accepted {bad}"
+            except ValueError:
+                pass
+        print("✅ Invalid status and customer_id rejected")
+        
+        agent.client = ScriptedLLM(lambda messages, tools: (
+            messages[-1]["content"] if isinstance(messages[-1], dict) and messages[-1]["role"] == "tool"
+            else [("get_product", {"sku": "not-a-sku"}), ("get_product", {"sku": "com1"})]
+        ))
+        response = agent.process_message("s", "tell me about not-a-sku", [])
+        assert server.calls["get_product"] == 1
+        assert agent.metrics.get("tool_calls_rejected") == 1
+        print(f"✅ Rejected call answered locally: {response}")
+
+
+def test_model_routing():
+    """Simple turns use the fast model; authenticated and large turns use the main model."""
+    print("=" * 60)
+    print("Testing model routing")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: (
+            "done" if messages[-1]["role"] == "tool" else [("get_product", {"sku": "COM-0001"})]
+        ))
+        agent.response_templates = ()
+        router = agent.router
+        router.fast_model, router.main_model = "fast", "main"
+        agent.process_message("s", "tell me about COM-0001", [])
+        assert [r["model"] for r in agent.client.requests] == ["fast", "fast"]
+        
+        router.small_output_chars = 10
+        agent.process_message("s", "tell me about COM-0001", [])
+        assert [r["model"] for r in agent.client.requests[2:]] == ["fast", "main"]
+        
+        customer = CUSTOMERS[0]
+        agent.auth_handler.authenticate("s", customer["email"], customer["pin"])
+        agent.process_message("s", "tell me about COM-0001", [])
+        assert agent.client.requests[4]["model"] == "main"
+        
+        report = router.report()
+        assert report["select.simple"]["calls"] == 2
+        assert report["answer.large_output"]["model"] == "main"
+        assert report["select.authenticated"]["prompt_tokens"] > 0
+        print(f"✅ Per-route stats: {report}")
+
+
+def test_response_templates():
+    """A lone get_product call is answered from its template without a second LLM call."""
+    print("=" * 60)
+    print("Testing response templates")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: (
+            "phrased by the LLM" if messages[-1]["role"] == "tool" else [("get_product", {"sku": "COM-0001"})]
+        ))
+        # Opt-in per tool: off by default
+        assert agent.process_message("s", "tell me about COM-0001", []) == "phrased by the LLM"
+        assert agent.metrics.get("llm_calls_saved") == 0
+        agent.client.requests.clear()
+        
+        agent.response_templates = ("get_product",)
+        response = agent.process_message("s", "tell me about COM-0001", [])
+        assert len(agent.client.requests) == 1
+        assert "COM-0001" in response and "Price" in response
+        assert agent.metrics.get("llm_calls_saved") == 1
+        
+        # Malformed results fall back to the LLM
+        server.extra_tools["get_product"] = lambda sku: "something unexpected"
+        response = agent.process_message("s", "tell me about COM-0001", [])
+        assert response == "phrased by the LLM"
+        assert agent.metrics.get("llm_calls_saved") == 1
+        print(f"✅ Templated answer: {agent.metrics.get('llm_calls_saved'):.0f} LLM call(s) saved")
+
+
+def test_speculative_tools():
+    """Predicted list_orders runs during the first LLM call and is reused or dropped."""
+    print("=" * 60)
+    print("Testing speculative tool execution")
+    print("=" * 60)
+    
+    llm_latency = 0.3
+    
+    def responder(messages, tools):
+        if messages[-1]["role"] == "tool":
+            return messages[-1]["content"]
+        time.sleep(llm_latency)
+        if "catalog" in messages[-1]["content"]:
+            return [("list_products", {})]
+        return [("list_orders", {})]
+    
+    with MCPStandIn(latency=0.3) as server:
+        agent = make_agent(server, responder)
+        agent.speculative_tools = ("list_orders",)
+        customer = CUSTOMERS[0]
+        agent.auth_handler.authenticate("s", customer["email"], customer["pin"])
+        
+        start = time.perf_counter()
+        response = agent.process_message("s", "show my orders", [])
+        elapsed = time.perf_counter() - start
+        assert "Found" in response
+        assert server.calls["list_orders"] == 1
+        assert agent.metrics.get("speculation_hits") == 1
+        # MCP latency overlapped with the LLM call instead of adding to it
+        assert elapsed < llm_latency + server.latency + 0.2
+        
+        agent.order_cache.clear()
+        agent.process_message("s", "order something from the catalog", [])
+        assert agent.metrics.get("speculation_started") == 2
+        assert agent.metrics.get("speculation_wasted") == 1
+        print(f"✅ Turn took {elapsed:.2f}s with speculation")
+
+
+def test_llm_cassette():
+    """A recorded session replays offline with the same answers and configurable latency."""
+    print("=" * 60)
+    print("Testing LLM record/replay cassette")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp, MCPStandIn() as server:
+        path = os.path.join(tmp, "cassette.jsonl.gz")
+        client = MCPClient(url=server.url, transport="http")
+        recorder = RecordingLLM(ScriptedLLM(orders_responder), path)
+        agent = SupportAgent(client, AuthHandler(client), llm_client=recorder)
+        agent.auth_handler.authenticate("s", CUSTOMERS[0]["email"], CUSTOMERS[0]["pin"])
+        recorded = agent.process_message("s", "show my orders", [])
+        recorder.close()
+        
+        replayer = ReplayLLM(path, latency=0.05)
+        assert len(replayer) == 2
+        agent = SupportAgent(client, AuthHandler(client), llm_client=replayer)
+        agent.auth_handler.authenticate("s", CUSTOMERS[0]["email"], CUSTOMERS[0]["pin"])
+        start = time.perf_counter()
+        assert agent.process_message("s", "show my orders", []) == recorded
+        assert time.perf_counter() - start >= 0.1
+        
+        try:
+            replayer.chat.completions.create(model="x", messages=[{"role": "user", "content": "unseen"}])
+            assert False, "expected a cassette miss"
+        except CassetteMiss:
+            pass
+        print("✅ Replayed answer matches the recording")
+
+
+def test_message_classifier():
+    """Messages are classified once; auth questions never reach the LLM."""
+    print("=" * 60)
+    print("Testing message classifier")
+    print("=" * 60)
+    
+    credentials = classify("Email: order@example.com, PIN: 1234")
+    assert credentials.kind == AUTH and credentials.email == "order@example.com" and credentials.pin == "1234"
+    assert classify("do I need my email and pin?").kind == AUTH
+    assert classify("email me the shipping status").kind == SMALLTALK
+    assert classify("Show my orders").kind == ORDER
+    assert classify("Any monitors in stock?").kind == PRODUCT
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: "from the LLM")
+        response = agent.process_message("s", "do I need my email and pin?", [])
+        assert "email: your@email.com" in response
+        assert agent.client.requests == []
+        assert agent.process_message("s", "hello", [], classify("hello")) == "from the LLM"
+        assert agent.metrics.get("messages.smalltalk") == 1
+        print("✅ Classified without extra LLM calls")
+
+
+def test_rate_limiting():
+    """Bursts beyond a session's budget get a fast busy reply; other sessions are unaffected."""
+    print("=" * 60)
+    print("Testing rate limiting")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: "hi there")
+        # One request of burst per session, no queueing
+        agent.llm_request_limiter = RateLimiter("llm_requests", 0, 0.5, max_wait=0, metrics=agent.metrics)
+        assert agent.process_message("a", "hello", []) == "hi there"
+        start = time.perf_counter()
+        assert agent.process_message("a", "hello again", []) == BUSY_MESSAGE
+        assert time.perf_counter() - start < 0.1
+        assert agent.process_message("b", "hello", []) == "hi there"
+        assert agent.metrics.get("ratelimit.llm_requests.shed.session") == 1
+        assert agent.metrics.get("busy_replies") == 1
+        
+        # With a queueing budget the call waits for a token instead of failing
+        agent.llm_request_limiter = RateLimiter("llm_requests", 10, 0, burst_seconds=0.1, max_wait=1, metrics=agent.metrics)
+        replies = [agent.process_message("c", "hello", []) for _ in range(3)]
+        assert replies == ["hi there"] * 3
+        assert agent.metrics.get("ratelimit.llm_requests.wait.count") >= 1
+        print(f"✅ Limiter state: {agent.llm_request_limiter.snapshot()}")
+
+
+def test_order_preparation():
+    """create_order is priced and stock-checked locally, in one MCP round-trip."""
+    print("\n" + "=" * 60)
+    print("Testing catalog-backed order preparation")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        def order(items):
+            return lambda messages, tools: (
+                messages[-1]["content"] if isinstance(messages[-1], dict) and messages[-1]["role"] == "tool"
+                else [("create_order", {"customer_id": "me", "items": items})]
+            )
+        agent = make_agent(server, None)
+        alice = CUSTOMERS[0]
+        agent.auth_handler.authenticate("alice", alice["email"], alice["pin"])
+        
+        # Off by default: the LLM's price goes to the server and the catalog is not consulted
+        assert not agent.catalog_pricing
+        agent.client = ScriptedLLM(order([{"sku": "NET-0201", "quantity": 1, "unit_price": "39.99"}]))
+        response = agent.process_message("alice", "order a switch", [])
+        assert "Order created" in response and "list_products" not in server.calls
+        server.orders.clear()
+        print("✅ Catalog pricing is opt-in")
+        
+        agent.catalog_pricing = True
+        agent.client = ScriptedLLM(order([
+            {"sku": "mon-54", "quantity": 1, "unit_price": "1.00"},
+            {"sku": "ACC-0100", "quantity": 2},
+            {"sku": "MON-0054", "quantity": 1},
+        ]))
+        response = agent.process_message("alice", "order two monitors and two keyboards", [])
+        assert "Order created" in response, response
+        placed = next(iter(server.orders.values()))
+        assert placed["items"] == [
+            {"sku": "MON-0054", "quantity": 2, "unit_price": "349.99", "currency": "USD"},
+            {"sku": "ACC-0100", "quantity": 2, "unit_price": "99.99", "currency": "USD"},
+        ]
+        assert placed["total"] == "899.96"
+        assert (server.calls["list_products"], server.calls["create_order"]) == (1, 2)
+        assert "get_product" not in server.calls
+        assert agent.catalog.snapshot()["MON-0054"].stock == 20
+        print("✅ Duplicate lines merged, LLM price ignored, one create_order call")
+        
+        agent.client = ScriptedLLM(order([{"sku": "MON-0056", "quantity": 1}, {"sku": "ZZZ-0001", "quantity": 1}]))
+        response = agent.process_message("alice", "order a 24 inch monitor and a mystery box", [])
+        assert "MON-0056" in response and "ZZZ-0001" in response
+        # The snapshot is reused; only the missing SKU and the one that looks short are looked up
+        assert (server.calls["list_products"], server.calls["create_order"], server.calls["get_product"]) == (1, 2, 2)
+        assert len(server.orders) == 1
+        print("✅ Out-of-stock and unknown SKUs rejected without create_order")
+        
+        # Restocked since the snapshot: the re-check sees it and the order goes through
+        server.products["MON-0056"]["stock"] = 3
+        agent.client = ScriptedLLM(order([{"sku": "MON-0056", "quantity": 1}]))
+        response = agent.process_message("alice", "order a 24 inch monitor", [])
+        assert "Order created" in response, response
+        print("✅ Stale out-of-stock snapshot re-checked before refusing")
+        
+        # Fallback lookups expire with the snapshot TTL; transport errors are not "unknown SKU"
+        agent.catalog.ttl = 0.05
+        # ZZZ-0002 is served by get_product but never listed
+        unlisted = {"price": "10.00"}
+        server.extra_tools["get_product"] = lambda sku: (
+            f"Product: Mystery Box\nSKU: {sku}\nCategory: Misc\nPrice: ${unlisted['price']} USD\nStock: 5\nStatus: Active"
+        )
+        assert agent.catalog.lookup(["ZZZ-0002"])["ZZZ-0002"].price == Decimal("10.00")
+        unlisted["price"] = "12.00"
+        assert agent.catalog.lookup(["ZZZ-0002"])["ZZZ-0002"].price == Decimal("10.00")
+        time.sleep(0.06)
+        assert agent.catalog.lookup(["ZZZ-0002"])["ZZZ-0002"].price == Decimal("12.00")
+        limiter = agent.mcp_client.rate_limiter
+        agent.mcp_client.rate_limiter = RateLimiter("mcp", 0.01, 0, max_wait=0)
+        agent.mcp_client.rate_limiter.acquire()
+        try:
+            agent.catalog.lookup(["ZZZ-0003"])
+            assert False, "expected RateLimited"
+        except RateLimited:
+            pass
+        finally:
+            agent.mcp_client.rate_limiter = limiter
+        print("✅ Fallback results expire; rate limiting propagates")
+        
+        def all_results(calls):
+            return lambda messages, tools: (
+                "\n".join(m["content"] for m in messages if isinstance(m, dict) and m["role"] == "tool")
+                if isinstance(messages[-1], dict) and messages[-1]["role"] == "tool" else calls
+            )
+        
+        # A server error on get_product is not "unknown product", and the step's other calls still run
+        def failing_get_product(sku):
+            raise standins.MCPError("Internal error: database timeout")
+        server.extra_tools["get_product"] = failing_get_product
+        agent.client = ScriptedLLM(all_results([
+            ("create_order", {"customer_id": "me", "items": [{"sku": "ZZZ-0005", "quantity": 1}]}),
+            ("list_orders", {}),
+        ]))
+        response = agent.process_message("alice", "order a mystery box and show my orders", [])
+        assert "database timeout" in response and "not in the catalog" not in response
+        assert "orders" in response, response
+        fetch = agent.catalog.fetch
+        
+        def unreachable(sku):
+            raise MCPUnavailable("Failed to communicate with MCP server: connection refused")
+        agent.catalog.fetch = unreachable
+        response = agent.process_message("alice", "order a mystery box and show my orders", [])
+        assert "connection refused" in response and "orders" in response
+        assert not response.startswith("I apologize"), response
+        agent.catalog.fetch = fetch
+        print("✅ Catalog lookup failures become tool errors, not unknown products or a failed turn")
+        
+        # Product text the parsers cannot read: the order goes to the server as given
+        orders_before = len(server.orders)
+        server.extra_tools["list_products"] = lambda **kwargs: "Inventory:\n* Dell 27in 4K (MON-0054) - 349.99 dollars, 22 left"
+        server.extra_tools["get_product"] = lambda sku: f"{sku}: Dell 27in 4K, 349.99 dollars, 22 left"
+        agent = make_agent(server, order([{"sku": "MON-0054", "quantity": 1, "unit_price": "349.99"}]))
+        agent.catalog_pricing = True
+        agent.auth_handler.authenticate("alice", alice["email"], alice["pin"])
+        response = agent.process_message("alice", "order a 27 inch monitor", [])
+        assert "Order created" in response and "not in the catalog" not in response, response
+        assert len(server.orders) == orders_before + 1
+        assert agent.metrics.get("catalog.passed_through") == 1
+        print("✅ Unreadable catalog entries are passed through to the server, not refused")
+
+
+def test_product_resolver():
+    """Typed SKUs and names resolve locally; ambiguous ones get suggestions, not an MCP call."""
+    print("\n" + "=" * 60)
+    print("Testing local product resolver")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        requested = []
+        
+        def responder(messages, tools):
+            last = messages[-1]
+            if isinstance(last, dict) and last["role"] == "tool":
+                return last["content"]
+            return [requested.pop(0)]
+        
+        agent = make_agent(server, responder)
+        requested.append(("get_product", {"sku": "dell moniter"}))
+        response = agent.process_message("s", "tell me about the dell moniter", [])
+        assert "MON-0054" in response and "not found" not in response
+        
+        requested.append(("get_product", {"sku": "logitech"}))
+        response = agent.process_message("s", "tell me about the logitech", [])
+        assert "ACC-0100" in response and "ACC-0101" in response
+        assert server.calls["get_product"] == 1
+        print("✅ Typos resolved; ambiguous names answered with suggestions, no MCP call")
+        
+        # Added to the server after the snapshot was taken: the SKU goes to get_product as typed
+        server.products["COM-0004"] = dict(server.products["COM-0001"], sku="COM-0004", name="Framework Laptop 13")
+        requested.append(("get_product", {"sku": "COM-0004"}))
+        response = agent.process_message("s", "tell me about COM-0004", [])
+        assert "Framework Laptop 13" in response, response
+        assert "COM-0004" not in agent.catalog.snapshot() and server.calls["get_product"] == 2
+        print("✅ Valid SKU missing from the snapshot falls back to get_product")
+        
+        seen = []
+        
+        def search_products(query):
+            # Like the server, matches descriptions too: "routes" is in the router's description only
+            seen.append(query)
+            sku = {"routes": "NET-0200", "dell monitor": "MON-0054", "dell monitors": "MON-0054"}.get(query)
+            if sku is None:
+                return "Found 0 products:"
+            return "Found 1 products:\n" + MCPStandIn._product_line(server.products[sku])
+        server.extra_tools["search_products"] = search_products
+        requested.append(("search_products", {"query": "routes"}))
+        response = agent.process_message("s", "anything that routes traffic?", [])
+        assert seen == ["routes"] and "NET-0200" in response, (seen, response)
+        print("✅ Search terms outside the name vocabulary are sent unchanged")
+        
+        seen.clear()
+        requested.append(("search_products", {"query": "dell moniters"}))
+        response = agent.process_message("s", "any dell moniters?", [])
+        assert seen[0] == "dell moniters" and seen[1] in ("dell monitor", "dell monitors"), seen
+        assert "No products matched 'dell moniters'" in response and "MON-0054" in response
+        print("✅ Misspelled search corrected only after it found nothing, and the correction is shown")
+        
+        resolver = agent.catalog.resolver()
+        start = time.perf_counter()
+        for _ in range(200):
+            resolver.resolve("dell moniter")
+        per_query_us = (time.perf_counter() - start) / 200 * 1e6
+        print(f"Resolve: {per_query_us:.0f} µs/query")
+        assert per_query_us < 2000
+
+
+def test_catalog_delta_sync():
+    """Refreshes apply only changed listing lines and keep the resolver current without a rebuild."""
+    print("\n" + "=" * 60)
+    print("Testing catalog delta sync")
+    print("=" * 60)
+    
+    class Listing:
+        def __init__(self, products):
+            self.products = [dict(p) for p in products]
+        
+        def call_tool(self, name, arguments):
+            text = "\n".join(MCPStandIn._product_line(p) for p in self.products)
+            return {"content": [{"type": "text", "text": f"Found {len(self.products)} products:\n{text}"}]}
+    
+    listing = Listing(PRODUCTS)
+    catalog = Catalog(listing, ttl=0.001)
+    deltas = []
+    catalog.subscribe(deltas.append)
+    resolver = catalog.resolver()
+    assert len(catalog.snapshot()) == len(PRODUCTS) and catalog.version == 1
+    assert len(deltas[0].added) == len(PRODUCTS)
+    
+    time.sleep(0.002)
+    catalog.snapshot()
+    assert catalog.version == 1 and len(deltas) == 1
+    print("✅ Unchanged listing applies nothing")
+    
+    monitor = next(p for p in listing.products if p["sku"] == "MON-0054")
+    monitor["price"] = 329.99
+    keyboard = next(p for p in listing.products if p["sku"] == "ACC-0100")
+    keyboard_version = catalog.entry_version("ACC-0100")
+    time.sleep(0.002)
+    catalog.snapshot()
+    assert (deltas[-1].added, deltas[-1].changed, deltas[-1].removed) == ((), ("MON-0054",), ())
+    assert catalog.version == 2 and catalog.entry_version("MON-0054") == 2
+    assert catalog.entry_version("ACC-0100") == keyboard_version
+    assert resolver.resolve("dell moniter")[0].product.price == Decimal("329.99")
+    print("✅ One changed line -> one changed SKU; other entry versions untouched")
+    
+    keyboard["name"] = "Zephyr Typewriter Deluxe"
+    listing.products = [p for p in listing.products if p["sku"] != "MON-0056"]
+    time.sleep(0.002)
+    catalog.snapshot()
+    assert deltas[-1].changed == ("ACC-0100",) and deltas[-1].removed == ("MON-0056",)
+    assert "MON-0056" not in catalog.snapshot()
+    assert resolver.resolve("zephyr typewritter")[0].product.sku == "ACC-0100"
+    assert all(match.product.sku != "MON-0056" for match in resolver.resolve("24 inch monitor"))
+    assert catalog.resolver() is resolver
+    print("✅ Renames and removals reach the resolver incrementally")
+    
+    listing.call_tool = lambda name, arguments: {"content": [{"type": "text", "text": ""}]}
+    time.sleep(0.002)
+    assert len(catalog.snapshot()) == len(PRODUCTS) - 1 and catalog.metrics.get("catalog.refresh_failed") == 1
+    print("✅ Empty listing keeps the previous snapshot")
+    
+    held = catalog.snapshot()
+    try:
+        held["MON-0054"] = None
+        raise AssertionError("snapshot was writable")
+    except TypeError:
+        pass
+    started, release = threading.Event(), threading.Event()
+    
+    def slow_listing(name, arguments):
+        started.set()
+        release.wait(5)
+        return Listing.call_tool(listing, name, arguments)
+    
+    listing.call_tool = slow_listing
+    monitor["price"] = 299.99
+    time.sleep(0.002)
+    refresher = threading.Thread(target=catalog.snapshot)
+    refresher.start()
+    assert started.wait(5)
+    # The refresh is in flight: other readers get the current snapshot without waiting
+    start = time.monotonic()
+    assert catalog.snapshot() is held and catalog.lookup(["ACC-0100"])["ACC-0100"] is not None
+    assert time.monotonic() - start < 1
+    release.set()
+    refresher.join(5)
+    assert held["MON-0054"].price == Decimal("329.99")
+    assert catalog.snapshot()["MON-0054"].price == Decimal("299.99")
+    print("✅ Snapshots are read-only and unchanged by later refreshes, which never block readers")
+
+
+def test_async_orders():
+    """With async_orders, create_order is acknowledged before the write and its outcome delivered later."""
+    print("\n" + "=" * 60)
+    print("Testing background order submission")
+    print("=" * 60)
+    
+    with MCPStandIn(latency=0.2) as server:
+        agent = make_agent(server, None)
+        agent.async_orders = True
+        agent.catalog_pricing = True
+        alice = CUSTOMERS[0]
+        agent.auth_handler.authenticate("alice", alice["email"], alice["pin"])
+        agent.catalog.snapshot()
+        
+        def order(items):
+            agent.client = ScriptedLLM(lambda messages, tools: [("create_order", {"customer_id": "me", "items": items})])
+            start = time.perf_counter()
+            response = agent.process_message("alice", "place my order", [])
+            return response, time.perf_counter() - start
+        
+        response, elapsed = order([{"sku": "MON-0054", "quantity": 2}])
+        assert "Placing your order" in response and "Dell 27 inch 4K Monitor" in response and "699.98" in response
+        assert elapsed < 0.15 and not server.orders, elapsed
+        print(f"✅ Acknowledged in {elapsed * 1000:.0f} ms, before the order write")
+        
+        (handle,) = agent.order_pipeline.pending("alice")
+        again, _ = order([{"sku": "MON-0054", "quantity": 2}])
+        assert handle.reference in response and handle.reference in again
+        handle.future.result(timeout=5)
+        reference = handle.reference
+        updates = agent.order_updates("alice")
+        assert len(updates) == 1 and "has been placed" in updates[0] and reference in updates[0]
+        assert len(server.orders) == 1 and agent.catalog.snapshot()["MON-0054"].stock == 20
+        assert agent.order_updates("alice") == []
+        print("✅ Repeat submission deduplicated; outcome delivered once")
+        
+        # The snapshot still shows stock, but the server has none left: the worker reports the rejection
+        server.products["ACC-0100"]["stock"] = 0
+        order([{"sku": "ACC-0100", "quantity": 1}])
+        (handle,) = agent.order_pipeline.pending("alice")
+        handle.future.result(timeout=5)
+        updates = agent.order_updates("alice")
+        assert "could not be placed" in updates[0] and "Not enough stock" in updates[0]
+        assert agent.catalog._loaded_at is None
+        print("✅ Server-side rejection reported and the catalog refreshed")
+        
+        order([{"sku": "NET-0201", "quantity": 1}])
+        (handle,) = agent.order_pipeline.pending("alice")
+        agent.order_pipeline.discard("alice")
+        handle.future.result(timeout=5)
+        assert not agent.order_pipeline.has_updates("alice") and agent.order_updates("alice") == []
+        print("✅ Clearing the session drops outcomes not yet delivered")
+
+
+def test_order_outbox():
+    """Order dedupe is keyed on the turn and lasts while pending; undelivered outcomes are bounded."""
+    print("\n" + "=" * 60)
+    print("Testing order idempotency and outbox bounds")
+    print("=" * 60)
+    
+    release = threading.Event()
+    
+    def place(session_id, arguments):
+        release.wait(5)
+        return "Order created"
+    
+    pipeline = OrderPipeline(place, workers=2)
+    items = {"customer_id": "c", "items": [{"sku": "MON-0054", "quantity": 1}]}
+    try:
+        first = pipeline.submit("s", items, turn="one monitor please")
+        assert pipeline.submit("s", items, turn="one monitor please ") is first
+        second = pipeline.submit("s", items, turn="and one more monitor")
+        assert second is not first
+        release.set()
+        first.future.result(timeout=5)
+        second.future.result(timeout=5)
+        assert pipeline.submit("s", items, turn="one monitor please") is not first
+        print("✅ Repeats of a pending turn deduplicated; other turns and later repeats are new orders")
+        
+        pipeline.OUTBOX_PER_SESSION = 2
+        pipeline.OUTBOX_SESSIONS = 2
+        for turn in ("a", "b", "c"):
+            pipeline.submit("s", items, turn=turn).future.result(timeout=5)
+        for session_id in ("t", "u"):
+            pipeline.submit(session_id, items).future.result(timeout=5)
+        assert not pipeline.has_updates("s") and pipeline.has_updates("t") and pipeline.has_updates("u")
+        assert len(pipeline.drain("u")) == 1
+        pipeline.OUTBOX_TTL = 0
+        assert pipeline.drain("t") == []
+        print("✅ Outbox bounded per session, in sessions and in age")
+    finally:
+        release.set()
+        pipeline.shutdown()
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Prefetch after auth", test_prefetch_after_auth),
+        ("Prefetch opt-in", test_prefetch_opt_in),
+        ("Order cache", test_order_cache),
+        ("Tool registry discovery", test_tool_registry_discovery),
+        ("Argument validation", test_argument_validation),
+        ("Model routing", test_model_routing),
+        ("Response templates", test_response_templates),
+        ("Speculative tools", test_speculative_tools),
+        ("LLM cassette", test_llm_cassette),
+        ("Message classifier", test_message_classifier),
+        ("Rate limiting", test_rate_limiting),
+        ("Order preparation", test_order_preparation),
+        ("Product resolver", test_product_resolver),
+        ("Catalog delta sync", test_catalog_delta_sync),
+        ("Async orders", test_async_orders),
+        ("Order outbox", test_order_outbox),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Offline tests for multi-worker deployment: shared state and sticky dispatch."""
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from mcp_client import MCPClient
+from auth import AuthHandler
+from memory import SessionMemory
+from store import SharedStore
+from launcher import Dispatcher
+from standins import MCPStandIn, CUSTOMERS
+
+
+def test_shared_state_across_workers():
+    """Two workers on one SQLite store see each other's sessions and logins."""
+    print("=" * 60)
+    print("Testing shared state across workers")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp, MCPStandIn() as server:
+        path = os.path.join(tmp, "state.db")
+        client = MCPClient(url=server.url, transport="http")
+        # Separate store objects stand in for separate processes
+        auth_a, auth_b = AuthHandler(client, SharedStore(path)), AuthHandler(client, SharedStore(path))
+        memory_a, memory_b = SessionMemory(SharedStore(path)), SessionMemory(SharedStore(path))
+        
+        customer = CUSTOMERS[0]
+        success, _ = auth_a.authenticate("s1", customer["email"], customer["pin"])
+        assert success
+        assert auth_b.is_authenticated("s1")
+        assert auth_b.get_customer_id("s1") == customer["customer_id"]
+        
+        memory_a.add_message("s1", "user", "hi")
+        memory_b.add_message("s1", "assistant", "hello")
+        assert [m["content"] for m in memory_a.get_messages("s1")] == ["hi", "hello"]
+        
+        auth_b.clear_auth("s1")
+        memory_b.clear("s1")
+        assert not auth_a.is_authenticated("s1")
+        assert memory_a.get_messages("s1") == []
+        print("✅ Auth and memory shared through the store")
+
+
+def _start_backend(name: str) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def log_message(self, format, *args):
+            pass
+        
+        def do_GET(self):
+            data = json.dumps({"worker": name}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            chunked = "Transfer-Encoding" in self.headers
+            data = json.dumps({"worker": name, "body": body.decode(), "chunked": chunked}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    backend = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=backend.serve_forever, daemon=True).start()
+    return backend
+
+
+def test_dispatcher_stickiness():
+    """Each browser stays on one worker; new browsers are spread out."""
+    print("=" * 60)
+    print("Testing dispatcher stickiness")
+    print("=" * 60)
+    
+    backends = [_start_backend("a"), _start_backend("b")]
+    dispatcher = Dispatcher([("127.0.0.1", b.server_address[1]) for b in backends], port=0).start()
+    try:
+        url = f"http://127.0.0.1:{dispatcher.port}/"
+        seen = set()
+        for _ in range(4):
+            browser = requests.Session()
+            workers = {browser.get(url, timeout=5).json()["worker"] for _ in range(5)}
+            assert len(workers) == 1
+            seen |= workers
+        assert seen == {"a", "b"}
+        
+        # Cookie-less API clients stick by session_hash
+        by_hash = {requests.get(url + "?session_hash=abc", timeout=5).json()["worker"] for _ in range(5)}
+        assert len(by_hash) == 1
+        print("✅ Sessions pinned, placement balanced")
+        
+        # Chunked uploads are decoded and forwarded with a Content-Length; other codings are refused
+        echoed = requests.post(url, data=(part for part in (b"hello ", b"chunked ", b"world")), timeout=5).json()
+        assert echoed["body"] == "hello chunked world" and not echoed["chunked"]
+        refused = requests.post(url, data=b"x", headers={"Transfer-Encoding": "gzip"}, timeout=5)
+        assert refused.status_code == 411
+        print("✅ Chunked request bodies forwarded; unsupported transfer codings get 411")
+    finally:
+        dispatcher.stop()
+        for backend in backends:
+            backend.shutdown()
+            backend.server_close()
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Shared state across workers", test_shared_state_across_workers),
+        ("Dispatcher stickiness", test_dispatcher_stickiness),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
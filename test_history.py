@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Tests for server-side chat history and incremental UI updates."""
+import dataclasses
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from config import settings
+from memory import Message, SessionMemory
+from store import SharedStore
+from standins import MCPStandIn, ScriptedLLM, CUSTOMERS
+from test_agent_offline import make_agent
+
+
+def test_memory_offsets():
+    """Both memory backends serve messages from an offset."""
+    print("=" * 60)
+    print("Testing memory offsets")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for memory in (SessionMemory(), SessionMemory(store=SharedStore(os.path.join(tmp, "state.db")))):
+            for i in range(5):
+                memory.add_message("s", "user", f"m{i}")
+            assert memory.count("s") == 5 and memory.count("other") == 0
+            assert [m["content"] for m in memory.get_messages_since("s", 3)] == ["m3", "m4"]
+            assert memory.get_messages_since("s", 5) == []
+            assert memory.get_messages_since("other", 0) == []
+    print("✅ get_messages_since/count agree across backends")
+
+
+def test_compact_messages():
+    """Stored messages are slotted records and the LLM context is a view of them."""
+    print("=" * 60)
+    print("Testing compact message storage")
+    print("=" * 60)
+    
+    memory = SessionMemory()
+    for i in range(6):
+        memory.add_message("s", "".join(["us", "er"]) if i % 2 == 0 else "assistant", f"m{i}")
+    stored = memory.memories["s"]
+    assert not hasattr(stored[0], "__dict__")
+    assert stored[0].role is stored[2].role == "user"
+    assert stored[1] == {"role": "assistant", "content": "m1"} and dict(stored[1]) == stored[1].as_dict()
+    
+    context = memory.get_conversation_context("s", max_messages=4)
+    assert len(context) == 4 and context[0] is stored[2] and context[-1] is stored[5]
+    assert [m["content"] for m in context[1:3]] == ["m3", "m4"]
+    memory.add_message("s", "user", "m6")
+    assert len(context) == 4 and list(context) == stored[2:6]
+    
+    with MCPStandIn() as server:
+        seen = []
+        agent = make_agent(server, lambda messages, tools: seen.append(messages) or "ok")
+        agent.process_message("s", "hi", context)
+    prompt = seen[0]
+    assert prompt[0]["role"] == "system" and prompt[-1] == {"role": "user", "content": "hi"}
+    assert all(a is b for a, b in zip(prompt[1:-1], context))
+    print("✅ History records are passed to the LLM without copies")
+
+
+def test_ui_receives_only_new_messages():
+    """Each turn sends the browser the new messages, not the whole transcript."""
+    print("=" * 60)
+    print("Testing incremental UI updates")
+    print("=" * 60)
+    
+    original = settings.current
+    with MCPStandIn() as server:
+        settings._current = dataclasses.replace(original, mcp_server_url=server.url)
+        try:
+            import app
+            app.agent = make_agent(server, lambda messages, tools: "Happy to help.")
+            app.auth_handler = app.agent.auth_handler
+            demo = app.create_interface()
+            handlers = {fn.name: fn.fn for fn in demo.fns.values() if fn.fn is not None}
+            submit, clear = handlers["submit_message"], handlers["clear_chat"]
+            
+            customer = CUSTOMERS[0]
+            update, shown, textbox = submit(f"email: {customer['email']}, pin: {customer['pin']}", "ui-1", 0)
+            assert textbox == "" and shown == 2 and not update["reset"]
+            assert [m["role"] for m in update["messages"]] == ["user", "assistant"]
+            assert update["messages"][1]["content"][0]["text"].startswith("✅")
+            
+            for turn in range(5):
+                update, shown, _ = submit(f"hello {turn}", "ui-1", shown)
+                assert len(update["messages"]) == 2
+            assert shown == 12 == app.memory.count("ui-1")
+            assert update["messages"][0]["content"][0]["text"] == "hello 4"
+            print("✅ Each turn carries only its two messages")
+            
+            update, shown = clear("ui-1")
+            assert update == {"reset": True, "start": 0, "messages": []} and shown == 0
+            # A browser that missed the clear (e.g. another tab) is resynchronized
+            app.memory.add_message("ui-1", "user", "again")
+            reset, messages = app.history_delta("ui-1", 12)
+            assert reset and [m["content"] for m in messages] == ["again"]
+            print("✅ Cleared sessions reset the browser's history")
+            
+            # A background order's outcome arrives through the poll, after the turn's own messages
+            settings._current = dataclasses.replace(settings._current, async_orders=True)
+            app.agent._apply_settings(settings._current)
+            app.agent.client = ScriptedLLM(lambda messages, tools: [("create_order", {"items": [{"sku": "ACC-0101", "quantity": 1, "unit_price": "89.99"}]})])
+            _, shown, _ = submit(f"email: {customer['email']}, pin: {customer['pin']}", "ui-1", 1)
+            update, shown, _ = submit("order one mx master mouse", "ui-1", shown)
+            assert update["start"] == 3 and "Placing your order" in update["messages"][1]["content"][0]["text"]
+            for _ in range(100):
+                if app.agent.order_pipeline.has_updates("ui-1"):
+                    break
+                time.sleep(0.02)
+            update, shown = handlers["poll_orders"]("ui-1", shown)
+            assert update["start"] == 5 and shown == 6
+            assert "has been placed" in update["messages"][0]["content"][0]["text"]
+            assert "messages" not in handlers["poll_orders"]("ui-1", shown)[0]
+            print("✅ Order outcome pushed by the poll as one new message")
+        finally:
+            settings._current = original
+
+
+def test_double_submit():
+    """The same message submitted twice at once runs one turn; both submits get its reply."""
+    print("\n" + "=" * 60)
+    print("Testing double-submit deduplication")
+    print("=" * 60)
+    
+    original = settings.current
+    with MCPStandIn() as server:
+        settings._current = dataclasses.replace(original, mcp_server_url=server.url, turn_dedupe_window=0.5)
+        try:
+            import app
+            llm_calls = []
+            
+            def responder(messages, tools):
+                last = messages[-1]
+                if isinstance(last, dict) and last["role"] == "tool":
+                    return last["content"]
+                llm_calls.append(last["content"])
+                time.sleep(0.2)
+                if "order" in last["content"]:
+                    return [("create_order", {"items": [{"sku": "NET-0201", "quantity": 1, "unit_price": "39.99"}]})]
+                return "Happy to help."
+            
+            app.agent = make_agent(server, responder)
+            app.auth_handler = app.agent.auth_handler
+            demo = app.create_interface()
+            handlers = {fn.name: fn.fn for fn in demo.fns.values() if fn.fn is not None}
+            submit = handlers["submit_message"]
+            customer = CUSTOMERS[1]
+            _, shown, _ = submit(f"email: {customer['email']}, pin: {customer['pin']}", "dup-1", 0)
+            
+            def submit_twice(message):
+                results = []
+                threads = [
+                    threading.Thread(target=lambda: results.append(submit(message, "dup-1", shown)))
+                    for _ in range(2)
+                ]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                return results
+            
+            # Running turns are deduplicated even when finished ones are evicted at once
+            app.recent_turns.max_entries = 0
+            first, second = submit_twice("please order one 8-port switch")
+            app.recent_turns.max_entries = 4096
+            assert app.in_flight_turns == {}
+            assert len(llm_calls) == 1 and len(server.orders) == 1
+            assert first[0] == second[0] and app.memory.count("dup-1") == 4
+            assert app.agent.metrics.get("turns_deduplicated") == 1
+            print("✅ Enter-plus-click placed one order and produced one reply")
+            
+            time.sleep(0.6)
+            submit("hello", "dup-1", 4)
+            submit("hello", "dup-1", 6)
+            assert llm_calls.count("hello") == 1
+            time.sleep(0.6)
+            submit("hello", "dup-1", 6)
+            assert llm_calls.count("hello") == 2 and app.memory.count("dup-1") == 8
+            print("✅ The same message after the window is a new turn")
+            
+            handlers["clear_chat"]("dup-1")
+            submit("hello", "dup-1", 0)
+            assert llm_calls.count("hello") == 3
+            print("✅ Clearing the chat forgets recent turns")
+        finally:
+            settings._current = original
+
+
+def test_login_when_shed():
+    """A login whose verification call is rate limited gets the busy reply, not a failed login."""
+    print("\n" + "=" * 60)
+    print("Testing rate-limited login")
+    print("=" * 60)
+    
+    original = settings.current
+    with MCPStandIn() as server:
+        settings._current = dataclasses.replace(original, mcp_server_url=server.url)
+        try:
+            import app
+            from agent import BUSY_MESSAGE
+            from ratelimit import RateLimiter
+            app.agent = make_agent(server, lambda messages, tools: "Happy to help.")
+            app.auth_handler = app.agent.auth_handler
+            limiter = RateLimiter("mcp", 0.01, 0, max_wait=0)
+            limiter.acquire()
+            app.agent.mcp_client.rate_limiter = limiter
+            customer = CUSTOMERS[0]
+            assert app._login("shed-1", customer["email"], customer["pin"]) == BUSY_MESSAGE
+            assert not app.auth_handler.is_authenticated("shed-1")
+            assert server.calls.get("verify_customer_pin", 0) == 0
+            print("✅ Shed verification answered with the busy message")
+        finally:
+            settings._current = original
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Memory offsets", test_memory_offsets),
+        ("Compact message storage", test_compact_messages),
+        ("Incremental UI updates", test_ui_receives_only_new_messages),
+        ("Double-submit deduplication", test_double_submit),
+        ("Rate-limited login", test_login_when_shed),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Offline tests for MCP transports against a local stand-in server."""
+import socket
+import sys
+import threading
+import time
+from config import settings
+from mcp_client import MCPClient, SSETransport
+from standins import MCPStandIn
+
+
+def test_http_transport():
+    """POST transport answers inline."""
+    print("=" * 60)
+    print("Testing HTTP transport")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        client = MCPClient(url=server.url, transport="http")
+        result = client.call_tool("get_product", {"sku": "COM-0001"})
+        assert "COM-0001" in result["content"][0]["text"]
+        print("✅ get_product answered over POST")
+        assert server.streams_opened == 0
+
+
+def test_sse_multiplexing():
+    """Concurrent calls share one stream and are routed back by id."""
+    print("\n" + "=" * 60)
+    print("Testing SSE transport multiplexing")
+    print("=" * 60)
+    
+    with MCPStandIn(latency=0.05) as server:
+        client = MCPClient(url=server.url, transport="sse")
+        try:
+            client.initialize()
+            skus = ["COM-0001", "MON-0054", "PRI-0010", "ACC-0100", "NET-0200"]
+            results = {}
+            
+            def fetch(sku):
+                results[sku] = client.call_tool("get_product", {"sku": sku})
+            
+            threads = [threading.Thread(target=fetch, args=(sku,)) for sku in skus]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            
+            for sku in skus:
+                assert f"SKU: {sku}" in results[sku]["content"][0]["text"], sku
+            print(f"✅ {len(skus)} concurrent responses routed to the right callers")
+            assert server.streams_opened == 1
+            print("✅ All responses delivered over a single stream")
+            
+            # The stream is shared: closing one client leaves it open for the others
+            other = MCPClient(url=server.url, transport="sse")
+            assert other.transport is client.transport
+            other.close()
+            assert "COM-0001" in client.call_tool("get_product", {"sku": "COM-0001"})["content"][0]["text"]
+            print("✅ Closing one client kept the shared stream open")
+        finally:
+            client.close()
+        assert client.transport._closed.is_set()
+
+
+def test_sse_reconnect_and_resume():
+    """A dropped stream reconnects and replays missed events."""
+    print("\n" + "=" * 60)
+    print("Testing SSE reconnect with Last-Event-ID")
+    print("=" * 60)
+    
+    with MCPStandIn(latency=0.3) as server:
+        transport = SSETransport(server.url, reconnect_delay=0.05)
+        client = MCPClient(url=server.url, transport="sse")
+        client.transport = transport
+        try:
+            client.initialize()
+            client.call_tool("get_product", {"sku": "COM-0001"})
+            result = {}
+            
+            def fetch():
+                result["value"] = client.call_tool("get_product", {"sku": "MON-0054"})
+            
+            t = threading.Thread(target=fetch)
+            t.start()
+            time.sleep(0.1)
+            # Response is produced while no stream is attached
+            server.drop_streams(reject_for=0.4)
+            t.join(timeout=5)
+            
+            assert "MON-0054" in result["value"]["content"][0]["text"]
+            assert transport.reconnects >= 1
+            print(f"✅ Response replayed after {transport.reconnects} reconnect(s)")
+        finally:
+            transport.close()
+
+
+def test_sse_session_expiry():
+    """An expired session is re-initialized transparently."""
+    print("\n" + "=" * 60)
+    print("Testing SSE session resumption after expiry")
+    print("=" * 60)
+    
+    with MCPStandIn() as server:
+        transport = SSETransport(server.url, reconnect_delay=0.05)
+        client = MCPClient(url=server.url, transport="sse")
+        client.transport = transport
+        try:
+            client.call_tool("get_product", {"sku": "COM-0001"})
+            old_session = transport.session_id
+            server.expire_sessions()
+            result = client.call_tool("get_product", {"sku": "COM-0002"})
+            assert "COM-0002" in result["content"][0]["text"]
+            assert transport.session_id != old_session
+            print("✅ Call succeeded on a fresh session")
+        finally:
+            transport.close()
+
+
+def test_endpoint_balancing_and_hedging():
+    """Reads spread over replicas; a stalled replica is hedged around and a dead one failed over."""
+    print("\n" + "=" * 60)
+    print("Testing multi-endpoint balancing and hedged reads")
+    print("=" * 60)
+    
+    original = settings._current
+    settings.update({"mcp_hedge_budget": 1.0, "mcp_hedge_min_ms": 20})
+    stall_next = threading.Event()
+    
+    def latency(base):
+        def draw():
+            # Only the next call stalls, on whichever endpoint gets it; its hedge does not
+            if stall_next.is_set():
+                stall_next.clear()
+                return 0.5
+            return base
+        return draw
+    
+    with MCPStandIn(latency=latency(0.002)) as fast, MCPStandIn(latency=latency(0.01)) as steady:
+        client = MCPClient(url=fast.url, transport="http", urls=[steady.url])
+        try:
+            client.initialize()
+            
+            def fetch(sku="COM-0001"):
+                return client.call_tool("get_product", {"sku": sku}, hedge=True)
+            
+            threads = [threading.Thread(target=fetch) for _ in range(30)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert fast.calls["get_product"] > 0 and steady.calls["get_product"] > 0
+            print(f"✅ Calls spread {fast.calls['get_product']}/{steady.calls['get_product']} over two endpoints")
+            
+            for _ in range(20):
+                fetch()
+            stall_next.set()
+            start = time.perf_counter()
+            result = fetch("MON-0054")
+            elapsed = time.perf_counter() - start
+            assert "MON-0054" in result["content"][0]["text"]
+            assert elapsed < 0.3, elapsed
+            assert client.metrics.get("mcp.hedge_wins") == 1
+            print(f"✅ Stalled call answered by the hedge in {elapsed * 1000:.0f} ms")
+        finally:
+            client.close()
+    
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        dead_url = f"http://127.0.0.1:{probe.getsockname()[1]}/mcp"
+    with MCPStandIn() as server:
+        client = MCPClient(url=dead_url, transport="http", urls=[server.url])
+        try:
+            client.initialize()
+            result = client.call_tool("get_product", {"sku": "COM-0002"}, hedge=True)
+            assert "COM-0002" in result["content"][0]["text"]
+            dead, alive = client.status()["endpoints"]
+            assert not dead["healthy"] and alive["healthy"]
+            # Non-idempotent calls are not retried, but the dead endpoint is now skipped
+            client.call_tool("get_product", {"sku": "COM-0003"})
+            assert server.calls["get_product"] == 2
+            print("✅ Unreachable endpoint failed over and taken out of rotation")
+        finally:
+            client.close()
+            settings._current = original
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("HTTP transport", test_http_transport),
+        ("SSE multiplexing", test_sse_multiplexing),
+        ("SSE reconnect", test_sse_reconnect_and_resume),
+        ("SSE session expiry", test_sse_session_expiry),
+        ("Endpoint balancing and hedging", test_endpoint_balancing_and_hedging),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Tests for opt-in turn profiling."""
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+from config import settings
+from profiling import TurnProfiler, _DISABLED
+
+
+def _busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _profiled(changes, turns):
+    """Run ``turns`` (a list of busy seconds) under a fresh profiler; return the files written."""
+    original = settings.current
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            settings.update(dict(changes, profile_dir=tmp))
+            profiler = TurnProfiler()
+            for seconds in turns:
+                with profiler.turn("session/1"):
+                    _busy_wait(seconds)
+            files = sorted(os.listdir(tmp))
+            contents = {}
+            for name in files:
+                path = os.path.join(tmp, name)
+                if name.endswith(".prof"):
+                    contents[name] = pstats.Stats(path)
+                else:
+                    with open(path) as f:
+                        contents[name] = f.read()
+            assert profiler.written == len(files)
+            return contents
+        finally:
+            settings._current = original
+
+
+def test_disabled_by_default():
+    """With both selectors at 0 the profiler costs one shared no-op context."""
+    print("=" * 60)
+    print("Testing disabled profiler")
+    print("=" * 60)
+    
+    profiler = TurnProfiler()
+    assert settings.profile_sample_every == 0 and settings.profile_slow_ms == 0
+    assert profiler.turn("s") is _DISABLED
+    
+    start = time.perf_counter()
+    for _ in range(100000):
+        with profiler.turn("s"):
+            pass
+    per_turn_us = (time.perf_counter() - start) / 100000 * 1e6
+    print(f"Disabled overhead: {per_turn_us:.2f} µs/turn")
+    assert per_turn_us < 50
+    print("✅ Disabled path is a no-op")
+
+
+def test_stack_sampling():
+    """Every Nth turn and slow turns are written as collapsed stacks."""
+    print("=" * 60)
+    print("Testing stack sampling")
+    print("=" * 60)
+    
+    files = _profiled({"profile_sample_every": 2, "profile_interval_ms": 1}, [0.05, 0.05, 0.05, 0.05])
+    assert len(files) == 2, files
+    for name, text in files.items():
+        assert name.endswith(".collapsed") and "session_1" in name
+        assert "_busy_wait" in text
+        stack, count = text.splitlines()[0].rsplit(" ", 1)
+        assert int(count) > 0 and stack.index("_profiled") < stack.index("_busy_wait")
+    print("✅ Every 2nd turn sampled")
+    
+    files = _profiled({"profile_slow_ms": 40, "profile_interval_ms": 1}, [0.005, 0.06, 0.005])
+    assert len(files) == 1, files
+    print("✅ Only the slow turn written")
+
+
+def test_cprofile_mode():
+    """cprofile mode writes pstats-readable files for every-Nth turns."""
+    print("=" * 60)
+    print("Testing cProfile mode")
+    print("=" * 60)
+    
+    files = _profiled({"profile_sample_every": 1, "profile_mode": "cprofile"}, [0.01])
+    assert len(files) == 1
+    (name, stats), = files.items()
+    assert name.endswith(".prof")
+    assert any(func[2] == "_busy_wait" for func in stats.stats)
+    print("✅ .prof written")
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Disabled by default", test_disabled_by_default),
+        ("Stack sampling", test_stack_sampling),
+        ("cProfile mode", test_cprofile_mode),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
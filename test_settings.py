@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Tests for typed settings, hot reload and the admin endpoints."""
+import dataclasses
+import json
+import os
+import sys
+import tempfile
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from config import SettingsManager, load_settings, settings
+from admin import build_admin_router
+from memory import SessionMemory
+from memstats import MemoryAccountant
+from test_agent_offline import make_agent
+from standins import CUSTOMERS, MCPStandIn
+
+
+def test_settings_sources():
+    """Defaults, then the settings file, then environment variables."""
+    print("=" * 60)
+    print("Testing settings sources")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "settings.json")
+        with open(path, "w") as f:
+            json.dump({"order_cache_ttl": 5, "speculative_tools": ["list_orders"], "mcp_timeout": 3}, f)
+        loaded = load_settings(path, {"OPENAI_API_KEY": "k", "MCP_TIMEOUT": "7.5", "RESPONSE_TEMPLATES": "get_product, get_order"})
+        assert loaded.order_cache_ttl == 5.0
+        assert loaded.speculative_tools == ("list_orders",)
+        assert loaded.mcp_timeout == 7.5
+        assert loaded.response_templates == ("get_product", "get_order")
+        assert loaded.memory_max_messages == 10
+        
+        try:
+            load_settings(None, {"OPENAI_API_KEY": "k", "MCP_TRANSPORT": "carrier-pigeon"})
+            assert False, "expected a validation error"
+        except ValueError:
+            pass
+        
+        manager = SettingsManager(path)
+        try:
+            manager.update({"app_port": 9000})
+            assert False, "restart-only fields cannot be hot-updated"
+        except ValueError:
+            pass
+        with open(path, "w") as f:
+            json.dump({"order_cache_ttl": 9, "app_port": 9000}, f)
+        result = manager.reload()
+        assert result["applied"]["order_cache_ttl"] == 9.0
+        assert result["restart_required"] == ["app_port"]
+        assert manager.app_port != 9000
+        print("✅ File, env and reload precedence")
+
+
+def test_hot_reload_and_admin():
+    """Admin PATCH changes live agent behaviour without a restart."""
+    print("=" * 60)
+    print("Testing hot reload through the admin endpoint")
+    print("=" * 60)
+    
+    original = settings.current
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: "ok")
+        app = FastAPI()
+        app.include_router(build_admin_router(agent))
+        client = TestClient(app)
+        try:
+            # admin_token is restart-only, so set it directly for the test
+            settings._current = dataclasses.replace(original, admin_token="secret")
+            
+            assert client.get("/admin/settings").status_code == 401
+            headers = {"X-Admin-Token": "secret"}
+            body = client.get("/admin/settings", headers=headers).json()
+            assert body["values"]["openai_api_key"] == "***"
+            assert "order_cache_ttl" in body["hot"]
+            
+            response = client.patch("/admin/settings", headers=headers,
+                                    json={"order_cache_ttl": 1, "openai_fast_model": "tiny", "llm_session_rps": 0})
+            assert response.status_code == 200
+            assert agent.order_cache.ttl == 1.0
+            assert agent.router.fast_model == "tiny"
+            assert agent.llm_request_limiter.per_key_rate == 0
+            
+            assert client.patch("/admin/settings", headers=headers, json={"state_db": "x"}).status_code == 400
+            assert "limits" in client.get("/admin/metrics", headers=headers).json()
+            print("✅ Agent reconfigured live")
+        finally:
+            settings._current = original
+            agent._apply_settings(original)
+
+
+def test_memory_accounting():
+    """Per-component byte accounting and tracemalloc snapshots through the admin API."""
+    print("=" * 60)
+    print("Testing memory accounting")
+    print("=" * 60)
+    
+    original = settings.current
+    with MCPStandIn() as server:
+        agent = make_agent(server, lambda messages, tools: "ok")
+        customer = CUSTOMERS[0]
+        assert agent.auth_handler.authenticate("s1", customer["email"], customer["pin"])[0]
+        # Only the parsed fields are kept per session, not the raw verify_customer payload
+        assert set(agent.auth_handler.auth_state["s1"]) == {"email", "authenticated", "customer_id"}
+        assert agent.auth_handler.get_customer_id("s1") == customer["customer_id"]
+        assert agent.auth_handler.get_customer_info("s1")["customer_id"] == customer["customer_id"]
+        
+        memory = SessionMemory()
+        accountant = MemoryAccountant()
+        accountant.ignore(agent.mcp_client)
+        accountant.register("session_memory", lambda: memory)
+        accountant.register("auth_state", lambda: agent.auth_handler)
+        empty = accountant.report()["components"]
+        for i in range(100):
+            memory.add_message(f"s{i}", "user", f"{i:04d}" * 250)
+        report = accountant.report()
+        grown = report["components"]["session_memory"]["bytes"] - empty["session_memory"]["bytes"]
+        assert 100 * 1000 < grown < 100 * 1000 * 2, grown
+        # The MCP client is shared infrastructure and is not charged to auth_state
+        assert report["components"]["auth_state"]["bytes"] < 10_000
+        assert report["accounted_bytes"] >= grown
+        print(f"✅ 100 x 1 KB messages accounted as {grown} bytes")
+        
+        app = FastAPI()
+        app.include_router(build_admin_router(agent, accountant))
+        client = TestClient(app)
+        headers = {"X-Admin-Token": "secret"}
+        try:
+            settings._current = dataclasses.replace(original, admin_token="secret")
+            body = client.get("/admin/memory", headers=headers).json()
+            assert set(body["components"]) == {"session_memory", "auth_state"}
+            
+            first = client.post("/admin/memory/snapshot", headers=headers).json()
+            assert first["started"] and first["diff"] == []
+            retained = [bytearray(10_000) for _ in range(50)]
+            second = client.post("/admin/memory/snapshot", headers=headers, params={"top": 5}).json()
+            assert not second["started"] and len(second["top"]) <= 5
+            assert any(s["site"][0].startswith(__file__) and s["bytes_diff"] >= 500_000 for s in second["diff"]), second["diff"]
+            assert client.post("/admin/memory/snapshot", headers=headers, params={"group_by": "x"}).status_code == 400
+            print("✅ Snapshot diff points at the allocation site")
+            del retained
+        finally:
+            assert client.delete("/admin/memory/snapshot", headers=headers).json() == {"stopped": True}
+            settings._current = original
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Settings sources", test_settings_sources),
+        ("Hot reload and admin", test_hot_reload_and_admin),
+        ("Memory accounting", test_memory_accounting),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
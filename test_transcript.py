@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Tests for the compressed transcript log."""
+import os
+import sys
+import tempfile
+from transcript import HEADER, TranscriptReader, TranscriptWriter
+
+
+def test_transcript_roundtrip():
+    """Messages written in blocks are read back by session and time range."""
+    print("=" * 60)
+    print("Testing transcript write and scan")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = TranscriptWriter(tmp, block_records=10, writer_id="w1")
+        for i in range(95):
+            writer.append(f"s{i % 3}", "user", f"message {i}", timestamp=1000.0 + i)
+        writer.close()
+        
+        reader = TranscriptReader(tmp)
+        everything = list(reader.scan())
+        assert [m["content"] for m in everything] == [f"message {i}" for i in range(95)]
+        
+        session = list(reader.scan(session_id="s1"))
+        assert len(session) == 32 and all(m["session_id"] == "s1" for m in session)
+        
+        window = list(reader.scan(since=1050.0, until=1059.0))
+        assert [m["timestamp"] for m in window] == [1050.0 + i for i in range(10)]
+        print(f"✅ {len(everything)} messages in {len(everything) // 10 + 1} blocks")
+
+
+def test_transcript_without_index():
+    """A lost index or a torn trailing block does not hide complete blocks."""
+    print("=" * 60)
+    print("Testing transcript recovery")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = TranscriptWriter(tmp, block_records=5, writer_id="w1")
+        for i in range(20):
+            writer.append("s", "assistant", f"reply {i}", timestamp=2000.0 + i)
+        writer.close()
+        
+        log_path = TranscriptReader(tmp).segments()[0]
+        os.remove(log_path[:-4] + ".idx")
+        with open(log_path, "ab") as f:
+            f.write(HEADER.pack(b"LCTB", 0, 1000, 5, 0.0, 0.0) + b"partial")
+        
+        messages = list(TranscriptReader(tmp).scan(session_id="s"))
+        assert len(messages) == 20
+        print("✅ Recovered all complete blocks")
+
+
+def main():
+    """Run all tests."""
+    tests = [
+        ("Transcript roundtrip", test_transcript_roundtrip),
+        ("Transcript recovery", test_transcript_without_index),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
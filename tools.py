@@ -0,0 +1,277 @@
+"""Declarative registry of MCP tools exposed to the LLM."""
+import json
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Iterable, List, Mapping, Optional
+from validation import compile_schema, public_schema
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    """How the agent treats calls to one tool."""
+    requires_auth: bool = False
+    # Overwrite customer_id with the authenticated session's UUID
+    inject_customer_id: bool = False
+    # Results may be served from the per-customer order cache
+    cacheable: bool = False
+    # Successful or not, the call invalidates cached order reads
+    mutates_orders: bool = False
+    # Seconds to wait for the server; None uses settings.mcp_timeout
+    timeout: Optional[float] = None
+    # Hidden tools are callable by the app but never offered to the LLM
+    exposed: bool = True
+    # A lone call's result is rendered by templates.TEMPLATES instead of a second LLM call
+    templated: bool = False
+    # Order items are checked and priced against catalog.Catalog before dispatch
+    catalog_priced: bool = False
+    # ``sku`` / ``query`` arguments are resolved against the local catalog (resolver.py) before dispatch
+    resolves_products: bool = False
+    # Safe to send twice: slow or failed calls are hedged on another MCP endpoint
+    idempotent: bool = False
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A tool's OpenAI function schema together with its dispatch policy."""
+    name: str
+    schema: Dict[str, Any]
+    schema_json: str
+    policy: ToolPolicy
+    # Compiled from the parameters schema; canonicalizes arguments or raises ToolArgumentError
+    validate: Callable[[Any], Dict[str, Any]] = field(compare=False, default=dict)
+
+
+# Tools not listed here are assumed to touch customer data
+DEFAULT_POLICY = ToolPolicy(requires_auth=True)
+
+TOOL_POLICIES: Mapping[str, ToolPolicy] = MappingProxyType({
+    "list_products": ToolPolicy(idempotent=True),
+    "get_product": ToolPolicy(timeout=5, templated=True, resolves_products=True, idempotent=True),
+    "search_products": ToolPolicy(resolves_products=True, idempotent=True),
+    "get_customer": ToolPolicy(requires_auth=True, inject_customer_id=True, idempotent=True),
+    "list_orders": ToolPolicy(requires_auth=True, inject_customer_id=True, cacheable=True, idempotent=True),
+    "get_order": ToolPolicy(requires_auth=True, cacheable=True, templated=True, idempotent=True),
+    "create_order": ToolPolicy(
+        requires_auth=True, inject_customer_id=True, mutates_orders=True, timeout=20, catalog_priced=True
+    ),
+    "verify_customer_pin": ToolPolicy(exposed=False),
+})
+
+# Hand-tuned descriptions for known tools; they take precedence over discovered ones
+CURATED_TOOLS: List[Dict[str, Any]] = [
+    {
+        "name": "list_products",
+        "description": "List products with optional filters by category or active status",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "category": {
+                    "type": "string",
+                    "description": "Filter by category (e.g., 'Computers', 'Monitors', 'Printers')"
+                },
+                "is_active": {
+                    "type": "boolean",
+                    "description": "Filter by active status"
+                }
+            }
+        }
+    },
+    {
+        "name": "get_product",
+        "description": "Get detailed product information by SKU",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "sku": {
+                    "type": "string",
+                    "format": "sku",
+                    "description": "Product SKU (e.g., 'COM-0001', 'MON-0054')"
+                }
+            },
+            "required": ["sku"]
+        }
+    },
+    {
+        "name": "search_products",
+        "description": "Search products by name or description keyword",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search term (case-insensitive, partial match)"
+                }
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "get_customer",
+        "description": "Get customer information by customer ID. Requires authentication.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "customer_id": {
+                    "type": "string",
+                    "format": "uuid",
+                    "description": "Customer UUID"
+                }
+            },
+            "required": ["customer_id"]
+        }
+    },
+    {
+        "name": "list_orders",
+        "description": "List orders with optional filters. Requires authentication.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "customer_id": {
+                    "type": "string",
+                    "format": "uuid",
+                    "description": "Filter by customer UUID"
+                },
+                "status": {
+                    "type": "string",
+                    "enum": ["draft", "submitted", "approved", "fulfilled", "cancelled"],
+                    "description": "Filter by status: draft, submitted, approved, fulfilled, cancelled"
+                }
+            }
+        }
+    },
+    {
+        "name": "get_order",
+        "description": "Get detailed order information including items. Requires authentication.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "order_id": {
+                    "type": "string",
+                    "format": "uuid",
+                    "description": "Order UUID"
+                }
+            },
+            "required": ["order_id"]
+        }
+    },
+    {
+        "name": "create_order",
+        "description": "Create a new order with items. Requires authentication.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "customer_id": {
+                    "type": "string",
+                    "format": "uuid",
+                    "description": "Customer UUID"
+                },
+                "items": {
+                    "type": "array",
+                    "description": "List of order items",
+                    "minItems": 1,
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "sku": {"type": "string", "format": "sku"},
+                            "quantity": {"type": "integer", "minimum": 1},
+                            # Replaced by the catalog price when catalog pricing is on
+                            "unit_price": {"type": "string", "description": "Unit price from get_product, e.g. '349.99'"},
+                            "currency": {"type": "string", "default": "USD"}
+                        },
+                        "required": ["sku", "quantity"]
+                    }
+                }
+            },
+            "required": ["customer_id", "items"]
+        }
+    },
+]
+
+
+def _make_spec(name: str, description: str, parameters: Dict[str, Any]) -> ToolSpec:
+    schema = {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            # Validation keeps the full schema; the LLM gets only standard JSON-schema keywords
+            "parameters": public_schema(parameters)
+        }
+    }
+    return ToolSpec(
+        name=name,
+        schema=schema,
+        schema_json=json.dumps(schema, sort_keys=True, separators=(",", ":")),
+        policy=TOOL_POLICIES.get(name, DEFAULT_POLICY),
+        validate=compile_schema(parameters)
+    )
+
+
+class ToolRegistry:
+    """Immutable name -> ToolSpec table with the LLM-facing schema list prebuilt."""
+    
+    def __init__(self, specs: Iterable[ToolSpec]):
+        self._specs: Mapping[str, ToolSpec] = MappingProxyType({spec.name: spec for spec in specs})
+        exposed = [spec for spec in self._specs.values() if spec.policy.exposed]
+        self.openai_tools: List[Dict[str, Any]] = [spec.schema for spec in exposed]
+        self.schemas_json = "[" + ",".join(spec.schema_json for spec in exposed) + "]"
+    
+    def get(self, name: str) -> Optional[ToolSpec]:
+        """Look up a tool by name."""
+        return self._specs.get(name)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+    
+    def __iter__(self):
+        return iter(self._specs.values())
+    
+    def __len__(self) -> int:
+        return len(self._specs)
+
+
+def build_registry(discovered: Optional[List[Dict[str, Any]]] = None) -> ToolRegistry:
+    """Build a registry from ``tools/list`` output, or from curated schemas alone.
+
+    Discovery decides which tools exist; curated schemas override the
+    server's description and parameters for tools we know.
+    """
+    curated = {tool["name"]: tool for tool in CURATED_TOOLS}
+    if discovered is None:
+        return ToolRegistry(_make_spec(t["name"], t["description"], t["parameters"]) for t in CURATED_TOOLS)
+    
+    specs = []
+    for tool in discovered:
+        name = tool["name"]
+        known = curated.get(name)
+        if known is not None:
+            specs.append(_make_spec(name, known["description"], known["parameters"]))
+        else:
+            specs.append(_make_spec(
+                name,
+                tool.get("description", ""),
+                tool.get("inputSchema") or {"type": "object", "properties": {}}
+            ))
+    return ToolRegistry(specs)
+
+
+# Built once at import and shared by every agent
+STATIC_REGISTRY = build_registry()
+
+_discovered: Dict[str, ToolRegistry] = {}
+_discovery_lock = threading.Lock()
+
+
+def discover_registry(mcp_client) -> ToolRegistry:
+    """Return the registry for the client's server, discovering tools once per process."""
+    with _discovery_lock:
+        registry = _discovered.get(mcp_client.url)
+        if registry is None:
+            try:
+                registry = build_registry(mcp_client.list_tools())
+            except Exception:
+                # Discovery is an optimisation; fall back to the curated tools
+                return STATIC_REGISTRY
+            _discovered[mcp_client.url] = registry
+        return registry
@@ -0,0 +1,259 @@
+"""Append-only compressed transcript log with a sparse index and mmap reader.
+
+Usage: python transcript.py DIR [--session ID] [--since TS] [--until TS]
+
+Each writer process owns its own segments, ``transcript-<writer>-NNNNNN.log``,
+so app workers never interleave appends. On-disk layout of a segment:
+
+    block  := header payload
+    header := magic "LCTB" | codec (1 byte) | payload length (u32) | record count (u32)
+              | first timestamp (f64) | last timestamp (f64)
+    payload := compressed concatenation of records
+    record  := length (u32) | JSON {"s": session_id, "t": timestamp, "r": role, "c": content}
+
+Blocks are self-describing, so a segment can always be walked header by
+header. The writer also appends one JSON line per block to
+``transcript-<writer>-NNNNNN.idx`` with the block's offset, time range and session
+hashes, which lets readers skip blocks without touching their pages.
+"""
+import argparse
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # Optional; zlib is always available
+    zstandard = None
+
+
+MAGIC = b"LCTB"
+HEADER = struct.Struct("<4sBIIdd")
+LENGTH = struct.Struct("<I")
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+
+def session_hash(session_id: str) -> int:
+    """Compact per-session key stored in the sparse index."""
+    return zlib.crc32(session_id.encode())
+
+
+def _compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("transcript block is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class TranscriptWriter:
+    """Buffers messages on a queue and writes compressed blocks from a background thread.
+
+    ``append`` never blocks the request path: if the queue is full the
+    message is dropped and counted in ``dropped``.
+    """
+    
+    def __init__(self, directory: str, block_records: int = 256, flush_interval: float = 1.0,
+                 segment_bytes: int = 64 * 1024 * 1024, max_queue: int = 100000,
+                 writer_id: Optional[str] = None):
+        self.directory = directory
+        self.writer_id = writer_id or str(os.getpid())
+        self.block_records = block_records
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Tuple[str, float, str, str]]]" = queue.Queue(maxsize=max_queue)
+        os.makedirs(directory, exist_ok=True)
+        self._segment = self._last_segment()
+        self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+        self._thread.start()
+    
+    def _last_segment(self) -> int:
+        prefix = f"transcript-{self.writer_id}-"
+        numbers = [int(name[len(prefix):-4]) for name in os.listdir(self.directory)
+                   if name.startswith(prefix) and name.endswith(".log")]
+        return max(numbers, default=1)
+    
+    def _paths(self) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"transcript-{self.writer_id}-{self._segment:06d}")
+        return base + ".log", base + ".idx"
+    
+    def append(self, session_id: str, role: str, content: str, timestamp: Optional[float] = None):
+        """Queue one message for writing."""
+        try:
+            self._queue.put_nowait((session_id, timestamp or time.time(), role, content))
+        except queue.Full:
+            self.dropped += 1
+    
+    def close(self):
+        """Flush pending messages and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+    
+    def _run(self):
+        pending: List[Tuple[str, float, str, str]] = []
+        closing = False
+        while not closing:
+            deadline = time.monotonic() + self.flush_interval
+            while len(pending) < self.block_records:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                pending.append(item)
+            if pending:
+                self._write_block(pending)
+                pending = []
+    
+    def _write_block(self, records: List[Tuple[str, float, str, str]]):
+        raw = bytearray()
+        for session_id, timestamp, role, content in records:
+            encoded = json.dumps({"s": session_id, "t": timestamp, "r": role, "c": content},
+                                 separators=(",", ":")).encode()
+            raw += LENGTH.pack(len(encoded)) + encoded
+        payload = _compress(bytes(raw), self.codec)
+        t0, t1 = records[0][1], records[-1][1]
+        
+        log_path, idx_path = self._paths()
+        if os.path.exists(log_path) and os.path.getsize(log_path) >= self.segment_bytes:
+            self._segment += 1
+            log_path, idx_path = self._paths()
+        with open(log_path, "ab") as log:
+            offset = log.tell()
+            log.write(HEADER.pack(MAGIC, self.codec, len(payload), len(records), t0, t1) + payload)
+        entry = {
+            "offset": offset,
+            "count": len(records),
+            "t0": t0,
+            "t1": t1,
+            "sessions": sorted({session_hash(r[0]) for r in records}),
+        }
+        with open(idx_path, "a") as idx:
+            idx.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+class TranscriptReader:
+    """Scan transcript segments through mmap, using the sparse index to skip blocks."""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+    
+    def segments(self) -> List[str]:
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("transcript-") and name.endswith(".log"))
+        return [os.path.join(self.directory, name) for name in names]
+    
+    @staticmethod
+    def _load_index(log_path: str) -> List[Dict[str, Any]]:
+        idx_path = log_path[:-4] + ".idx"
+        if not os.path.exists(idx_path):
+            return []
+        entries = []
+        with open(idx_path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break  # Torn last line
+        return entries
+    
+    @staticmethod
+    def _walk_headers(mm: mmap.mmap, offset: int) -> Iterator[Tuple[int, int, int, int, float, float]]:
+        """Yield (offset, codec, length, count, t0, t1) for blocks starting at ``offset``."""
+        while offset + HEADER.size <= len(mm):
+            magic, codec, length, count, t0, t1 = HEADER.unpack_from(mm, offset)
+            if magic != MAGIC or offset + HEADER.size + length > len(mm):
+                return  # Partially written block
+            yield offset, codec, length, count, t0, t1
+            offset += HEADER.size + length
+    
+    def scan(self, session_id: Optional[str] = None, since: Optional[float] = None,
+             until: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Yield messages ``{"session_id", "timestamp", "role", "content"}``.
+
+        Order is write order within a segment; segments of different
+        writers are visited one after another, not merged by time.
+        """
+        wanted = session_hash(session_id) if session_id is not None else None
+        for log_path in self.segments():
+            if os.path.getsize(log_path) == 0:
+                continue
+            index = self._load_index(log_path)
+            with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                blocks = []
+                for entry in index:
+                    if entry["offset"] + HEADER.size > len(mm):
+                        break
+                    blocks.append((entry, entry["offset"]))
+                # Blocks written after the index was last appended are found by walking headers
+                tail = 0
+                if blocks:
+                    _, _, length, _, _, _ = HEADER.unpack_from(mm, blocks[-1][1])
+                    tail = blocks[-1][1] + HEADER.size + length
+                for offset, _, _, count, t0, t1 in self._walk_headers(mm, tail):
+                    blocks.append(({"offset": offset, "count": count, "t0": t0, "t1": t1}, offset))
+                
+                for entry, offset in blocks:
+                    if since is not None and entry["t1"] < since:
+                        continue
+                    if until is not None and entry["t0"] > until:
+                        continue
+                    if wanted is not None and "sessions" in entry and wanted not in entry["sessions"]:
+                        continue
+                    yield from self._read_block(mm, offset, session_id, since, until)
+    
+    @staticmethod
+    def _read_block(mm: mmap.mmap, offset: int, session_id: Optional[str],
+                    since: Optional[float], until: Optional[float]) -> Iterator[Dict[str, Any]]:
+        magic, codec, length, _, _, _ = HEADER.unpack_from(mm, offset)
+        if magic != MAGIC:
+            return
+        start = offset + HEADER.size
+        raw = _decompress(mm[start:start + length], codec)
+        position = 0
+        while position < len(raw):
+            (size,) = LENGTH.unpack_from(raw, position)
+            position += LENGTH.size
+            record = json.loads(raw[position:position + size])
+            position += size
+            if session_id is not None and record["s"] != session_id:
+                continue
+            if (since is not None and record["t"] < since) or (until is not None and record["t"] > until):
+                continue
+            yield {"session_id": record["s"], "timestamp": record["t"], "role": record["r"], "content": record["c"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print transcript messages as JSON lines")
+    parser.add_argument("directory")
+    parser.add_argument("--session")
+    parser.add_argument("--since", type=float)
+    parser.add_argument("--until", type=float)
+    args = parser.parse_args()
+    for message in TranscriptReader(args.directory).scan(args.session, args.since, args.until):
+        print(json.dumps(message))
+
+
+if __name__ == "__main__":
+    main()
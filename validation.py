@@ -0,0 +1,154 @@
+"""Compile tool JSON schemas into argument validators that repair what they can."""
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, Callable, List
+
+
+Validator = Callable[[Any], Any]
+
+_SKU_LOOSE = re.compile(r"^\s*([A-Za-z]{3})[\s_\-]*(\d{1,4})\s*$")
+# Formats only compile_schema understands; public_schema strips them from what the LLM sees
+CUSTOM_FORMATS = frozenset({"sku"})
+UUID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+class ToolArgumentError(ValueError):
+    """Raised when tool arguments cannot be repaired into a valid call."""
+
+
+def canonical_sku(value: str) -> str:
+    """Normalize SKUs like ``com 1`` or ``mon_54`` to ``COM-0001`` / ``MON-0054``."""
+    match = _SKU_LOOSE.match(value)
+    if not match:
+        raise ToolArgumentError(f"'{value}' is not a valid SKU (expected e.g. COM-0001)")
+    return f"{match.group(1).upper()}-{int(match.group(2)):04d}"
+
+
+def _compile_string(schema: Dict[str, Any], path: str) -> Validator:
+    enum = schema.get("enum")
+    fmt = schema.get("format")
+    allowed = {value.lower(): value for value in enum} if enum else None
+    
+    def validate(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            raise ToolArgumentError(f"{path} must be a string")
+        value = value.strip()
+        if fmt == "sku":
+            value = canonical_sku(value)
+        elif fmt == "uuid":
+            value = value.lower()
+            if not UUID_PATTERN.match(value):
+                raise ToolArgumentError(f"{path} must be a UUID")
+        if allowed is not None:
+            if value.lower() not in allowed:
+                raise ToolArgumentError(f"{path} must be one of: {', '.join(enum)}")
+            value = allowed[value.lower()]
+        return value
+    return validate
+
+
+def _compile_integer(schema: Dict[str, Any], path: str) -> Validator:
+    minimum = schema.get("minimum")
+    
+    def validate(value):
+        if isinstance(value, bool):
+            raise ToolArgumentError(f"{path} must be an integer")
+        if isinstance(value, str):
+            value = value.strip()
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ToolArgumentError(f"{path} must be an integer")
+        if not number.is_finite() or number != number.to_integral_value():
+            raise ToolArgumentError(f"{path} must be a whole number")
+        value = int(number)
+        if minimum is not None and value < minimum:
+            raise ToolArgumentError(f"{path} must be at least {minimum}")
+        return value
+    return validate
+
+
+def _compile_boolean(schema: Dict[str, Any], path: str) -> Validator:
+    def validate(value):
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        raise ToolArgumentError(f"{path} must be true or false")
+    return validate
+
+
+def _compile_array(schema: Dict[str, Any], path: str) -> Validator:
+    item_validator = compile_schema(schema.get("items", {}), path + "[]")
+    min_items = schema.get("minItems")
+    
+    def validate(value):
+        if isinstance(value, dict):
+            # A single object where a list was expected
+            value = [value]
+        if not isinstance(value, list):
+            raise ToolArgumentError(f"{path} must be a list")
+        if min_items is not None and len(value) < min_items:
+            raise ToolArgumentError(f"{path} needs at least {min_items} item(s)")
+        return [item_validator(item) for item in value]
+    return validate
+
+
+def _compile_object(schema: Dict[str, Any], path: str) -> Validator:
+    properties = {
+        name: (compile_schema(prop, f"{path}.{name}" if path else name), prop.get("default"))
+        for name, prop in schema.get("properties", {}).items()
+    }
+    required: List[str] = schema.get("required", [])
+    # Schemas without declared properties accept anything (e.g. discovered tools)
+    passthrough = not properties
+    
+    def validate(value):
+        if not isinstance(value, dict):
+            raise ToolArgumentError(f"{path or 'arguments'} must be an object")
+        if passthrough:
+            return value
+        result = {}
+        for name, (validator, default) in properties.items():
+            item = value.get(name)
+            if item is None or item == "":
+                if name in required:
+                    raise ToolArgumentError(f"Missing required argument: {f'{path}.{name}' if path else name}")
+                if default is not None:
+                    result[name] = default
+                continue
+            result[name] = validator(item)
+        # Unknown keys are dropped rather than forwarded
+        return result
+    return validate
+
+
+_COMPILERS = {
+    "string": _compile_string,
+    "integer": _compile_integer,
+    "boolean": _compile_boolean,
+    "array": _compile_array,
+    "object": _compile_object,
+}
+
+
+def public_schema(schema: Any) -> Any:
+    """A copy of ``schema`` without the custom ``format`` keywords, for the LLM-facing tool schema."""
+    if isinstance(schema, dict):
+        return {
+            key: public_schema(value) for key, value in schema.items()
+            if not (key == "format" and isinstance(value, str) and value in CUSTOM_FORMATS)
+        }
+    if isinstance(schema, list):
+        return [public_schema(value) for value in schema]
+    return schema
+
+
+def compile_schema(schema: Dict[str, Any], path: str = "") -> Validator:
+    """Compile a JSON-schema subset into a function that canonicalizes or raises."""
+    compiler = _COMPILERS.get(schema.get("type"))
+    if compiler is None:
+        return lambda value: value
+    return compiler(schema, path)